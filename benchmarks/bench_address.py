@@ -0,0 +1,81 @@
+# bench_address.py
+# build_addr12（住所1/住所2 の分け方）のマイクロベンチマーク
+# 「最初の空白で切る」旧実装（split_first_space）と、都道府県・市区町村のトライで分解する現行版を
+# 実在しそうな住所文字列で比較する
+#
+#   python benchmarks/bench_address.py [--number N] [--repeat N]
+#
+# 現行版（trie）は旧実装（legacy: dict の変換表の str.translate + split_first_space）と同等以上で
+# あること（x0.95 を下回らない。手元では x0.99〜1.04）。分け方だけを比べると（first space）、
+# トライの正規表現の分だけ 1住所あたり 1〜2µs 遅い。その分を全角変換の表（BMP 全体の list）と
+# 文字列の連結の簡略化で取り戻している。build_address は LRU で同じ住所を1回しか分けない
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_address import address_pattern  # noqa: E402
+from google2atena_core import (  # noqa: E402
+    _VOICED_RE, _ZENKAKU_VOICED, ZENKAKU_TABLE, build_addr12, split_first_space,
+    to_zenkaku_for_address,
+)
+
+# (都道府県, 市区町村, 番地)
+ADDRESSES = [
+    ("東京都", "千代田区", "丸の内1-2-3 丸の内ビルディング5F"),
+    ("大阪府", "大阪市北区", "梅田1-1 ﾋﾞﾙ 3F"),
+    ("北海道", "札幌市中央区", "北1条西2-1-1 Sapporo Tower 1201"),
+    ("神奈川県", "横浜市西区", "みなとみらい2-2-1ランドマークタワー20F"),
+    ("東京都", "渋谷区", "道玄坂1-2"),
+    ("", "", "東京都 千代田区 丸の内1-1　丸ビル 10F"),
+    ("長野県", "北佐久郡軽井沢町", "大字軽井沢1-2"),
+    ("", "", "123 Main St. New York"),
+]
+
+# user-021 より前の全角変換（dict の変換表）
+_DICT_TABLE = {code: mapped for code, mapped in enumerate(ZENKAKU_TABLE) if code != mapped}
+
+def legacy_to_zenkaku_for_address(s):
+    if not s:
+        return ""
+    if 'ﾞ' in s or 'ﾟ' in s:
+        s = _VOICED_RE.sub(lambda m: _ZENKAKU_VOICED[m.group()], s)
+    return s.translate(_DICT_TABLE)
+
+def legacy_build_addr12(region, city, street):
+    """user-021 より前の実装（比較用）"""
+    parts = [p for p in [region, city, street] if p]
+    return split_first_space(legacy_to_zenkaku_for_address("".join(parts)))
+
+def first_space_build_addr12(region, city, street):
+    """分け方だけ旧実装（それ以外は現行版）"""
+    return split_first_space(to_zenkaku_for_address(region + city + street))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args()
+
+    address_pattern()  # 正規表現の作成は計らない
+    cases = [
+        ("legacy", legacy_build_addr12),
+        ("first space", first_space_build_addr12),
+        ("trie", build_addr12),
+    ]
+    # 負荷の揺れが特定の実装に偏らないよう、実装を交互に計って最小値を取る
+    best = dict.fromkeys([name for name, _ in cases], float("inf"))
+    for _ in range(args.repeat):
+        for name, fn in cases:
+            t = timeit.timeit(lambda: [fn(*a) for a in ADDRESSES], number=args.number)
+            best[name] = min(best[name], t)
+    base = best["legacy"]
+    for name, t in best.items():
+        per = t / (args.number * len(ADDRESSES)) * 1e6
+        print(f"{name:<12} {per:8.3f} us/addr  x{base / t:5.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# bench_pipeline.py
+# 変換パイプラインのベンチマーク（段階別の所要時間・全体の rows/sec・ピークメモリ）
+# 入力は contacts_gen.py で決定的に生成するので、リリース間で結果を比較できる
+#
+#   python benchmarks/bench_pipeline.py --rows 1000,10000,100000 -o bench.json
+#   python benchmarks/bench_pipeline.py --rows 10000 --compare bench.json
+#
+# 段階別の計測は --stage-rows 件（既定 50,000）までの標本で行う（dict 行を全件メモリに載せないため）。
+# 全体の計測は生成した CSV を一時ファイルに書き、iter_converted_bytes でストリーミング変換する。
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contacts_gen import HEADER, iter_contacts, iter_contacts_csv  # noqa: E402
+from google2atena_core import (  # noqa: E402
+    clear_caches, compile_chunk_plan, compile_row_plan, extract_memos, iter_converted_bytes,
+    kana_company_name, normalize_emails, normalize_phones, route_address_by_label,
+    scan_slots,
+)
+
+class _NullSink:
+    def write(self, data):
+        return len(data)
+
+def _timed(fn):
+    clear_caches()
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def bench_stages(rows, seed):
+    """各段階を標本の全行に対して実行し、段階ごとの秒数を返す"""
+    sample = list(iter_contacts(rows, seed))
+    slots = scan_slots(HEADER)
+    phone_keys = [f"Phone {n} - Value" for n in sorted(slots["Phone"])]
+    email_keys = [f"E-mail {n} - Value" for n in sorted(slots["E-mail"])]
+    phones = [[row[k] for k in phone_keys] for row in sample]
+    emails = [[row[k] for k in email_keys] for row in sample]
+    companies = [row["Organization Name"] for row in sample]
+    plan = compile_row_plan(HEADER)
+    chunk_plan = compile_chunk_plan(HEADER)
+    value_rows = [[row[h] for h in HEADER] for row in sample]
+    converted = [plan(list(values)) for values in value_rows]
+
+    def csv_write():
+        writer = csv.writer(io.StringIO())
+        for out in converted:
+            writer.writerow(out)
+
+    stages = {
+        "route_address_by_label": lambda: [route_address_by_label(row, {}) for row in sample],
+        "normalize_phones": lambda: [normalize_phones(v) for v in phones],
+        "normalize_emails": lambda: [normalize_emails(v) for v in emails],
+        "extract_memos": lambda: [extract_memos(row) for row in sample],
+        "kana_company_name": lambda: [kana_company_name(c) for c in companies],
+        "row_plan": lambda: [plan(list(values)) for values in value_rows],
+        # 列単位（COLUMNAR_CHUNK_ROWS の既定値 500 行ずつ、重複を除いて正規化）
+        "chunk_plan": lambda: [out for i in range(0, len(value_rows), 500)
+                               for out in chunk_plan([list(v) for v in value_rows[i:i + 500]])],
+        "csv_write": csv_write,
+    }
+    results = {}
+    for name, fn in stages.items():
+        seconds = _timed(fn)
+        results[name] = {
+            "rows": len(sample),
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(len(sample) / seconds, 1) if seconds else None,
+        }
+    return results
+
+def bench_pipeline(path, rows, workers, memory):
+    """生成済み CSV をストリーミング変換し、所要時間とピークメモリを返す"""
+    def run():
+        stats = {}
+        sink = _NullSink()
+        with open(path, "rb") as src:
+            # 行キャッシュは実行のたびに結果が変わるので計測では使わない
+            for chunk in iter_converted_bytes(src, workers=workers, stats=stats, row_cache=False):
+                sink.write(chunk)
+        return stats.get("rows", 0)
+
+    seconds = _timed(run)
+    result = {
+        "rows": rows,
+        "workers": workers,
+        "input_bytes": os.path.getsize(path),
+        "seconds": round(seconds, 6),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+    }
+    if memory:
+        # tracemalloc は遅くなるので計時とは別に実行する
+        clear_caches()
+        tracemalloc.start()
+        run()
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def run_size(rows, args):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            f.writelines(iter_contacts_csv(rows, args.seed))
+        return {
+            "rows": rows,
+            "stages": bench_stages(min(rows, args.stage_rows), args.seed),
+            "pipeline": bench_pipeline(path, rows, args.workers, not args.no_memory),
+        }
+    finally:
+        os.remove(path)
+
+def compare(current, baseline):
+    """同じ行数の結果どうしで rows/sec の比を表示する"""
+    base_runs = {r["rows"]: r for r in baseline.get("runs", [])}
+    for run in current["runs"]:
+        base = base_runs.get(run["rows"])
+        if not base:
+            continue
+        print(f"--- rows={run['rows']} (current / baseline rows/sec)")
+        pairs = [(k, v, base["stages"].get(k)) for k, v in run["stages"].items()]
+        pairs.append(("pipeline", run["pipeline"], base.get("pipeline")))
+        for name, cur, old in pairs:
+            if old and old.get("rows_per_sec") and cur.get("rows_per_sec"):
+                print(f"{name:<24} {cur['rows_per_sec'] / old['rows_per_sec']:6.2f}x")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="1000,10000",
+                    help="行数（カンマ区切りで複数指定。例: 1000,100000,1000000）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--stage-rows", type=int, default=50000,
+                    help="段階別計測に使う標本の上限行数")
+    ap.add_argument("--workers", type=int, default=1, help="全体計測の並列ワーカー数")
+    ap.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない")
+    ap.add_argument("-o", "--output", help="結果 JSON の出力先（省略時は標準出力）")
+    ap.add_argument("--compare", help="比較対象の結果 JSON")
+    args = ap.parse_args()
+
+    result = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "workers": args.workers,
+        },
+        "runs": [],
+    }
+    for rows in (int(r) for r in args.rows.split(",")):
+        run = run_size(rows, args)
+        result["runs"].append(run)
+        p = run["pipeline"]
+        print(f"rows={rows}: {p['rows_per_sec']:,.0f} rows/s"
+              + (f", peak {p['peak_bytes'] / 1e6:.1f} MB" if "peak_bytes" in p else ""),
+              file=sys.stderr)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# bench_serving.py
+# 本番構成（gunicorn.conf.py）と従来の起動（gunicorn google2atena:app、sync ワーカー1つ）の比較
+# - 起動: プロセス起動から、最初の変換（小さな CSV）が返るまでの秒数
+# - メモリ: 最初の変換のあと、マスターと全ワーカーの PSS の合計（Linux のみ）
+# - 同時実行: --clients 本の接続が小さな CSV を --seconds 秒間投げ続けたときの件数/秒と遅延
+# - 大きな変換の最中: 大きな CSV（--big-rows 行）の変換中に小さな CSV を投げたときの遅延
+#
+#   python benchmarks/bench_serving.py --clients 8 --seconds 10
+#
+# 行キャッシュは結果を変えるので使わない（ROW_CACHE_PATH=none）
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contacts_gen import iter_contacts_csv  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOUNDARY = "g2a-bench-boundary"
+
+SETUPS = {
+    # gunicorn はカレントの gunicorn.conf.py を自動で読むので、空の設定で従来の既定値にする
+    "current": ["gunicorn", "-c", os.devnull, "google2atena:app"],
+    "shipped": ["gunicorn", "-c", "gunicorn.conf.py"],
+}
+
+def multipart(data, filename="contacts.csv"):
+    head = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; "
+            f"filename=\"{filename}\"\r\nContent-Type: text/csv\r\n\r\n").encode()
+    return head + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def post(port, body, timeout=300):
+    """/convert に投げて応答を読み切り、(ステータス, 秒) を返す"""
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("POST", "/convert", body,
+                     {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+        res = conn.getresponse()
+        res.read()
+        return res.status, time.perf_counter() - started
+    finally:
+        conn.close()
+
+def start(setup, port):
+    env = dict(os.environ, PORT=str(port), ROW_CACHE_PATH="none")
+    return subprocess.Popen(SETUPS[setup] + ["-b", f"127.0.0.1:{port}"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+def stop(proc):
+    os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        proc.wait(30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+
+def cold_start(setup, port, small):
+    """起動 → 最初の変換が返るまでの秒数"""
+    started = time.perf_counter()
+    proc = start(setup, port)
+    try:
+        while True:
+            try:
+                status, _ = post(port, small)
+                if status == 200:
+                    return proc, time.perf_counter() - started
+            except OSError:
+                pass
+            time.sleep(0.05)
+    except BaseException:
+        stop(proc)
+        raise
+
+def pss_kb(pid):
+    """pid とその子プロセスの PSS の合計（KB。/proc が無ければ None）"""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+        for p in pids:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+    except OSError:
+        return None
+    return total
+
+def load(port, small, clients, seconds):
+    """clients 本で seconds 秒間投げ続ける"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            try:
+                status, elapsed = post(port, small)
+            except OSError:
+                status, elapsed = 0, 0.0
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, seconds, errors)
+
+def during_big(port, small, big, probes):
+    """大きな変換の最中に小さな変換を probes 回投げる"""
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(big=post(port, big)[1]))
+    worker.start()
+    time.sleep(0.2)  # 大きな変換が始まるのを待つ
+    latencies = [post(port, small)[1] for _ in range(probes)]
+    worker.join()
+    out = summarize(latencies)
+    out["big_seconds"] = round(result.get("big", 0.0), 3)
+    return out
+
+def summarize(latencies, seconds=None, errors=0):
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    latencies = sorted(latencies)
+    out = {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+    if seconds:
+        out["requests_per_sec"] = round(len(latencies) / seconds, 1)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--setups", default="current,shipped")
+    ap.add_argument("--port", type=int, default=18765)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--small-rows", type=int, default=50)
+    ap.add_argument("--big-rows", type=int, default=20000)
+    ap.add_argument("--probes", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    small = multipart("".join(iter_contacts_csv(args.small_rows, args.seed)).encode("utf-8-sig"))
+    big = multipart("".join(iter_contacts_csv(args.big_rows, args.seed)).encode("utf-8-sig"))
+    result = {"meta": {"cpus": os.cpu_count(), "python": sys.version.split()[0],
+                       "clients": args.clients, "seconds": args.seconds,
+                       "small_rows": args.small_rows, "big_rows": args.big_rows}}
+    for setup in args.setups.split(","):
+        proc, seconds = cold_start(setup, args.port, small)
+        try:
+            # 全ワーカーに1回ずつ変換させてから測る
+            for _ in range(4):
+                post(args.port, small)
+            result[setup] = {
+                "cold_start_seconds": round(seconds, 3),
+                "pss_kb": pss_kb(proc.pid),
+                "concurrent": load(args.port, small, args.clients, args.seconds),
+                "during_big_conversion": during_big(args.port, small, big, args.probes),
+            }
+        finally:
+            stop(proc)
+        print(f"{setup}: done", file=sys.stderr)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench_startup.py
+# ワーカー起動コストの計測（import ＋ 辞書読み込み ＋ 最初の1件変換、プロセスの最大 RSS）
+# 辞書スナップショットあり / なし（DICT_SNAPSHOT=none）をそれぞれ別プロセスで測る
+#
+# スナップショットは起動を速くするためのものではない。辞書一式を1つの版付きの塊にして、
+# 追加辞書の再読み込みで丸ごと差し替え、並列変換のワーカーと版だけで突き合わせるためのもの。
+# 起動時間・RSS はほぼ変わらない（手元で 80ms 対 93ms、RSS はどちらも 26.7MB）。
+# ここでは、スナップショットで起動が遅くならないことだけを確かめる
+#
+#   python benchmarks/bench_startup.py --runs 10
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, resource, time
+started = time.perf_counter()
+from google2atena_core import get_tables, kana_company_name, classify_phone
+get_tables()
+kana_company_name("株式会社テスト")
+classify_phone("0312345678")
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds,
+                  "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+def measure(runs, env_extra):
+    env = dict(os.environ, **env_extra)
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out))
+    return {
+        "seconds_median": round(statistics.median(r["seconds"] for r in results), 6),
+        "maxrss_kb_median": statistics.median(r["maxrss_kb"] for r in results),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    # スナップショットを最新にしておく
+    subprocess.run([sys.executable, "-m", "google2atena_dicts", "build"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+    result = {
+        "snapshot": measure(args.runs, {}),
+        "source": measure(args.runs, {"DICT_SNAPSHOT": "none"}),
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
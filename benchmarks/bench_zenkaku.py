@@ -0,0 +1,62 @@
+# bench_zenkaku.py
+# to_zenkaku_for_address のマイクロベンチマーク
+# 旧実装（1文字ずつ ord + NFKC）と str.translate 版を実在しそうな住所文字列で比較する
+#
+#   python benchmarks/bench_zenkaku.py [--number N]
+
+import argparse
+import os
+import sys
+import timeit
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_core import to_zenkaku_for_address, to_zenkaku_column  # noqa: E402
+
+ADDRESSES = [
+    "東京都千代田区丸の内1-2-3 丸の内ビルディング5F",
+    "大阪府大阪市北区梅田1-1 ﾋﾞﾙ 3F",
+    "北海道札幌市中央区北1条西2-1-1 Sapporo Tower 1201",
+    "神奈川県横浜市西区みなとみらい2-2-1 ランドマークタワー 20F",
+    "東京都渋谷区道玄坂1-2",
+    "京都府京都市下京区烏丸通七条下ル東塩小路町721-1",
+    "福岡県福岡市博多区博多駅中央街1-1 JRJP博多ビル 9F",
+    "",
+]
+
+def legacy_to_zenkaku_for_address(s):
+    """v3.9.19 までの実装（比較用）"""
+    if not s:
+        return ""
+    z = []
+    for ch in s:
+        code = ord(ch)
+        if 0x21 <= code <= 0x7E:
+            if ch == '-':
+                z.append('－')
+            else:
+                z.append(unicodedata.normalize('NFKC', ch))
+        else:
+            z.append(ch)
+    return "".join(z)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=20000)
+    args = ap.parse_args()
+
+    cases = [
+        ("legacy loop", lambda: [legacy_to_zenkaku_for_address(a) for a in ADDRESSES]),
+        ("str.translate", lambda: [to_zenkaku_for_address(a) for a in ADDRESSES]),
+        ("column batch", lambda: to_zenkaku_column(ADDRESSES)),
+    ]
+    base = None
+    for name, fn in cases:
+        t = min(timeit.repeat(fn, number=args.number, repeat=3))
+        per = t / (args.number * len(ADDRESSES)) * 1e6
+        base = base or t
+        print(f"{name:<14} {per:8.3f} us/addr  x{base / t:5.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# contacts_gen.py
+# ベンチマーク用の Google連絡先 CSV を決定的に生成する（同じ seed なら常に同じ内容）
+# - 複数行の Address n - Formatted（4行・5行）、構造化住所、半角カナ混じり
+# - 電話・メール最大10件（携帯 / 市外局番 2〜5桁 / フリーダイヤル / IP / +81 / 不正値）
+# - Relation のメモラベル、複数行の Notes
+# - COMPANY_EXCEPT に完全一致する会社名・法人格付きで一致しない会社名・辞書にない会社名
+#
+#   python benchmarks/contacts_gen.py 100000 > contacts_100k.csv
+
+import csv
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_core import COMPANY_EXCEPT  # noqa: E402
+
+MAX_SLOTS = 10
+ADDRESS_SLOTS = 2
+
+HEADER = [
+    "First Name", "Middle Name", "Last Name",
+    "Phonetic First Name", "Phonetic Middle Name", "Phonetic Last Name",
+    "Name Prefix", "Name Suffix", "Nickname", "File As",
+    "Organization Name", "Organization Title", "Organization Department",
+    "Birthday", "Notes", "Photo", "Labels",
+]
+for _i in range(1, MAX_SLOTS + 1):
+    HEADER += [f"E-mail {_i} - Label", f"E-mail {_i} - Value"]
+for _i in range(1, MAX_SLOTS + 1):
+    HEADER += [f"Phone {_i} - Label", f"Phone {_i} - Value"]
+for _i in range(1, ADDRESS_SLOTS + 1):
+    HEADER += [f"Address {_i} - Label", f"Address {_i} - Formatted", f"Address {_i} - Street",
+               f"Address {_i} - City", f"Address {_i} - PO Box", f"Address {_i} - Region",
+               f"Address {_i} - Postal Code", f"Address {_i} - Country",
+               f"Address {_i} - Extended Address"]
+for _i in range(1, MAX_SLOTS + 1):
+    HEADER += [f"Relation {_i} - Label", f"Relation {_i} - Value"]
+
+LAST_NAMES = [("山田", "ヤマダ"), ("佐藤", "サトウ"), ("鈴木", "スズキ"), ("高橋", "タカハシ"),
+              ("田中", "タナカ"), ("渡辺", "ワタナベ"), ("伊藤", "イトウ"), ("中村", "ナカムラ")]
+FIRST_NAMES = [("太郎", "タロウ"), ("花子", "ハナコ"), ("一郎", "イチロウ"), ("美咲", "ミサキ"),
+               ("健", "ケン"), ("陽子", "ヨウコ"), ("翔", "ショウ"), ("結衣", "ユイ")]
+CORP_PREFIXES = ["株式会社", "有限会社", "一般社団法人", ""]
+MISS_COMPANIES = ["東京印刷", "北海道企画", "ＡＢＣ商事", "未来技研", "さくら出版",
+                  "Acme Japan", "関西興業", "みなと銀行"]
+PLACES = [
+    ("東京都", "千代田区", "丸の内", "100-0005"),
+    ("東京都", "渋谷区", "道玄坂", "150-0043"),
+    ("大阪府", "大阪市北区", "梅田", "530-0001"),
+    ("北海道", "札幌市中央区", "北一条西", "060-0001"),
+    ("神奈川県", "横浜市西区", "みなとみらい", "220-0012"),
+    ("福岡県", "福岡市博多区", "博多駅中央街", "812-0012"),
+    ("京都府", "京都市下京区", "東塩小路町", "600-8216"),
+    ("愛知県", "名古屋市中村区", "名駅", "450-0002"),
+]
+BUILDINGS = ["", "丸の内ビルディング5F", "ﾋﾞﾙ 3F", "Tower 1201", "第2ビル 201号室"]
+PHONE_PATTERNS = [
+    "090{:04d}{:04d}", "080-{:04d}-{:04d}", "03-{:04d}-{:04d}", "06{:04d}{:04d}",
+    "011-{:03d}-{:04d}", "0155-{:02d}-{:04d}", "01372-{:01d}-{:04d}", "0120-{:03d}-{:03d}",
+    "050-{:04d}-{:04d}", "+81 3-{:04d}-{:04d}", "({:03d}) {:04d}", "内線{:03d}{:01d}",
+]
+PHONE_LABELS = ["Mobile", "Work", "Home", "* Work", "Main", "Other"]
+EMAIL_DOMAINS = ["example.co.jp", "example.com", "mail.example.jp"]
+MEMO_LABELS = ["メモ", "メモ（趣味）", "Spouse", "Child", "", "メモ2"]
+NOTES = ["", "", "年賀状不要", "2023年 名刺交換\n担当替えあり", "\"重要\", 要確認\n複数行\nメモ"]
+
+def _company(rng, except_names):
+    r = rng.random()
+    if r < 0.4 and except_names:
+        return rng.choice(except_names)  # COMPANY_EXCEPT に完全一致
+    if r < 0.6 and except_names:
+        return rng.choice(CORP_PREFIXES[:-1]) + rng.choice(except_names)  # 法人格付き（不一致）
+    if r < 0.9:
+        return rng.choice(CORP_PREFIXES) + rng.choice(MISS_COMPANIES)  # 辞書にない
+    return ""
+
+def _address(rng, row, n):
+    region, city, town, postal = rng.choice(PLACES)
+    block = f"{rng.randint(1, 9)}-{rng.randint(1, 30)}-{rng.randint(1, 20)}"
+    building = rng.choice(BUILDINGS)
+    street = f"{town}{block}" + (f" {building}" if building else "")
+    row[f"Address {n} - Label"] = rng.choice(["Work", "Home", "Other", ""])
+    kind = rng.randrange(4)
+    if kind == 0:
+        # 5行: 番地 / 市区町村 / 都道府県 / 〒 / 国
+        row[f"Address {n} - Formatted"] = f"{block} {building}\n{city} {town}\n{region}\n{postal}\nJP"
+    elif kind == 1:
+        # 4行: 市区町村＋番地 / 都道府県 / 〒 / 国
+        row[f"Address {n} - Formatted"] = f"{city} {street}\n{region}\n{postal.replace('-', '')}\nJP"
+    elif kind == 2:
+        row[f"Address {n} - Region"] = region
+        row[f"Address {n} - City"] = city
+        row[f"Address {n} - Street"] = street
+        row[f"Address {n} - Postal Code"] = postal
+        row[f"Address {n} - Country"] = "JP"
+    # kind == 3: 住所なし
+
+def iter_contacts(rows, seed=0):
+    """Google連絡先の行（HEADER をキーにした dict）を rows 件返す"""
+    rng = random.Random(seed)
+    except_names = sorted(COMPANY_EXCEPT)
+    for i in range(rows):
+        row = dict.fromkeys(HEADER, "")
+        last, last_kana = rng.choice(LAST_NAMES)
+        first, first_kana = rng.choice(FIRST_NAMES)
+        row.update({
+            "First Name": first, "Last Name": last,
+            "Phonetic First Name": first_kana, "Phonetic Last Name": last_kana,
+            "File As": f"{last} {first}",
+            "Organization Name": _company(rng, except_names),
+            "Organization Title": rng.choice(["", "部長", "課長", "代表取締役"]),
+            "Organization Department": rng.choice(["", "営業部", "編集部"]),
+            "Birthday": rng.choice(["", "", f"19{rng.randint(50, 99)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"]),
+            "Notes": rng.choice(NOTES),
+            "Labels": "* myContacts",
+        })
+        for n in range(1, rng.randint(1, MAX_SLOTS) + 1):
+            row[f"Phone {n} - Label"] = rng.choice(PHONE_LABELS)
+            row[f"Phone {n} - Value"] = rng.choice(PHONE_PATTERNS).format(
+                rng.randrange(10000), rng.randrange(10000))
+        for n in range(1, rng.randint(0, MAX_SLOTS) + 1):
+            row[f"E-mail {n} - Label"] = rng.choice(["* Work", "Home", "Other"])
+            value = f"user{i % 997}.{n}@{rng.choice(EMAIL_DOMAINS)}"
+            if rng.random() < 0.05:
+                value += f" ::: alt{n}@{rng.choice(EMAIL_DOMAINS)}"
+            row[f"E-mail {n} - Value"] = value
+        for n in range(1, rng.randint(1, ADDRESS_SLOTS) + 1):
+            _address(rng, row, n)
+        for n in range(1, rng.randint(0, 4) + 1):
+            row[f"Relation {n} - Label"] = rng.choice(MEMO_LABELS)
+            row[f"Relation {n} - Value"] = rng.choice(["趣味: 釣り", "花子", "紹介者あり", ""])
+        yield row
+
+def iter_contacts_csv(rows, seed=0, batch=1000):
+    """iter_contacts の内容を CSV テキスト行で返す（1行目はヘッダ）"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(HEADER)
+    for i, row in enumerate(iter_contacts(rows, seed), 1):
+        writer.writerow([row[h] for h in HEADER])
+        if i % batch == 0:
+            yield from io.StringIO(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+    yield from io.StringIO(buf.getvalue())
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8-sig", newline="")
+    out.writelines(iter_contacts_csv(rows, seed))
+    out.flush()
+
+if __name__ == "__main__":
+    main()
@@ -1,322 +1,331 @@
 # google2atena.py  v3.9.19  (Render安定版 / no-pandas)
 # - 電話・メール最大10件対応
 # - HTMLタイトルにバージョン明記
+# - /convert はストリーミング変換（アップロードを逐次デコードし、変換済み行を逐次送出）
+# - 変換ロジックは google2atena_core.py（Flask 非依存）に分離
+# - /batch は ZIP で受け取った複数の CSV を同時に変換し、ZIP でストリーミング返却
+# - gzip のアップロード（.csv.gz / Content-Encoding: gzip）を受け付け、応答は Accept-Encoding に応じて圧縮
+# - 出力の列の並びは google2atena_schema のプロファイルで切り替える（profile=home など）
+# - アップロードは UPLOAD_SPOOL_BYTES を超えたら一時ファイルに置き、mmap で読む。
+#   MAX_UPLOAD_BYTES を超える要求は本文を読み切る前に 413 で断る
+# - PROFILE_TOKEN を設定すると、同じトークンを付けた /convert をプロファイルできる（google2atena_profile）
+# - 本番は gunicorn.conf.py（warm_app を preload し、gthread ワーカーで動かす）。/ready は準備完了の確認用
 # - 住所分割・かな変換・メモ抽出・フェイルセーフ等は v3.9.18r7b+addrformatted_smart_4or5line_10x と同一
 
-import csv
-import io
-import re
-import unicodedata
-from flask import Flask, render_template_string, request, send_file
-
-# ======== 外部辞書フェイルセーフ ========
-try:
-    from company_dicts import COMPANY_EXCEPT
-except Exception:
-    COMPANY_EXCEPT = {}
-
-try:
-    from kanji_word_map import KANJI_WORD_MAP
-except Exception:
-    KANJI_WORD_MAP = {}
-
-try:
-    from corp_terms import CORP_TERMS
-except Exception:
-    CORP_TERMS = [
-        "株式会社", "有限会社", "合同会社", "合資会社", "相互会社",
-        "一般社団法人", "一般財団法人", "公益社団法人", "公益財団法人",
-        "特定非営利活動法人", "ＮＰＯ法人", "学校法人", "医療法人",
-        "宗教法人", "社会福祉法人", "公立大学法人", "独立行政法人", "地方独立行政法人"
-    ]
+import os
+import tempfile
+import time
+import zlib
+
+from flask import (
+    Flask, Request, Response, g, jsonify, render_template, request, send_file,
+    stream_with_context,
+)
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# 従来 google2atena から import されていた名前はここからも引けるようにしておく
+from google2atena_core import (  # noqa: F401
+    ATENA_HEADER, COMPANY_EXCEPT, CORP_TERMS, CONVERT_WORKERS, KANJI_WORD_MAP, DecompressedTooLarge,
+    PARALLEL_MIN_BYTES, UnknownProfile, build_addr12, build_address, cache_stats, classify_phone,
+    convert_workers,
+    extract_memos, format_phone, format_postal, get_profile, get_tables, iter_converted_bytes,
+    kana_company_name, map_upload, normalize_emails, normalize_phones, open_upload,
+    parse_formatted_address, readiness, warm_up, warm_up_in_background,
+    route_address_by_label, sniff_encoding, split_first_space, to_zenkaku_for_address, upload_size,
+)
+from google2atena_batch import BadBatchArchive, iter_batch_zip, list_csv_members, save_upload
+from google2atena_compress import GunzipRequestMiddleware, iter_compressed, negotiate_encoding
+from google2atena_jobs import JobQueueFull, job_result_path, job_status, submit_job
+from google2atena_metrics import record_conversion, record_request, render_metrics, server_timing
+from google2atena_profile import ProfiledConversion, ProfilerBusy, load_report, profiling_allowed
+
+# アップロードの上限（バイト。0 で無制限）。Content-Encoding: gzip の要求は展開後の大きさで数える
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+# これを超えるアップロードはメモリに置かず一時ファイルに書く
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+UPLOAD_TMP_DIR = os.environ.get("UPLOAD_TMP_DIR") or None  # 省略時は OS の一時ディレクトリ
+
+class UploadRequest(Request):
+    """アップロードの置き場所を UPLOAD_SPOOL_BYTES / UPLOAD_TMP_DIR で決める Request"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode="rb+",
+                                             dir=UPLOAD_TMP_DIR)
 
 app = Flask(__name__)
-
-# ======== 住所ユーティリティ ========
-
-def to_zenkaku_for_address(s: str) -> str:
-    if not s:
-        return ""
-    z = []
-    for ch in s:
-        code = ord(ch)
-        if 0x21 <= code <= 0x7E:
-            if ch == '-':
-                z.append('－')
-            else:
-                z.append(unicodedata.normalize('NFKC', ch))
-        else:
-            z.append(ch)
-    return "".join(z)
-
-def format_postal(postal: str) -> str:
-    if not postal:
-        return ""
-    digits = re.sub(r'\D', '', postal)
-    if len(digits) == 7:
-        return f"{digits[:3]}-{digits[3:]}"
-    return postal
-
-_SPLIT_RE = re.compile(r'[ \u3000]')
-
-def split_first_space(addr_full: str):
-    if not addr_full:
-        return ("", "")
-    m = _SPLIT_RE.search(addr_full)
-    if not m:
-        return (addr_full, "")
-    i = m.start()
-    return (addr_full[:i], addr_full[i+1:].strip())
-
-def build_addr12(region, city, street):
-    parts = [p for p in [region, city, street] if p]
-    full = "".join(parts)
-    full_z = to_zenkaku_for_address(full)
-    a1, a2 = split_first_space(full_z)
-    return (a1, a2)
-
-def parse_formatted_address(formatted):
-    """Address n - Formatted が4〜5行の場合に対応"""
-    if not formatted:
-        return "", "", "", ""
-    lines = [l.strip() for l in formatted.splitlines() if l.strip()]
-    street = city = region = postal = ""
-    if len(lines) >= 5:
-        street, city, region, postal = lines[:4]
-    elif len(lines) == 4:
-        city_street, region, postal = lines[:3]
-        m = re.match(r"(.+?)[ 　](.+)", city_street)
-        if m:
-            city, street = m.group(1), m.group(2)
-        else:
-            city = city_street
-    return region, city, street, postal
-
-def route_address_by_label(row, out):
-    for n in range(1, 3):  # Address 1, Address 2 に対応
-        label = (row.get(f"Address {n} - Label") or "").strip().lower()
-        formatted = row.get(f"Address {n} - Formatted", "")
-        region = row.get(f"Address {n} - Region") or ""
-        city   = row.get(f"Address {n} - City") or ""
-        street = row.get(f"Address {n} - Street") or ""
-        postal = row.get(f"Address {n} - Postal Code") or ""
-
-        if formatted:
-            region_f, city_f, street_f, postal_f = parse_formatted_address(formatted)
-            region = region or region_f
-            city   = city or city_f
-            street = street or street_f
-            postal = postal or postal_f
-
-        jp_postal = format_postal(postal)
-        addr1, addr2 = build_addr12(region, city, street)
-
-        if label == 'home':
-            out['自宅〒']    = jp_postal
-            out['自宅住所1'] = addr1
-            out['自宅住所2'] = addr2
-            out['自宅住所3'] = ""
-        elif label == 'other':
-            out['その他〒']    = jp_postal
-            out['その他住所1'] = addr1
-            out['その他住所2'] = addr2
-            out['その他住所3'] = ""
-        else:
-            out['会社〒']    = jp_postal
-            out['会社住所1'] = addr1
-            out['会社住所2'] = addr2
-            out['会社住所3'] = ""
-
-# ======== 電話番号整形 ========
-
-CITY_CODES = [
-    '011','015','017','018','019','022','023','024','025','026','027','028','029',
-    '03','04','042','043','044','045','046','047','048','049','052','053','054',
-    '055','056','057','058','059','06','072','073','074','075','076','077','078',
-    '079','082','083','084','085','086','087','088','089','092','093','094','095',
-    '096','097','098','099'
-]
-
-def normalize_phones(phone_values):
-    phones = []
-    for val in phone_values:
-        if not val:
-            continue
-        nums = re.sub(r'\D', '', val)
-        if not nums:
-            continue
-        if not nums.startswith('0'):
-            nums = '0' + nums
-
-        formatted = nums
-
-        if re.match(r'^0(70|80|90)\d{8}$', nums):
-            formatted = f"{nums[:3]}-{nums[3:7]}-{nums[7:]}"
-        elif re.match(r'^050\d{8}$', nums):
-            formatted = f"{nums[:3]}-{nums[3:7]}-{nums[7:]}"
-        elif re.match(r'^(0120|0800|0570)\d{6}$', nums):
-            formatted = f"{nums[:4]}-{nums[4:7]}-{nums[7:]}"
-        elif len(nums) == 10:
-            for code in sorted(CITY_CODES, key=len, reverse=True):
-                if nums.startswith(code):
-                    remain = nums[len(code):]
-                    if len(remain) == 7:
-                        formatted = f"{code}-{remain[:3]}-{remain[3:]}"
-                    elif len(remain) == 6:
-                        formatted = f"{code}-{remain[:2]}-{remain[2:]}"
-                    break
-        elif len(nums) == 9:
-            formatted = f"{nums[:2]}-{nums[2:5]}-{nums[5:]}"
-        else:
-            formatted = nums
-
-        if formatted not in phones:
-            phones.append(formatted)
-
-    return ";".join(phones)
-
-# ======== メール整形 ========
-
-def normalize_emails(email_values):
-    emails = []
-    for val in email_values:
-        if not val:
-            continue
-        val = val.strip().replace(":", ";")
-        if val and val not in emails:
-            emails.append(val)
-    return ";".join(emails)
-
-# ======== メモ抽出 ========
-
-def extract_memos(row):
-    memos = []
-    for i in range(1, 11):
-        label = row.get(f"Relation {i} - Label", "")
-        value = row.get(f"Relation {i} - Value", "")
-        if label and "メモ" in label and value:
-            memos.append(value)
-    notes = row.get("Notes", "")
-    if notes:
-        memos.append(notes)
-    return memos
-
-# ======== 会社名かな変換 ========
-
-def kana_company_name(name):
-    if not name:
-        return ""
-    if name in COMPANY_EXCEPT:
-        return COMPANY_EXCEPT[name]
-    result = name
-    for k, v in KANJI_WORD_MAP.items():
-        if k in result:
-            result = result.replace(k, v)
-    return result
-
-# ======== HTMLフォーム ========
-
-html_form = """
-<!DOCTYPE html>
-<html lang="ja">
-<head>
-<meta charset="UTF-8">
-<title>Google→宛名職人 CSV 変換 v3.9.19</title>
-</head>
-<body>
-<h2>Google連絡先 → 宛名職人 CSV 変換ツール <small>v3.9.19</small></h2>
-<form action="/convert" method="post" enctype="multipart/form-data">
-  <input type="file" name="file" accept=".csv" required>
-  <input type="submit" value="変換開始">
-</form>
-</body>
-</html>
-"""
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES or None
+app.wsgi_app = GunzipRequestMiddleware(app.wsgi_app)
+
+# ======== 計測 ========
+
+@app.before_request
+def _start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def _record_latency(response):
+    started = getattr(g, "started", None)
+    if started is not None and request.endpoint:
+        record_request(request.endpoint, time.perf_counter() - started)
+    # 変換系は実際に使った版を各ルートで入れる。それ以外は現在の版（/ready は読み込みを待たない）
+    if "X-Dictionary-Version" not in response.headers and request.endpoint != "ready":
+        response.headers["X-Dictionary-Version"] = get_tables()["version"]
+    return response
+
+def _metered(chunks, stats, started):
+    """ストリーミング変換の最後（または中断時）に変換メトリクスを記録する"""
+    error = False
+    try:
+        yield from chunks
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_conversion(time.perf_counter() - started, stats, error)
+
+# ======== サイズ上限 ========
+
+def _too_large(message):
+    """/convert は従来どおりテキスト、/batch・/jobs は JSON で 413 を返す"""
+    if request.path == "/convert":
+        return f"⚠️ {message}", 413
+    return jsonify(error=message), 413
+
+@app.errorhandler(RequestEntityTooLarge)
+def _upload_too_large(e):
+    limit = (f"{MAX_UPLOAD_BYTES / 1024 ** 2:.0f} MB" if MAX_UPLOAD_BYTES >= 1024 ** 2
+             else f"{MAX_UPLOAD_BYTES:,} バイト")
+    return _too_large(f"ファイルが大きすぎます（上限 {limit}）。ファイルを分けて変換してください。")
+
+@app.errorhandler(DecompressedTooLarge)
+def _decompressed_too_large(e):
+    return _too_large(str(e))
 
 # ======== Flask Routes ========
 
 @app.route("/")
 def index():
-    return render_template_string(html_form)
+    # 画面は templates/index.html（送信・進捗のポーリングは static/script.js）
+    return render_template("index.html")
+
+@app.route("/ready")
+def ready():
+    """辞書・郵便番号索引・住所の正規表現が作られていれば 200、まだなら 503。
+    preload なしで起動した場合は、最初の確認で裏の準備を始める"""
+    state = readiness()
+    if all(state.values()):
+        return jsonify(ready=True, dict_version=get_tables()["version"], **state)
+    warm_up_in_background()
+    return jsonify(ready=False, **state), 503
+
+@app.route("/cache-stats")
+def cache_stats_view():
+    return jsonify(cache_stats())
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def _want_merge():
+    """重複統合の指定（フォームの merge チェックボックス、または ?merge=1）"""
+    value = request.form.get("merge") or request.args.get("merge") or ""
+    return value.lower() in ("1", "true", "on", "yes")
+
+def _want_profile():
+    """出力プロファイル名（フォームまたは ?profile=。省略時は OUTPUT_PROFILE）。不明なら UnknownProfile"""
+    name = request.form.get("profile") or request.args.get("profile") or None
+    get_profile(name)
+    return name
+
+def _profile_token():
+    """運用者のプロファイル指定（X-Profile-Token ヘッダ、または ?profile_token=）"""
+    return request.headers.get("X-Profile-Token") or request.args.get("profile_token")
+
+def _compress_response(chunks, headers):
+    """クライアントが対応していれば応答本文を逐次圧縮する"""
+    headers["Vary"] = "Accept-Encoding"
+    coding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if coding is None:
+        return chunks
+    headers["Content-Encoding"] = coding
+    return iter_compressed(chunks, coding)
+
+def _iter_file(path, chunk_size=64 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data
 
 @app.route("/convert", methods=["POST"])
 def convert():
+    started = time.perf_counter()
     file = request.files["file"]
     if not file:
         return "⚠️ ファイルが選択されていません。"
-
-    data = file.read()
-    text = data.decode("utf-8-sig", errors="replace")
-    reader = csv.DictReader(io.StringIO(text))
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    header = [
-        "姓","名","姓かな","名かな","姓名","姓名かな","ミドルネーム","ミドルネームかな","敬称",
-        "ニックネーム","旧姓","宛先","自宅〒","自宅住所1","自宅住所2","自宅住所3","自宅電話",
-        "自宅IM ID","自宅E-mail","自宅URL","自宅Social",
-        "会社〒","会社住所1","会社住所2","会社住所3","会社電話","会社IM ID","会社E-mail",
-        "会社URL","会社Social",
-        "その他〒","その他住所1","その他住所2","その他住所3","その他電話","その他IM ID",
-        "その他E-mail","その他URL","その他Social",
-        "会社名かな","会社名","部署名1","部署名2","役職名",
-        "連名","連名ふりがな","連名敬称","連名誕生日",
-        "メモ1","メモ2","メモ3","メモ4","メモ5",
-        "備考1","備考2","備考3","誕生日","性別","血液型","趣味","性格"
-    ]
-    writer.writerow(header)
-
-    for row in reader:
-        out = {}
-
-        # --- 住所 ---
-        route_address_by_label(row, out)
-
-        # --- 電話 ---
-        phone_values = [row.get(f"Phone {i} - Value", "") for i in range(1, 11)]
-        out["会社電話"] = normalize_phones(phone_values)
-
-        # --- メール ---
-        email_values = [row.get(f"E-mail {i} - Value", "") for i in range(1, 11)]
-        out["会社E-mail"] = normalize_emails(email_values)
-
-        # --- メモ ---
-        memos = extract_memos(row)
-        for i in range(5):
-            out[f"メモ{i+1}"] = memos[i] if i < len(memos) else ""
-
-        # --- 会社名かな ---
-        company_name = row.get("Organization Name", "")
-        out["会社名"] = company_name
-        out["会社名かな"] = kana_company_name(company_name)
-
-        writer.writerow([
-            row.get("Last Name",""), row.get("First Name",""),
-            row.get("Phonetic Last Name",""), row.get("Phonetic First Name",""),
-            f"{row.get('Last Name','')}　{row.get('First Name','')}",
-            f"{row.get('Phonetic Last Name','')}{row.get('Phonetic First Name','')}",
-            "", "", "様", row.get("Nickname",""), "",
-            "会社",
-            out.get("自宅〒",""), out.get("自宅住所1",""), out.get("自宅住所2",""), out.get("自宅住所3",""),
-            out.get("自宅電話",""), "", "", "", "",
-            out.get("会社〒",""), out.get("会社住所1",""), out.get("会社住所2",""), out.get("会社住所3",""),
-            out.get("会社電話",""), "", out.get("会社E-mail",""), "", "",
-            out.get("その他〒",""), out.get("その他住所1",""), out.get("その他住所2",""), out.get("その他住所3",""),
-            out.get("その他電話",""), "", "", "", "",
-            out.get("会社名かな",""), out.get("会社名",""),
-            row.get("Organization Department",""), "", row.get("Organization Title",""),
-            "","","","",
-            out.get("メモ1",""), out.get("メモ2",""), out.get("メモ3",""), out.get("メモ4",""), out.get("メモ5",""),
-            "", "", "", row.get("Birthday",""), "", "", "", ""
-        ])
-
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode("utf-8-sig")),
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="converted.csv"
+    upload_seconds = time.perf_counter() - started
+    merge = _want_merge()
+    try:
+        columns = get_profile(_want_profile())
+    except UnknownProfile as e:
+        return f"⚠️ {e}", 400
+
+    # 一時ファイルに書き出されたアップロードは mmap して読む（応答を送り終えたら閉じる）。
+    # 並列にするかは展開後の大きさで決める（Content-Encoding: gzip の要求は
+    # Content-Length が無く、gzip のファイルは展開すると何倍にもなる）
+    upload = map_upload(file.stream, min_bytes=UPLOAD_SPOOL_BYTES + 1)
+    big = (upload_size(upload) or 0) >= PARALLEL_MIN_BYTES
+    # gzip なら読みながら展開する。文字コードは先頭サンプルだけで判定し、結果をレスポンスヘッダで知らせる
+    try:
+        source, compression = open_upload(upload)
+        encoding, confidence, source = sniff_encoding(source)
+    except (OSError, EOFError, zlib.error, DecompressedTooLarge):
+        upload.close()
+        return "⚠️ 圧縮ファイルを展開できませんでした（gzip 形式か、サイズ上限をご確認ください）。", 400
+    # プロファイルは同じプロセスの中で1行ずつ変換する（並列・行キャッシュは使わない）。
+    # プロセスで同時に1件だけなので、使用中なら 409
+    profiled = None
+    if profiling_allowed(_profile_token()):
+        try:
+            profiled = ProfiledConversion(file.filename or "")
+        except ProfilerBusy as e:
+            upload.close()
+            return f"⚠️ {e}", 409
+    workers = convert_workers() if big and profiled is None else 1
+    # 辞書はここで版を固定する（変換中に再読み込みされても、このファイルは最後まで同じ版）
+    tables = get_tables()
+    stats = {"encoding": encoding, "confidence": confidence, "compression": compression}
+    chunks = iter_converted_bytes(source, workers=workers, stats=stats, encoding=encoding,
+                                  tables=tables, merge=merge, columns=columns,
+                                  slow_rows=profiled.slow_rows if profiled else None)
+    # 本体はストリーミングで返すため、ヘッダ送出時点で分かるのは受信（multipart 解析）の時間だけ。
+    # 段階別の時間は /metrics と非同期ジョブ（/jobs）の Server-Timing で確認できる。
+    headers = {
+        "Content-Disposition": "attachment; filename=converted.csv",
+        "Server-Timing": server_timing({"upload": upload_seconds}),
+        "X-Detected-Encoding": encoding,
+        "X-Encoding-Confidence": f"{confidence:.2f}",
+        "X-Dictionary-Version": tables["version"],
+    }
+    if profiled is not None:
+        chunks = profiled.wrap(chunks, stats)
+        headers["X-Profile-Report"] = f"/profiles/{profiled.id}"
+    body = _compress_response(_metered(chunks, stats, started), headers)
+    response = Response(stream_with_context(body), mimetype="text/csv", headers=headers)
+    response.call_on_close(upload.close)
+    if profiled is not None:
+        # 本体を1度も読まずに閉じられた場合もプロファイラを手放す
+        response.call_on_close(profiled.release)
+    return response
+
+@app.route("/profiles/<report_id>")
+def get_profile_report(report_id):
+    """保存したプロファイル（要求時と同じトークンが要る。無効時・不一致は 404）"""
+    report = load_report(report_id) if profiling_allowed(_profile_token()) else None
+    if report is None:
+        return jsonify(error="プロファイルが見つかりません。"), 404
+    return jsonify(report)
+
+# ======== ZIP 一括変換 ========
+
+def _remove_after(chunks, path):
+    """ストリーミングが終わったら（中断されても）アップロードの一時ファイルを消す"""
+    try:
+        yield from chunks
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    file = request.files.get("file")
+    if not file:
+        return jsonify(error="ファイルが選択されていません。"), 400
+    try:
+        profile = _want_profile()
+    except UnknownProfile as e:
+        return jsonify(error=str(e)), 400
+    path = save_upload(file.stream)
+    try:
+        members = list_csv_members(path)
+    except BadBatchArchive as e:
+        os.remove(path)
+        return jsonify(error=str(e)), 400
+    chunks = iter_batch_zip(path, merge=_want_merge(), on_member=record_conversion, members=members,
+                            profile=profile)
+    # 中身は圧縮済みなので Content-Encoding は付けない
+    return Response(
+        stream_with_context(_remove_after(chunks, path)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=converted.zip"},
     )
 
+# ======== 非同期ジョブ ========
+
+def _job_view(status):
+    view = dict(status)
+    view["status_url"] = f"/jobs/{status['id']}"
+    view["result_url"] = f"/jobs/{status['id']}/result"
+    return view
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    file = request.files.get("file")
+    if not file:
+        return jsonify(error="ファイルが選択されていません。"), 400
+    try:
+        status = submit_job(file.stream, file.filename or "", merge=_want_merge(),
+                            profile=_want_profile())
+    except UnknownProfile as e:
+        return jsonify(error=str(e)), 400
+    except JobQueueFull:
+        return jsonify(error="変換待ちのジョブが多すぎます。しばらくしてから再度お試しください。"), 503
+    return jsonify(_job_view(status)), 202
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    status = job_status(job_id)
+    if status is None:
+        return jsonify(error="ジョブが見つかりません（期限切れの可能性があります）。"), 404
+    response = jsonify(_job_view(status))
+    if status.get("timings"):
+        response.headers["Server-Timing"] = server_timing(status["timings"])
+    if status.get("dict_version"):
+        response.headers["X-Dictionary-Version"] = status["dict_version"]
+    return response
+
+@app.route("/jobs/<job_id>/result")
+def get_job_result(job_id):
+    status = job_status(job_id)
+    if status is None:
+        return jsonify(error="ジョブが見つかりません（期限切れの可能性があります）。"), 404
+    path = job_result_path(job_id)
+    if path is None:
+        return jsonify(_job_view(status)), 409
+    headers = {"Content-Disposition": "attachment; filename=converted.csv"}
+    body = _compress_response(_iter_file(path), headers)
+    if "Content-Encoding" in headers:
+        response = Response(body, mimetype="text/csv", headers=headers)
+    else:
+        response = send_file(path, mimetype="text/csv", as_attachment=True,
+                             download_name="converted.csv")
+        response.headers["Vary"] = "Accept-Encoding"
+    if status.get("timings"):
+        response.headers["Server-Timing"] = server_timing(status["timings"])
+    if status.get("dict_version"):
+        response.headers["X-Dictionary-Version"] = status["dict_version"]
+    return response
+
+def warm_app():
+    """検索用の構造を作ってからモジュールの app を返す（gunicorn.conf.py の wsgi_app）。
+    新しいアプリは作らない。preload_app では fork 前に1度だけ呼ばれる"""
+    warm_up()
+    return app
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=10000)
+    warm_app().run(host="0.0.0.0", port=10000)
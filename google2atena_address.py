@@ -0,0 +1,164 @@
+# google2atena_address.py  住所の分解（Flask 非依存）
+# - 「都道府県 / 市区町村 / 町名 / 番地 / 建物」に先頭から1回なめるだけで分ける
+# - 都道府県47件と市区町村名はトライにまとめ、トライをそのまま正規表現に書き出して1回だけ compile する
+#   （枝は先頭の1文字で決まり、町名・番地は所有格・アトミックグループなので後戻りしない）
+#   市区町村名の元は郵便番号索引（google2atena_postal）。索引が無いときや索引に無い書き方
+#   （郡の省略など）は、末尾の「市・区・町・村・郡」で区切る規則（政令市の区・紛らわしい名前は表で扱う）
+# - 住所1 = 都道府県〜番地、住所2 = 建物（従来の「最初の空白で切る」と違い、空白の位置に左右されない）
+
+import re
+import threading
+
+from google2atena_postal import get_postal_index
+
+PREFECTURES = (
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+)
+
+# 区を持つ政令指定都市（「〇〇市〇〇区」までを市区町村にする）
+DESIGNATED_CITIES = (
+    "札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市", "相模原市", "新潟市",
+    "静岡市", "浜松市", "名古屋市", "京都市", "大阪市", "堺市", "神戸市", "岡山市",
+    "広島市", "北九州市", "福岡市", "熊本市",
+)
+
+# 名前の途中に「市・町・村・区」を含む市区町村（規則で区切ると途中で切れてしまうもの）
+AMBIGUOUS_NAMES = (
+    "市川市", "市原市", "市貝町", "市川三郷町", "四日市市", "廿日市市", "野々市市", "上市町",
+    "余市町", "町田市", "大町市", "大町町", "十日町市", "村山市", "東村山市", "武蔵村山市",
+    "村上市", "羽村市", "大村市", "田村市", "玉村町", "村田町",
+)
+# 同じく、名前に「市・村」を含む郡（「郡」の前まで）
+AMBIGUOUS_COUNTIES = ("余市", "高市", "北村山", "西村山", "田村")
+
+_END = ""  # トライの終端マーク（1文字キーと衝突しない）
+
+# ======== トライ ========
+
+def build_trie(names):
+    """名前の集合 → 1文字ずつの dict の入れ子（終端に _END: True）"""
+    root = {}
+    for name in names:
+        node = root
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[_END] = True
+    return root
+
+def trie_pattern(trie):
+    """トライ → 正規表現（枝は先頭の1文字で決まる。終端を含む節は残りを省略可にして最長一致）"""
+    branches = [re.escape(ch) + trie_pattern(child)
+                for ch, child in sorted(trie.items()) if ch != _END]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if _END in trie:
+        return f"(?:{body})?"
+    return body
+
+# ======== 住所の正規表現 ========
+
+_DIGIT = "0-9０-９"
+_KANJI_DIGIT = "〇一二三四五六七八九十百千"
+_SPACE = " 　"
+_SUFFIX = "市区町村"
+# 市区町村名の途中に来られる文字（規則で区切るとき）
+_NAME = f"[^{_SUFFIX}郡{_DIGIT}{_SPACE}]"
+# 番地に含まれる文字。北海道の「1条西2丁目」「3線」も番地として読む
+_BLOCK_CHARS = f"[{_DIGIT}{_KANJI_DIGIT}\\-－ー−‐―の丁目番地号条線]*+"
+_BLOCK = f"{_BLOCK_CHARS}(?:(?<=[条線])[東西南北]{_BLOCK_CHARS})*+"
+# 番地の始まり: 数字、または「〇丁目」「〇番」の漢数字
+_BLOCK_HEAD = f"[{_DIGIT}]|[{_KANJI_DIGIT}]++(?=丁目|番)"
+# 町名: 数字・空白まで。漢数字は「〇丁目」「〇番」でなければ町名の一部（「九段北」「三の輪」）
+_TOWN_CHARS = f"[^{_DIGIT}{_KANJI_DIGIT}{_SPACE}]*+"
+_TOWN = f"{_TOWN_CHARS}(?:[{_KANJI_DIGIT}]++(?!丁目|番){_TOWN_CHARS})*+"
+
+def _fallback_city():
+    """規則: 紛らわしい名前 → 政令市(+区) → 郡+町村 → 最初の 市区町村（1文字目は名前の一部）"""
+    designated = trie_pattern(build_trie(DESIGNATED_CITIES))
+    ambiguous = trie_pattern(build_trie(AMBIGUOUS_NAMES))
+    plain = f".{_NAME}*+[{_SUFFIX}]"
+    counties = trie_pattern(build_trie(AMBIGUOUS_COUNTIES))
+    county = f"(?:{counties}|.{_NAME}*+)郡(?:{ambiguous}|{plain})"
+    ward = f"(?:{designated})(?:[^区{_DIGIT}{_SPACE}]{{1,3}}+区)?"
+    return f"(?>{ambiguous}|{ward}|{county}|{plain})"
+
+def compile_address_pattern(city_names=()):
+    """市区町村名（郵便番号索引の名前など）を埋め込んだ住所の正規表現を作る"""
+    pref = trie_pattern(build_trie(PREFECTURES))
+    city = _fallback_city()
+    if city_names:
+        city = f"(?>{trie_pattern(build_trie(city_names))}(?<=[{_SUFFIX}郡])|{city})"
+    # head: 建物の前まで（address_lines の住所1。1回の group() で取り出せるようにまとめる）
+    return re.compile(
+        f"(?P<head>[{_SPACE}]*+(?P<region>{pref})?[{_SPACE}]*+"
+        f"(?P<city>{city})?[{_SPACE}]*+"
+        f"(?P<town>{_TOWN})"
+        f"(?:[{_SPACE}]*+(?P<block>(?={_BLOCK_HEAD}){_BLOCK}))?"
+        f"[{_SPACE}]*+)(?P<building>.*)",
+        re.DOTALL,
+    )
+
+_pattern = None
+_pattern_lock = threading.Lock()
+
+def address_pattern():
+    """住所の正規表現（初回に1度だけ作る。郵便番号索引があればその市区町村名も入れる）"""
+    global _pattern
+    if _pattern is None:
+        with _pattern_lock:
+            if _pattern is None:
+                names = set()
+                index = get_postal_index()
+                if index is not None:
+                    for _, city in index.areas():
+                        if city:
+                            names.add(city)
+                            county, sep, town = city.partition("郡")
+                            if sep and town:
+                                names.add(town)  # 郡を省いた書き方
+                _pattern = compile_address_pattern(sorted(names))
+    return _pattern
+
+def address_pattern_ready():
+    """住所の正規表現を作成済みか（作成は起こさない）"""
+    return _pattern is not None
+
+# ======== 分解 ========
+
+def split_address(s):
+    """住所の文字列 → (都道府県, 市区町村, 町名, 番地, 建物)。見つからない部分は ""。
+    都道府県・市区町村・町名の後の空白は区切りとして読み飛ばす。
+    町名の後に番地以外が空白を挟んで続く場合、それ以降は建物とみなす"""
+    if not s:
+        return "", "", "", "", ""
+    region, city, town, block, building = address_pattern().match(s).group(
+        "region", "city", "town", "block", "building")
+    return region or "", city or "", town, block or "", building.rstrip()
+
+def address_lines(s):
+    """住所の文字列 → (住所1, 住所2)。住所1 は都道府県〜番地（区切りの空白は詰める）、住所2 は建物。
+    都道府県も市区町村も読み取れなければ None（海外の住所など。呼び出し側の従来の分け方に任せる）"""
+    head, region, city, building = (_pattern or address_pattern()).match(s).group(
+        "head", "region", "city", "building")
+    if region is None and city is None:
+        return None
+    if " " in head or "　" in head:
+        head = head.replace(" ", "").replace("　", "")
+    return head, building.rstrip()
+
+def split_city(s):
+    """住所の文字列 → (都道府県, 市区町村, 残りの開始位置)"""
+    m = address_pattern().match(s)
+    return m.group("region") or "", m.group("city") or "", m.start("town")
+
+def split_address_column(values):
+    """列単位の一括分解（同じ値は1回だけ分解する）"""
+    done = {}
+    return [done[v] if v in done else done.setdefault(v, split_address(v)) for v in values]
@@ -0,0 +1,193 @@
+# google2atena_batch.py  ZIP 一括変換（Flask 非依存）
+# - アップロードされた ZIP の中の CSV（.csv / .csv.gz）をプロセスプールで同時に変換する
+# - 各ワーカーはアーカイブから直接メンバーを読む（ディスクへ展開しない）
+# - 変換済みファイルは終わった順に、出力 ZIP へストリーミングで書き出す
+#   （ZIP をメモリ上に組み立てない。最後に summary.json を付ける）
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import as_completed
+
+from google2atena_core import (
+    LimitedReader, convert_workers, get_process_pool, get_profile, iter_converted_bytes,
+)
+
+BATCH_MAX_MEMBERS = int(os.environ.get("BATCH_MAX_MEMBERS", "200"))
+BATCH_TMP_DIR = os.environ.get("BATCH_TMP_DIR") or None  # 省略時は OS の一時ディレクトリ
+COPY_CHUNK_BYTES = 64 * 1024
+CSV_SUFFIXES = (".csv", ".csv.gz")
+
+class BadBatchArchive(ValueError):
+    """ZIP として読めない、または CSV が入っていない"""
+
+def save_upload(stream):
+    """アップロードを一時ファイルに保存してパスを返す（zipfile は末尾の目録から読むので seek が要る）"""
+    fd, path = tempfile.mkstemp(prefix="g2a-upload-", suffix=".zip", dir=BATCH_TMP_DIR)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(stream, f, 1024 * 1024)
+    return path
+
+def member_display_name(info):
+    """メンバー名。UTF-8 フラグの無い名前は zipfile が cp437 で読んでいるので、
+    元のバイト列を UTF-8 → cp932（Windows の圧縮フォルダ）の順に読み直す"""
+    name = info.filename
+    if info.flag_bits & 0x800:
+        return name
+    try:
+        raw = name.encode("cp437")
+    except UnicodeEncodeError:
+        return name
+    for encoding in ("utf-8", "cp932"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return name
+
+def list_csv_members(zip_path):
+    """変換対象のメンバー [(アーカイブ内の名前, 表示名)]。フォルダ・__MACOSX・隠しファイルは除く"""
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            infos = zf.infolist()
+    except (zipfile.BadZipFile, OSError) as e:
+        raise BadBatchArchive(f"ZIP ファイルとして読めません: {e}") from e
+    members = []
+    for info in infos:
+        display = member_display_name(info)
+        base = os.path.basename(display.rstrip("/"))
+        if (info.is_dir() or display.startswith("__MACOSX/") or base.startswith(".")
+                or not base.lower().endswith(CSV_SUFFIXES)):
+            continue
+        members.append((info.filename, display))
+    if not members:
+        raise BadBatchArchive("ZIP の中に CSV ファイルがありません")
+    if len(members) > BATCH_MAX_MEMBERS:
+        raise BadBatchArchive(f"CSV ファイルが多すぎます（上限 {BATCH_MAX_MEMBERS} 件）")
+    return members
+
+def output_name(display, used):
+    """a/b.csv(.gz) → b_converted.csv（同名は _2, _3 … を付けて重複させない）"""
+    stem = os.path.basename(display)
+    for suffix in (".gz", ".csv"):
+        if stem.lower().endswith(suffix):
+            stem = stem[:-len(suffix)]
+    name = f"{stem}_converted.csv"
+    n = 1
+    while name in used:
+        n += 1
+        name = f"{stem}_converted_{n}.csv"
+    used.add(name)
+    return name
+
+def convert_member(zip_path, member, out_path, merge=False, profile=None):
+    """ワーカー側: メンバー1つをアーカイブから直接読んで out_path に変換する"""
+    stats = {}
+    started = time.perf_counter()
+    error = None
+    try:
+        with zipfile.ZipFile(zip_path) as zf, zf.open(member) as src, open(out_path, "wb") as dst:
+            for chunk in iter_converted_bytes(LimitedReader(src), stats=stats, merge=merge,
+                                              columns=get_profile(profile)):
+                dst.write(chunk)
+    except Exception as e:
+        error = str(e)
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+    return {"seconds": time.perf_counter() - started, "stats": stats, "error": error}
+
+class _ChunkSink:
+    """ZipFile の書き込み先。書かれたバイト列を溜めておき、drain() で取り出す（seek できない）"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _iter_file(path):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(COPY_CHUNK_BYTES)
+            if not data:
+                return
+            yield data
+
+def iter_batch_zip(zip_path, workers=None, merge=False, on_member=None, members=None,
+                   profile=None):
+    """ZIP（パス）を変換し、出力 ZIP のバイトチャンクを返す。profile は出力プロファイル名。
+    members（list_csv_members の結果）を渡すと目録を読み直さない。
+    on_member を渡すと、メンバーごとに on_member(秒, stats, エラーか) を呼ぶ（メトリクス用）。
+    中断されても変換途中の一時ファイルは消す（zip_path 自体は呼び出し側が消す）。"""
+    if members is None:
+        members = list_csv_members(zip_path)
+    workers = workers or convert_workers()
+    pool = get_process_pool(workers)
+    tmp_dir = tempfile.mkdtemp(prefix="g2a-batch-", dir=BATCH_TMP_DIR)
+    sink = _ChunkSink()
+    futures = {}
+    started = time.perf_counter()
+    try:
+        used = set()
+        for i, (member, display) in enumerate(members):
+            arcname = output_name(display, used)
+            out_path = os.path.join(tmp_dir, f"{i}.csv")
+            fut = pool.submit(convert_member, zip_path, member, out_path, merge, profile)
+            futures[fut] = (display, arcname, out_path)
+
+        summary = []
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as out:
+            # 終わった順に書き出す（遅いファイルが他の送出を止めない）
+            for fut in as_completed(list(futures)):
+                display, arcname, out_path = futures.pop(fut)
+                result = fut.result()
+                stats = result["stats"]
+                entry = {
+                    "file": display,
+                    "output": None if result["error"] else arcname,
+                    "rows": stats.get("rows", 0),
+                    "seconds": round(result["seconds"], 3),
+                    "encoding": stats.get("encoding"),
+                    "merged": stats.get("merged"),
+                    "error": result["error"],
+                }
+                summary.append(entry)
+                if on_member is not None:
+                    on_member(result["seconds"], stats, bool(result["error"]))
+                if result["error"]:
+                    continue
+                with out.open(arcname, "w", force_zip64=True) as dst:
+                    for data in _iter_file(out_path):
+                        dst.write(data)
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+                os.remove(out_path)
+                yield sink.drain()
+
+            report = {
+                "files": summary,
+                "total_rows": sum(e["rows"] for e in summary),
+                "errors": sum(1 for e in summary if e["error"]),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            out.writestr("summary.json", json.dumps(report, ensure_ascii=False, indent=2))
+        yield sink.drain()
+    finally:
+        for fut in futures:
+            fut.cancel()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
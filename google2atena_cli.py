@@ -0,0 +1,159 @@
+# google2atena_cli.py  バッチ変換 CLI（Flask 不要）
+# - Web 版と同じ行変換ロジック（google2atena_core）でファイルを変換する
+# - 入出力はストリーミング。複数ファイルはプロセスを分けて同時に変換する
+#
+#   python -m google2atena_cli contacts.csv                  # → contacts_converted.csv
+#   python -m google2atena_cli a.csv b.csv -o out/ -j 4      # → out/a_converted.csv, out/b_converted.csv
+#   python -m google2atena_cli < contacts.csv > atena.csv    # stdin → stdout
+#   python -m google2atena_cli --merge contacts.csv          # 重複する連絡先を1行にまとめる
+#   python -m google2atena_cli contacts.csv.gz               # → contacts_converted.csv.gz（gzip のまま読み書き）
+#   python -m google2atena_cli --profile home contacts.csv   # 電話・メールを自宅欄に（google2atena_schema）
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from google2atena_core import (
+    UnknownProfile, available_cpus, get_profile, iter_converted_bytes, map_upload,
+)
+from google2atena_schema import PROFILES
+
+OUTPUT_SUFFIX = "_converted.csv"
+
+def default_output_path(src, out_dir=None):
+    """a.csv → a_converted.csv、a.csv.gz → a_converted.csv.gz"""
+    stem = os.path.basename(src)
+    gz = stem.lower().endswith(".gz")
+    if gz:
+        stem = stem[:-3]
+    if stem.lower().endswith(".csv"):
+        stem = stem[:-4]
+    return os.path.join(out_dir or os.path.dirname(src), stem + OUTPUT_SUFFIX + (".gz" if gz else ""))
+
+def open_output(path):
+    """出力ファイルを開く（.gz で終わる名前なら gzip で書く）"""
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, "wb")
+    return open(path, "wb")
+
+def convert_stream(src, dst, workers=1, merge=False, row_cache=True, profile=None):
+    """バイナリストリーム src を変換して dst に書き出し、
+    (行数, 秒, 判定した文字コード, 行キャッシュから再利用した行数) を返す。
+    profile は出力プロファイル名（google2atena_schema。省略時は OUTPUT_PROFILE）"""
+    stats = {}
+    started = time.perf_counter()
+    for chunk in iter_converted_bytes(src, workers=workers, stats=stats, merge=merge,
+                                      row_cache=row_cache, columns=get_profile(profile)):
+        dst.write(chunk)
+    dst.flush()
+    return (stats.get("rows", 0), time.perf_counter() - started, stats.get("encoding"),
+            stats.get("rows_reused", 0))
+
+def convert_path(src_path, dst_path, workers=1, merge=False, row_cache=True, profile=None):
+    """ファイル1本を変換する（プロセスプールからも呼ばれる）。gzip の入力は自動で展開する"""
+    with open(src_path, "rb") as src, map_upload(src) as upload, open_output(dst_path) as dst:
+        rows, seconds, encoding, reused = convert_stream(upload, dst, workers, merge,
+                                                         row_cache, profile)
+    return src_path, dst_path, rows, seconds, encoding, reused
+
+def iter_outcomes(jobs, max_jobs, workers=1, merge=False, row_cache=True, profile=None):
+    """(入力, convert_path の結果または例外) を完了した順に返す"""
+    if max_jobs <= 1:
+        for src, dst in jobs:
+            try:
+                yield src, convert_path(src, dst, workers, merge, row_cache, profile)
+            except Exception as e:
+                yield src, e
+        return
+    with ProcessPoolExecutor(max_workers=max_jobs) as pool:
+        futures = {pool.submit(convert_path, src, dst, workers, merge, row_cache, profile): src
+                   for src, dst in jobs}
+        for fut in as_completed(futures):
+            try:
+                yield futures[fut], fut.result()
+            except Exception as e:
+                yield futures[fut], e
+
+def _rate(rows, seconds):
+    return rows / seconds if seconds > 0 else 0.0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        prog="google2atena_cli",
+        description="Google連絡先CSV → 宛名職人CSV 一括変換")
+    ap.add_argument("inputs", nargs="*",
+                    help="入力CSV（省略時または - は標準入力 → 標準出力）")
+    ap.add_argument("-o", "--output",
+                    help="出力先。入力1本ならファイル名、複数ならディレクトリ")
+    ap.add_argument("-j", "--jobs", type=int, default=0,
+                    help="同時に変換するファイル数（既定: CPU数）")
+    ap.add_argument("-w", "--workers", type=int, default=1,
+                    help="1ファイル内の並列ワーカー数（大きな単一ファイル向け）")
+    ap.add_argument("-m", "--merge", action="store_true",
+                    help="電話・メール・(姓名, 会社名) が一致する連絡先を1行にまとめる")
+    ap.add_argument("--no-row-cache", dest="row_cache", action="store_false",
+                    help="前回までの変換結果（行キャッシュ。ROW_CACHE_PATH を設定したときだけ有効）を使わない")
+    ap.add_argument("-p", "--profile",
+                    help=f"出力プロファイル（{' / '.join(PROFILES)}。既定: OUTPUT_PROFILE または default）")
+    ap.add_argument("-z", "--gzip", action="store_true",
+                    help="標準出力にも gzip で書く（ファイル出力は名前が .gz なら gzip）")
+    ap.add_argument("-q", "--quiet", action="store_true", help="集計を表示しない")
+    args = ap.parse_args(argv)
+    try:
+        get_profile(args.profile)
+    except UnknownProfile as e:
+        ap.error(str(e))
+
+    def report(msg):
+        if not args.quiet:
+            print(msg, file=sys.stderr)
+
+    if not args.inputs or args.inputs == ["-"]:
+        if args.output:
+            dst = open_output(args.output)
+        elif args.gzip:
+            dst = gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb")
+        else:
+            dst = sys.stdout.buffer
+        try:
+            rows, seconds, encoding, reused = convert_stream(
+                sys.stdin.buffer, dst, args.workers, args.merge, args.row_cache, args.profile)
+        finally:
+            if dst is not sys.stdout.buffer:
+                dst.close()
+        report(f"<stdin> [{encoding}]: {rows} rows ({reused} reused) in {seconds:.2f}s "
+               f"({_rate(rows, seconds):,.0f} rows/s)")
+        return 0
+
+    if len(args.inputs) == 1 and args.output and not os.path.isdir(args.output):
+        jobs = [(args.inputs[0], args.output)]
+    else:
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+        jobs = [(p, default_output_path(p, args.output)) for p in args.inputs]
+
+    started = time.perf_counter()
+    total_rows = 0
+    failed = 0
+    max_jobs = min(len(jobs), args.jobs or available_cpus())
+    for src, outcome in iter_outcomes(jobs, max_jobs, args.workers, args.merge, args.row_cache,
+                                      args.profile):
+        if isinstance(outcome, Exception):
+            failed += 1
+            report(f"{src}: ERROR {outcome}")
+            continue
+        _, dst, rows, seconds, encoding, reused = outcome
+        total_rows += rows
+        report(f"{src} [{encoding}] -> {dst}: {rows} rows ({reused} reused) in {seconds:.2f}s "
+               f"({_rate(rows, seconds):,.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    report(f"total: {len(jobs) - failed}/{len(jobs)} files, {total_rows} rows in "
+           f"{elapsed:.2f}s ({_rate(total_rows, elapsed):,.0f} rows/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# google2atena_compress.py  HTTP の圧縮転送（Flask 非依存）
+# - 応答: Accept-Encoding を見て zstd / gzip で逐次圧縮する（zstd は zstandard がある場合のみ）
+# - 要求: Content-Encoding: gzip の本文を WSGI ミドルウェアで読みながら展開する
+#   （.csv.gz ファイルそのもののアップロードは google2atena_core.open_upload が展開する）
+
+import gzip
+import os
+import zlib
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+from google2atena_core import LimitedReader
+
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.environ.get("RESPONSE_ZSTD_LEVEL", "3"))
+
+def supported_encodings():
+    """応答に使える圧縮方式（優先順）"""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+def negotiate_encoding(accept_encoding):
+    """Accept-Encoding ヘッダから使う圧縮方式を選ぶ（無ければ None）。q=0 は拒否として扱う"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    for coding in supported_encodings():
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def iter_compressed(chunks, coding):
+    """バイトチャンクを coding（"gzip" / "zstd"）で逐次圧縮する。
+    チャンクごとに flush するので、変換済みの行はすぐにクライアントへ届く。"""
+    if coding == "zstd":
+        comp = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        sync, final = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+    else:
+        comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 → gzip 形式
+        sync, final = zlib.Z_SYNC_FLUSH, zlib.Z_FINISH
+    for chunk in chunks:
+        data = comp.compress(chunk) + comp.flush(sync)
+        if data:
+            yield data
+    yield comp.flush(final)
+
+class GunzipRequestMiddleware:
+    """Content-Encoding: gzip の要求本文を、フォーム解析の前に展開する WSGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_CONTENT_ENCODING", "").strip().lower() == "gzip":
+            environ["wsgi.input"] = LimitedReader(gzip.GzipFile(fileobj=environ["wsgi.input"], mode="rb"))
+            # 展開後の長さは分からないので、終端まで読ませる
+            environ.pop("CONTENT_LENGTH", None)
+            environ["wsgi.input_terminated"] = True
+            del environ["HTTP_CONTENT_ENCODING"]
+        return self.app(environ, start_response)
@@ -0,0 +1,1332 @@
+# google2atena_core.py  変換コア（Flask 非依存）
+# - google2atena.py（Web）と google2atena_cli.py（バッチ）が共有する行変換ロジック
+# - Flask を import しないので、cron などのバッチ起動が速い
+
+import codecs
+import csv
+import gzip
+import io
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
+
+try:
+    import chardet
+except Exception:
+    chardet = None
+
+# ======== 辞書 ========
+# 元データ（company_dicts.py ほか）から作った検索用の構造は google2atena_dicts が
+# スナップショットとして持ち、初回利用時に読み込む。
+
+from google2atena_dicts import (  # noqa: E402,F401
+    CITY_CODES, build_area_index, build_kana_trie, get_tables, on_reload, tables_loaded,
+)
+from google2atena_address import (  # noqa: E402,F401
+    address_lines, address_pattern, address_pattern_ready, split_address, split_address_column,
+    split_city,
+)
+from google2atena_merge import merge_rows  # noqa: E402
+from google2atena_postal import (  # noqa: E402
+    get_postal_index, postal_index_checked, postal_version,
+)
+from google2atena_rowcache import ROW_CACHE_BATCH, open_row_cache  # noqa: E402
+from google2atena_schema import (  # noqa: E402,F401
+    ATENA_COLUMNS, UnknownProfile, compile_emitter, get_profile, layout_key, profile_header,
+)
+
+# 従来のモジュール定数名 → get_tables() のキー（参照されたときに読み込む）
+_LAZY_TABLES = {
+    "COMPANY_EXCEPT": "company_except",
+    "KANJI_WORD_MAP": "kanji_word_map",
+    "EN_TO_KATAKANA": "en_to_katakana",
+    "CORP_TERMS": "corp_terms",
+    "AREA_CODES": "area_codes",
+    "AREA_INDEX": "area_index",
+    "KANA_TRIE": "kana_trie",
+}
+
+def __getattr__(name):
+    key = _LAZY_TABLES.get(name)
+    if key is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return get_tables()[key]
+
+# ======== 正規化キャッシュ ========
+# 同じ会社住所・代表番号・会社名が何度も出るため、正規化結果を LRU で再利用する。
+# functools.lru_cache はスレッドセーフなので gthread ワーカーでも共有できる。
+
+ADDRESS_CACHE_SIZE = int(os.environ.get("ADDRESS_CACHE_SIZE", "65536"))
+PHONE_CACHE_SIZE = int(os.environ.get("PHONE_CACHE_SIZE", "65536"))
+KANA_CACHE_SIZE = int(os.environ.get("KANA_CACHE_SIZE", "16384"))
+
+# ======== 住所ユーティリティ ========
+
+def _build_zenkaku_tables():
+    """半角→全角の変換表を作る（import 時に一度だけ）
+    - ASCII 0x21〜0x7E → 全角（'-' → '－'）。空白は住所分割に使うので変換しない
+    - 半角カナ → 全角カナ（濁点・半濁点付きは2文字→1文字の対応表を別に持つ）
+    表は BMP 全体の list（変換しない文字は自分自身。約2.4MB）。dict の表だと、表に無い文字（漢字・かな）の
+    たびに str.translate の中で KeyError が起きて遅い。BMP の外の文字は IndexError で素通しになる"""
+    table = list(range(0x10000))
+    for code in range(0x21, 0x7F):
+        table[code] = code + 0xFEE0
+    voiced = {}
+    for code in range(0xFF61, 0xFFA0):
+        table[code] = ord(unicodedata.normalize('NFKC', chr(code)))
+    # 単独の濁点・半濁点は結合文字ではなく ゛゜ にする
+    table[0xFF9E] = ord('゛')
+    table[0xFF9F] = ord('゜')
+    for code in range(0xFF66, 0xFF9E):
+        for mark in ('ﾞ', 'ﾟ'):
+            pair = chr(code) + mark
+            z = unicodedata.normalize('NFKC', pair)
+            if len(z) == 1:
+                voiced[pair] = z
+    return table, voiced
+
+ZENKAKU_TABLE, _ZENKAKU_VOICED = _build_zenkaku_tables()
+_VOICED_RE = re.compile("|".join(_ZENKAKU_VOICED))
+
+def to_zenkaku_for_address(s: str) -> str:
+    if not s:
+        return ""
+    if 'ﾞ' in s or 'ﾟ' in s:
+        s = _VOICED_RE.sub(lambda m: _ZENKAKU_VOICED[m.group()], s)
+    return s.translate(ZENKAKU_TABLE)
+
+def to_zenkaku_column(values):
+    """列単位の一括変換（空値は ""）"""
+    return [to_zenkaku_for_address(v) for v in values]
+
+def format_postal(postal: str) -> str:
+    if not postal:
+        return ""
+    digits = re.sub(r'\D', '', postal)
+    if len(digits) == 7:
+        return f"{digits[:3]}-{digits[3:]}"
+    return postal
+
+_SPLIT_RE = re.compile(r'[ \u3000]')
+
+def split_first_space(addr_full: str):
+    if not addr_full:
+        return ("", "")
+    m = _SPLIT_RE.search(addr_full)
+    if not m:
+        return (addr_full, "")
+    i = m.start()
+    return (addr_full[:i], addr_full[i+1:].strip())
+
+def build_addr12(region, city, street):
+    """(住所1, 住所2)。住所1 は都道府県〜番地、住所2 は建物（google2atena_address で分解）。
+    都道府県も市区町村も読み取れない住所（海外など）は従来どおり最初の空白で切る"""
+    full_z = to_zenkaku_for_address(region + city + street)
+    return address_lines(full_z) or split_first_space(full_z)
+
+def build_addr12_column(regions, cities, streets):
+    """列単位の build_addr12"""
+    return [build_addr12(r, c, s) for r, c, s in zip(regions, cities, streets)]
+
+def parse_formatted_address(formatted):
+    """Address n - Formatted が4〜5行の場合に対応"""
+    if not formatted:
+        return "", "", "", ""
+    lines = [l.strip() for l in formatted.splitlines() if l.strip()]
+    street = city = region = postal = ""
+    if len(lines) >= 5:
+        street, city, region, postal = lines[:4]
+    elif len(lines) == 4:
+        city_street, region, postal = lines[:3]
+        # 「渋谷区 道玄坂1-2」「渋谷区道玄坂1-2」どちらも市区町村の終わりで切る
+        _, city_part, rest = split_city(city_street)
+        if city_part:
+            city, street = city_street[:rest].rstrip(), city_street[rest:]
+        else:
+            city, street = split_first_space(city_street)
+    return region, city, street, postal
+
+# 1行の Formatted に紛れた 〒（郵便番号索引があるときだけ使う）
+_FORMATTED_POSTAL_RE = re.compile(r"〒\s*(\d{3})[-－‐ー]?(\d{4})")
+
+def _place(s):
+    return unicodedata.normalize("NFKC", s).replace(" ", "")
+
+def _same_place(given, official):
+    """表記の揺れ（全角半角・空白・「東京」と「東京都」）を許して比べる"""
+    given = _place(given)
+    return given.startswith(official) or official.startswith(given)
+
+def check_postal(region, city, street, postal):
+    """郵便番号索引で空の都道府県・市区町村・町名を補い、入力との食い違いを調べる。
+    (region, city, street, 注記) を返す。索引が無い・引けない 〒・食い違いがある場合は補わない"""
+    index = get_postal_index()
+    if index is None:
+        return region, city, street, ""
+    digits = re.sub(r"\D", "", unicodedata.normalize("NFKC", postal))
+    if len(digits) != 7:
+        return region, city, street, ""
+    found = index.lookup(digits)
+    if found is None:
+        return region, city, street, f"〒{digits[:3]}-{digits[3:]} は存在しません"
+    pref, town_city, town = (_place(s) for s in found)
+    given_city = _place(city)
+    if given_city.startswith(pref):
+        given_city = given_city[len(pref):]  # 市区町村の欄に都道府県から書いてある
+    wrong = [given for given, checked, official in ((region, region, pref),
+                                                     (city, given_city, town_city))
+             if checked and official and not _same_place(checked, official)]
+    if wrong:
+        return region, city, street, (f"〒{digits[:3]}-{digits[3:]} は {pref}{town_city}"
+                                      f"（入力: {'・'.join(wrong)}）")
+    # 市区町村・番地の欄に都道府県から書いてあることもあるので、先頭から順に読み進める
+    rest = _place(city + street)
+    if rest.startswith(pref):
+        rest = rest[len(pref):]
+    elif not region:
+        region = found[0]
+    if town_city:
+        if rest.startswith(town_city):
+            rest = rest[len(town_city):]
+        elif not city:
+            city = found[1]
+    # 番地だけの欄には町名を補う
+    if town and not rest.startswith(town) and (not street or rest[:1].isdigit()):
+        street = found[2] + street
+    return region, city, street, ""
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def build_address(formatted, region, city, street, postal):
+    """Address n の各項目 → (〒, 住所1, 住所2, 〒の注記)。
+    郵便番号索引（google2atena_postal）があれば空の都道府県・市区町村・町名を補い、
+    食い違いを注記に書く（無ければ注記は常に ""）"""
+    if formatted:
+        region_f, city_f, street_f, postal_f = parse_formatted_address(formatted)
+        region = region or region_f
+        city   = city or city_f
+        street = street or street_f
+        postal = postal or postal_f
+        if not postal and get_postal_index() is not None:
+            text = unicodedata.normalize("NFKC", formatted)
+            m = _FORMATTED_POSTAL_RE.search(text)
+            if m:
+                postal = m.group(1) + m.group(2)
+                if not (region or city or street):
+                    # 1〜3行の Formatted は分解できないので、〒 と国名を除いた残りを番地の欄に使う
+                    lines = (text[:m.start()] + text[m.end():]).splitlines()
+                    street = " ".join(l.strip() for l in lines
+                                      if l.strip() and l.strip() not in ("日本", "Japan", "JP"))
+
+    note = ""
+    if postal:
+        region, city, street, note = check_postal(region, city, street, postal)
+    jp_postal = format_postal(postal)
+    addr1, addr2 = build_addr12(region, city, street)
+    return (jp_postal, addr1, addr2, note)
+
+def address_dest(label):
+    """Address n - Label → 出力先（自宅 / その他 / 会社）"""
+    label = (label or "").strip().lower()
+    if label == 'home':
+        return "自宅"
+    if label == 'other':
+        return "その他"
+    return "会社"
+
+def route_address_by_label(row, out):
+    for n in row_slot_numbers(row, "Address"):
+        formatted = row.get(f"Address {n} - Formatted") or ""
+        region = row.get(f"Address {n} - Region") or ""
+        city   = row.get(f"Address {n} - City") or ""
+        street = row.get(f"Address {n} - Street") or ""
+        postal = row.get(f"Address {n} - Postal Code") or ""
+        if not (formatted or region or city or street or postal):
+            continue  # 空の住所欄で先に入った住所を消さない
+
+        jp_postal, addr1, addr2, _ = build_address(formatted, region, city, street, postal)
+        dest = address_dest(row.get(f"Address {n} - Label"))
+        out[f'{dest}〒']    = jp_postal
+        out[f'{dest}住所1'] = addr1
+        out[f'{dest}住所2'] = addr2
+        out[f'{dest}住所3'] = ""
+
+# ======== 電話番号整形 ========
+
+# 特番: 先頭番号 → (種別, {全体桁数: 区切り位置})。4桁の番号を先に引く（0800 は 080 の携帯ではない）
+SPECIAL_PREFIXES = {
+    "070": ("mobile", {11: (3, 7)}),
+    "080": ("mobile", {11: (3, 7)}),
+    "090": ("mobile", {11: (3, 7)}),
+    "050": ("ip", {11: (3, 7)}),
+    "0120": ("freedial", {10: (4, 7)}),
+    # 0800 は 0800-XXX-XXX（従来の10桁）と 0800-XXX-XXXX（11桁）
+    "0800": ("freedial", {10: (4, 7), 11: (4, 7)}),
+    "0570": ("navidial", {10: (4, 7)}),
+}
+
+_NON_DIGIT_RE = re.compile(r'\D')
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def classify_phone(val):
+    """電話番号1件を (種別, 整形済み番号) に変換する。空なら ("", "")。
+    種別: mobile / ip / freedial / navidial / geo / other"""
+    if not val:
+        return ("", "")
+    nums = _NON_DIGIT_RE.sub('', val)
+    if not nums:
+        return ("", "")
+    if nums[0] != '0':
+        nums = '0' + nums
+    size = len(nums)
+
+    special = SPECIAL_PREFIXES.get(nums[:4]) or SPECIAL_PREFIXES.get(nums[:3])
+    if special and size in special[1]:
+        kind, sizes = special
+        i, j = sizes[size]
+        return (kind, f"{nums[:i]}-{nums[i:j]}-{nums[j:]}")
+
+    if size == 10:
+        # 市外局番＋市内局番は常に6桁、加入者番号は4桁
+        for n, codes in get_tables()["area_index"]:
+            if nums[:n] in codes:
+                return ("geo", f"{nums[:n]}-{nums[n:6]}-{nums[6:]}")
+    elif size == 9:
+        return ("other", f"{nums[:2]}-{nums[2:5]}-{nums[5:]}")
+    return ("other", nums)
+
+def format_phone(val):
+    return classify_phone(val)[1]
+
+def format_phone_column(values):
+    """列単位の一括整形（1値ごとに整形済み番号、空値は ""）"""
+    return [classify_phone(v)[1] for v in values]
+
+def normalize_phones(phone_values):
+    phones = []
+    seen = set()
+    for formatted in format_phone_column(phone_values):
+        if formatted and formatted not in seen:
+            seen.add(formatted)
+            phones.append(formatted)
+    return ";".join(phones)
+
+# ======== メール整形 ========
+
+def normalize_emails(email_values):
+    emails = []
+    seen = set()
+    for val in email_values:
+        if not val:
+            continue
+        val = val.strip().replace(":", ";")
+        if val and val not in seen:
+            seen.add(val)
+            emails.append(val)
+    return ";".join(emails)
+
+# ======== メモ抽出 ========
+
+def extract_memos(row):
+    memos = []
+    for i in row_slot_numbers(row, "Relation"):
+        label = row.get(f"Relation {i} - Label", "")
+        value = row.get(f"Relation {i} - Value", "")
+        if label and "メモ" in label and value:
+            memos.append(value)
+    notes = row.get("Notes", "")
+    if notes:
+        memos.append(notes)
+    return memos
+
+# ======== 会社名かな変換 ========
+
+_TRIE_END = ""  # google2atena_dicts.build_kana_trie と同じ終端マーク
+
+def trie_rewrite(trie, text):
+    """左から1回だけ走査し、各位置で最長一致したキーを読みに置き換える。
+    1位置あたりの手間は最長キー長で頭打ちになり、辞書の件数には依存しない。"""
+    out = []
+    i = done = 0
+    n = len(text)
+    while i < n:
+        node = trie.get(text[i])
+        if node is None:
+            i += 1
+            continue
+        hit = node.get(_TRIE_END)
+        hit_end = i + 1
+        j = i + 1
+        while j < n:
+            node = node.get(text[j])
+            if node is None:
+                break
+            j += 1
+            if _TRIE_END in node:
+                hit = node[_TRIE_END]
+                hit_end = j
+        if hit is None:
+            i += 1
+            continue
+        out.append(text[done:i])
+        out.append(hit)
+        i = done = hit_end
+    if not out:
+        return text
+    out.append(text[done:])
+    return "".join(out)
+
+# 英字の読み（EN_TO_KATAKANA）を当てる語: 前後が英数字・記号でない大文字だけの語、
+# または単独の記号（"A & B" の & など）。"Acme" の A や "NTT-Data" の NTT・- は読み換えない
+_EN_TOKEN_RE = re.compile(r"(?<![A-Za-z0-9&+\-])(?:[A-Z]+|[&+\-])(?![A-Za-z0-9&+\-])")
+
+def rewrite_en_tokens(en_map, text):
+    """独立した大文字の語・記号を読みに置き換える。語全体が辞書にあればその読み、
+    無ければ1文字ずつの読み（読めない文字があればそのまま）"""
+    def reading(m):
+        token = m.group()
+        if token in en_map:
+            return en_map[token]
+        if all(ch in en_map for ch in token):
+            return "".join(en_map[ch] for ch in token)
+        return token
+
+    return _EN_TOKEN_RE.sub(reading, text)
+
+def kana_company_name(name, tables=None):
+    """会社名 → よみ。tables（get_tables() の戻り値）を省略すると現在の版を使う"""
+    return _kana_company_name(name, tables or get_tables())
+
+# 辞書の版（tables の同一性）もキーに含めるので、差し替え前後の結果は混ざらない
+@lru_cache(maxsize=KANA_CACHE_SIZE)
+def _kana_company_name(name, tables):
+    if not name:
+        return ""
+    company_except = tables["company_except"]
+    if name in company_except:
+        return company_except[name]
+    return rewrite_en_tokens(tables["en_to_katakana"], trie_rewrite(tables["kana_trie"], name))
+
+# 差し替え後は旧版のキャッシュを捨てる（旧版の辞書一式をメモリに残さない）
+on_reload(lambda tables: _kana_company_name.cache_clear())
+
+# ======== キャッシュ統計 ========
+
+CACHED_NORMALIZERS = {
+    "address": build_address,
+    "phone": classify_phone,
+    "kana": _kana_company_name,
+}
+
+def cache_stats():
+    """各キャッシュの hits / misses / evictions / size を返す。
+    lru_cache は満杯のときだけ追い出すので evictions = misses - currsize"""
+    stats = {}
+    for name, fn in CACHED_NORMALIZERS.items():
+        info = fn.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "evictions": max(0, info.misses - info.currsize),
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+    return stats
+
+def clear_caches():
+    for fn in CACHED_NORMALIZERS.values():
+        fn.cache_clear()
+
+# ======== 起動時の準備 ========
+
+_warm_lock = threading.Lock()
+_warm_thread = None
+
+def warm_up():
+    """検索用の構造（辞書一式・郵便番号索引・住所の正規表現）を先に作る。
+    gunicorn の preload_app で fork 前に呼べば、ワーカーはコピーオンライトで共有する"""
+    get_tables()
+    address_pattern()  # 郵便番号索引も開く
+
+def warm_up_in_background():
+    """warm_up を別スレッドで1度だけ始める（preload なしで起動した場合の /ready 用）"""
+    global _warm_thread
+    with _warm_lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_thread.start()
+
+def readiness():
+    """{構造名: 準備済みか}。確認するだけで準備は起こさない"""
+    return {
+        "dictionaries": tables_loaded(),
+        "postal_index": postal_index_checked(),
+        "address_pattern": address_pattern_ready(),
+    }
+
+# ======== 行プラン（ヘッダから列位置を一度だけ解決） ========
+
+_SLOT_RE = re.compile(r"(Phone|E-mail|Address|Relation) (\d+) - (.+)")
+
+def scan_slots(header):
+    """ヘッダ（列名の反復子）から番号付きの列を拾い、
+    {種別: {番号: {項目名: 列位置}}} を返す。種別は Phone / E-mail / Address / Relation"""
+    slots = {}
+    for idx, name in enumerate(header):
+        m = _SLOT_RE.fullmatch(name or "")
+        if m:
+            kind, n, field = m.groups()
+            slots.setdefault(kind, {}).setdefault(int(n), {})[field] = idx
+    return slots
+
+@lru_cache(maxsize=64)
+def _slot_numbers(keys, kind):
+    return tuple(sorted(scan_slots(keys).get(kind, {})))
+
+def row_slot_numbers(row, kind):
+    """dict 行に存在する kind の番号（昇順）。同じヘッダなら2回目以降はキャッシュから返す"""
+    return _slot_numbers(tuple(row), kind)
+
+# 段階別計測の名前（compile_row_plan の stage_seconds と同じ並び。csv_write は呼び出し側で計測）
+STAGES = ("address", "phone", "email", "memo", "kana", "row_cache", "merge", "csv_write")
+_ROW_CACHE_STAGE = STAGES.index("row_cache")
+_MERGE_STAGE = STAGES.index("merge")
+
+class _PlanInputs:
+    """ヘッダと列定義から解決した、行プラン・チャンクプラン共通の列位置"""
+
+    def __init__(self, header, columns):
+        self.width = len(header)
+        col = {name: i for i, name in enumerate(header)}  # 重複列は後勝ち（DictReader と同じ）
+        slots = scan_slots(header)
+        self.emit, needs = compile_emitter(columns, col)
+
+        def slot_cols(kind, *fields):
+            return [tuple(s.get(f, -1) for f in fields)
+                    for _, s in sorted(slots.get(kind, {}).items())]
+
+        self.phone_cols = [i for (i,) in slot_cols("Phone", "Value")]
+        self.email_cols = [i for (i,) in slot_cols("E-mail", "Value")]
+        self.addr_cols = slot_cols("Address", "Label", "Formatted", "Region", "City", "Street",
+                                   "Postal Code")
+        self.rel_cols = slot_cols("Relation", "Label", "Value")
+        self.i_notes, self.i_org = col.get("Notes", -1), col.get("Organization Name", -1)
+        # 入力をそのまま出す列（チャンクプランで文字列を共有させる）
+        self.copy_cols = sorted({col.get(source[4:], -1) for _, source in columns
+                                 if source.startswith("col:")} - {-1})
+        self.need_address, self.need_phone, self.need_email, self.need_memo, self.need_kana = (
+            stage in needs for stage in ("address", "phone", "email", "memo", "kana"))
+
+_EMPTY_ADDR = ("", "", "", "")
+_NO_MEMOS = ("",) * 5
+
+def compile_row_plan(header, stage_seconds=None, tables=None, columns=ATENA_COLUMNS):
+    """ヘッダから列位置を解決し、csv.reader の1行(list) → 出力の1行(tuple)
+    を返す関数を作る。存在しない列は行末に足した "" (位置 -1) を参照する。
+    出力の並びは columns（google2atena_schema の列定義）から生成し、使わない段階は計算しない。
+    stage_seconds（STAGES と同じ長さの list）を渡すと段階ごとの累積秒数を足し込む。
+    tables（辞書一式）は省略時に現在の版を固定し、以後の差し替えの影響を受けない。"""
+    if stage_seconds is None:
+        stage_seconds = [0.0] * len(STAGES)
+    if tables is None:
+        tables = get_tables()
+    clock = time.perf_counter
+    p = _PlanInputs(header, columns)
+    width, emit = p.width, p.emit
+    phone_cols, email_cols, addr_cols, rel_cols = p.phone_cols, p.email_cols, p.addr_cols, p.rel_cols
+    i_notes, i_org = p.i_notes, p.i_org
+    need_address, need_phone, need_email, need_memo, need_kana = (
+        p.need_address, p.need_phone, p.need_email, p.need_memo, p.need_kana)
+    empty_addr = _EMPTY_ADDR
+    no_memos = _NO_MEMOS
+
+    def convert(values):
+        if len(values) < width:
+            values.extend([""] * (width - len(values)))
+        values.append("")
+        t0 = clock()
+
+        # --- 住所 ---
+        home = work = other = empty_addr
+        if need_address:
+            addrs = {}
+            for li, fi, ri, ci, si, pi in addr_cols:
+                formatted, region, city, street, postal = (
+                    values[fi], values[ri], values[ci], values[si], values[pi])
+                if formatted or region or city or street or postal:
+                    addrs[address_dest(values[li])] = build_address(
+                        formatted, region, city, street, postal)
+            home = addrs.get("自宅", empty_addr)
+            work = addrs.get("会社", empty_addr)
+            other = addrs.get("その他", empty_addr)
+        t1 = clock()
+
+        # --- 電話・メール ---
+        phones = normalize_phones([values[i] for i in phone_cols]) if need_phone else ""
+        t2 = clock()
+        emails = normalize_emails([values[i] for i in email_cols]) if need_email else ""
+        t3 = clock()
+
+        # --- メモ ---
+        memos = no_memos
+        if need_memo:
+            memos = [values[vi] for li, vi in rel_cols
+                     if values[vi] and "メモ" in values[li]]
+            if values[i_notes]:
+                memos.append(values[i_notes])
+            memos = (memos + [""] * 5)[:5]
+        t4 = clock()
+
+        # --- 会社名かな ---
+        company_kana = _kana_company_name(values[i_org], tables) if need_kana else ""
+        t5 = clock()
+
+        stage_seconds[0] += t1 - t0
+        stage_seconds[1] += t2 - t1
+        stage_seconds[2] += t3 - t2
+        stage_seconds[3] += t4 - t3
+        stage_seconds[4] += t5 - t4
+
+        return emit(values, home, work, other, phones, emails, memos, company_kana)
+
+    return convert
+
+# ======== チャンクプラン（列単位で重複を除いて変換） ========
+# 実際の連絡先は空欄と同じ値（会社名・ラベル・代表番号・会社の住所）の繰り返しが大半なので、
+# チャンク内の行を列に組み替え、正規化は列ごとの異なる値に1回だけ掛けて各行へ配り直す。
+# 同じ値の結果は同じ文字列オブジェクトを共有する（出力をまとめて抱える merge でメモリが減る）。
+
+# 1チャンクの行数。0 なら従来の行プランで1行ずつ変換する
+COLUMNAR_CHUNK_ROWS = int(os.environ.get("COLUMNAR_CHUNK_ROWS", "500"))
+# 入力をそのまま出す列の文字列を共有させる表の上限（超えたら作り直す）
+INTERN_MAX_VALUES = int(os.environ.get("INTERN_MAX_VALUES", "65536"))
+
+def _getter(cols):
+    """列位置の list → 行から値の tuple を取り出す関数（1列でも tuple を返す）"""
+    if len(cols) == 1:
+        i = cols[0]
+        return lambda values: (values[i],)
+    return itemgetter(*cols)
+
+def _distinct_map(keys, fn):
+    """keys の異なる値ごとに fn を1回だけ呼び、keys と同じ並びの結果の list を返す"""
+    done = dict.fromkeys(keys)
+    for key in done:
+        done[key] = fn(key)
+    return list(map(done.__getitem__, keys))
+
+def compile_chunk_plan(header, stage_seconds=None, tables=None, columns=ATENA_COLUMNS):
+    """compile_row_plan の列単位版。csv.reader の行(list)の list → 出力行(tuple)の list
+    を返す関数を作る（出力は行プランと同一）。引数は compile_row_plan と同じ。"""
+    if stage_seconds is None:
+        stage_seconds = [0.0] * len(STAGES)
+    if tables is None:
+        tables = get_tables()
+    clock = time.perf_counter
+    p = _PlanInputs(header, columns)
+    width, emit = p.width, p.emit
+    addr_getters = [(li, itemgetter(fi, ri, ci, si, pi)) for li, fi, ri, ci, si, pi in p.addr_cols]
+    no_addr = ("",) * 5
+    phone_get = _getter(p.phone_cols) if p.need_phone and p.phone_cols else None
+    email_get = _getter(p.email_cols) if p.need_email and p.email_cols else None
+    copy_cols = p.copy_cols
+    interned = {}
+
+    def convert_rows(records):
+        n = len(records)
+        for values in records:
+            if len(values) < width:
+                values.extend([""] * (width - len(values)))
+            values.append("")
+        t0 = clock()
+
+        # --- 住所（入力の5項目の組ごとに1回） ---
+        # repeat は反復子なので列ごとに別々に作る（1つを共有すると行が間引かれる）
+        home, work, other = repeat(_EMPTY_ADDR, n), repeat(_EMPTY_ADDR, n), repeat(_EMPTY_ADDR, n)
+        if p.need_address and addr_getters:
+            dests = {"自宅": [_EMPTY_ADDR] * n, "会社": [_EMPTY_ADDR] * n,
+                     "その他": [_EMPTY_ADDR] * n}
+            built = {no_addr: None}
+            labels = {}
+            for li, get in addr_getters:
+                keys = list(map(get, records))
+                for key in dict.fromkeys(keys):
+                    if key not in built:
+                        built[key] = build_address(*key)
+                for r, key in enumerate(keys):
+                    addr = built[key]
+                    if addr is not None:
+                        label = records[r][li]
+                        dest = labels.get(label)
+                        if dest is None:
+                            dest = labels[label] = address_dest(label)
+                        dests[dest][r] = addr
+            home, work, other = dests["自宅"], dests["会社"], dests["その他"]
+        t1 = clock()
+
+        # --- 電話・メール（値の組ごとに1回） ---
+        phones = (_distinct_map(list(map(phone_get, records)), normalize_phones)
+                  if phone_get else repeat("", n))
+        t2 = clock()
+        emails = (_distinct_map(list(map(email_get, records)), normalize_emails)
+                  if email_get else repeat("", n))
+        t3 = clock()
+
+        # --- メモ（正規化しないので行ごとに拾うだけ） ---
+        memos = repeat(_NO_MEMOS, n)
+        if p.need_memo:
+            rel_cols, i_notes = p.rel_cols, p.i_notes
+            memos = []
+            for values in records:
+                found = [values[vi] for li, vi in rel_cols if values[vi] and "メモ" in values[li]]
+                if values[i_notes]:
+                    found.append(values[i_notes])
+                memos.append((found + [""] * 5)[:5] if found else _NO_MEMOS)
+        t4 = clock()
+
+        # --- 会社名かな（会社名ごとに1回） ---
+        if p.need_kana:
+            kana = _kana_company_name
+            i_org = p.i_org
+            company_kana = _distinct_map([values[i_org] for values in records],
+                                         lambda name: kana(name, tables))
+        else:
+            company_kana = repeat("", n)
+        t5 = clock()
+
+        stage_seconds[0] += t1 - t0
+        stage_seconds[1] += t2 - t1
+        stage_seconds[2] += t3 - t2
+        stage_seconds[3] += t4 - t3
+        stage_seconds[4] += t5 - t4
+
+        # そのまま出す列は同じ値を同じ文字列オブジェクトにそろえる
+        if copy_cols:
+            if len(interned) > INTERN_MAX_VALUES:
+                interned.clear()
+            share = interned.setdefault
+            for values in records:
+                for i in copy_cols:
+                    v = values[i]
+                    if v:
+                        values[i] = share(v, v)
+
+        return list(map(emit, records, home, work, other, phones, emails, memos, company_kana))
+
+    return convert_rows
+
+def compile_batch_plan(header, stage_seconds=None, tables=None, columns=ATENA_COLUMNS):
+    """行の list → 出力行の list の関数。COLUMNAR_CHUNK_ROWS=0 なら行プランを1行ずつ掛ける"""
+    if COLUMNAR_CHUNK_ROWS > 0:
+        return compile_chunk_plan(header, stage_seconds, tables, columns)
+    plan = compile_row_plan(header, stage_seconds, tables, columns)
+    return lambda records: list(map(plan, records))
+
+# ======== 変換本体（ストリーミング） ========
+
+ATENA_HEADER = profile_header(ATENA_COLUMNS)
+
+# 1チャンクあたりの目安サイズ（文字数）。これを超えたら送出する
+STREAM_CHUNK_CHARS = 64 * 1024
+UPLOAD_READ_BYTES = 64 * 1024
+
+class CountingReader:
+    """read() したバイト数を pos に数えるだけのラッパー"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.pos = 0
+
+    def read(self, n=-1):
+        data = self.raw.read(n)
+        self.pos += len(data)
+        return data
+
+# ======== 文字コード判定 ========
+
+# 判定に使う先頭サンプルの大きさ（ファイルサイズによらず一定）
+ENCODING_SAMPLE_BYTES = 32 * 1024
+
+# chardet の判定名 → 実際にデコードに使う名前
+_CHARDET_ENCODINGS = {
+    "ascii": "utf-8-sig",
+    "utf-8": "utf-8-sig",
+    "utf-8-sig": "utf-8-sig",
+    "shift_jis": "cp932",
+    "cp932": "cp932",
+    "windows-31j": "cp932",
+    "utf-16": "utf-16",
+    "utf-16le": "utf-16-le",
+    "utf-16be": "utf-16-be",
+}
+
+class PrefixedReader:
+    """先読みしたバイト列 head を返してから、残りを raw から読むラッパー。
+    read(n) は n バイトそろうか EOF になるまで raw から読み足す（head の分だけで返さない）"""
+
+    def __init__(self, head, raw):
+        self.head = head
+        self.raw = raw
+
+    def read(self, n=-1):
+        if not self.head:
+            return self.raw.read(n)
+        if n is None or n < 0:
+            data, self.head = self.head + self.raw.read(), b""
+            return data
+        if len(self.head) >= n:
+            data, self.head = self.head[:n], self.head[n:]
+            return data
+        parts = [self.head]
+        size = len(self.head)
+        self.head = b""
+        while size < n:
+            more = self.raw.read(n - size)
+            if not more:
+                break
+            parts.append(more)
+            size += len(more)
+        return b"".join(parts)
+
+def _decodes(sample, encoding):
+    """sample が encoding として正しいか（末尾で文字が切れていても可）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def detect_encoding(sample):
+    """先頭サンプル → (encoding, confidence)。utf-8-sig / cp932 / utf-16 のいずれかを返す"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return ("utf-8-sig", 1.0)
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return ("utf-16", 1.0)
+    if not sample:
+        return ("utf-8-sig", 1.0)
+    # BOM なし UTF-16: ASCII 部分（区切りのカンマや列名）の上位バイトが NUL になり、
+    # NUL が偶数・奇数どちらか一方の位置に偏る
+    even_nul, odd_nul = sample[0::2].count(0), sample[1::2].count(0)
+    if odd_nul > len(sample) // 8 and even_nul * 16 < odd_nul:
+        return ("utf-16-le", 0.9)
+    if even_nul > len(sample) // 8 and odd_nul * 16 < even_nul:
+        return ("utf-16-be", 0.9)
+    if _decodes(sample, "utf-8"):
+        return ("utf-8-sig", 1.0)
+    if chardet is not None:
+        guess = chardet.detect(sample)
+        encoding = _CHARDET_ENCODINGS.get((guess.get("encoding") or "").lower())
+        if encoding and _decodes(sample, encoding):
+            return (encoding, round(guess.get("confidence") or 0.0, 2))
+    if _decodes(sample, "cp932"):
+        return ("cp932", 0.5)
+    # 判定できない場合は従来どおり UTF-8 として置換文字で読む
+    return ("utf-8-sig", 0.0)
+
+def sniff_encoding(stream, sample_size=ENCODING_SAMPLE_BYTES):
+    """stream の先頭 sample_size バイトだけで文字コードを判定する。
+    (encoding, confidence, 先読み分を含めて最初から読めるストリーム) を返す。"""
+    sample = stream.read(sample_size)
+    encoding, confidence = detect_encoding(sample)
+    return encoding, confidence, PrefixedReader(sample, stream)
+
+# ======== 圧縮アップロード ========
+
+GZIP_MAGIC = b"\x1f\x8b"
+# 展開後の上限（小さな .gz が巨大な CSV に化けるのを防ぐ）
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("MAX_DECOMPRESSED_BYTES", str(2 * 1024 ** 3)))
+
+class DecompressedTooLarge(ValueError):
+    """展開後のサイズが MAX_DECOMPRESSED_BYTES を超えた"""
+
+class LimitedReader:
+    """limit バイトを超えて読もうとしたら DecompressedTooLarge を送出するラッパー"""
+
+    def __init__(self, raw, limit=MAX_DECOMPRESSED_BYTES):
+        self.raw = raw
+        self.limit = limit
+        self.pos = 0
+
+    def read(self, n=-1):
+        data = self.raw.read(n)
+        self.pos += len(data)
+        if self.pos > self.limit:
+            raise DecompressedTooLarge(f"展開後のサイズが上限（{self.limit} バイト）を超えました")
+        return data
+
+def open_upload(stream):
+    """先頭2バイトを見て gzip なら読みながら展開する。
+    (最初から読めるストリーム, "gzip" または None) を返す。"""
+    head = stream.read(2)
+    source = PrefixedReader(head, stream)
+    if head == GZIP_MAGIC:
+        return LimitedReader(gzip.GzipFile(fileobj=source, mode="rb")), "gzip"
+    return source, None
+
+# ======== ディスク上のアップロード ========
+
+# これより小さいアップロードは mmap せずにそのまま読む
+MAP_UPLOAD_MIN_BYTES = 1024 * 1024
+
+class MappedReader:
+    """ディスク上のファイルを mmap し、read(n) で要求した分だけ切り出すリーダー。
+    ファイル全体をヒープに読み込まない（中身はページキャッシュに置いたまま）。
+    使い終わったら close する（with 文でもよい。元のファイルは閉じない）"""
+
+    def __init__(self, f):
+        f.flush()  # 書き込み直後の一時ファイルでも、書いた内容が mmap から見えるようにする
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = f.tell()
+
+    def read(self, n=-1):
+        end = len(self.mm) if n is None or n < 0 else min(self.pos + n, len(self.mm))
+        data = self.mm[self.pos:end]
+        self.pos = end
+        return data
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = (0, self.pos, len(self.mm))[whence]
+        self.pos = min(max(base + offset, 0), len(self.mm))
+        return self.pos
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _remaining_bytes(stream):
+    """読み取り位置から末尾までのバイト数（読み取り位置は変えない）"""
+    pos = stream.tell()
+    end = stream.seek(0, os.SEEK_END)
+    stream.seek(pos)
+    return end - pos
+
+def map_upload(stream, min_bytes=MAP_UPLOAD_MIN_BYTES):
+    """ディスク上のアップロード（一時ファイル・通常のファイル）を MappedReader にする。
+    min_bytes 未満のものや mmap できないもの（パイプ）はそのまま返す。
+    SpooledTemporaryFile は fileno() でディスクへ書き出されてしまうので、
+    min_bytes にはメモリ上に置く上限（max_size）より大きい値を渡すこと"""
+    try:
+        if _remaining_bytes(stream) < min_bytes:
+            return stream
+        return MappedReader(stream)
+    except (AttributeError, OSError, ValueError):
+        return stream
+
+def upload_size(stream):
+    """アップロードの展開後のバイト数（読み取り位置は変えない。分からなければ None）。
+    gzip は末尾の ISIZE（最後のメンバーの展開後のサイズ mod 2**32）で見積もる"""
+    try:
+        pos = stream.tell()
+        size = _remaining_bytes(stream)
+        if size < 18:  # gzip のヘッダと末尾より短い
+            return size
+        head = stream.read(2)
+        stream.seek(-4, os.SEEK_END)
+        tail = stream.read(4)
+        stream.seek(pos)
+    except (AttributeError, OSError, ValueError):
+        return None
+    if head == GZIP_MAGIC:
+        return int.from_bytes(tail, "little")
+    return size
+
+def iter_upload_text(stream, encoding="utf-8-sig", chunk_size=UPLOAD_READ_BYTES):
+    """バイトストリームを少しずつ読み、改行単位のテキストとして返す。
+    BOM はインクリメンタルデコーダ側で除去される（utf-8-sig / utf-16）。"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        text = pending + decoder.decode(chunk, final=final)
+        # 改行で終わっていない末尾は次のチャンクへ持ち越す
+        cut = len(text) if final else text.rfind("\n") + 1
+        pending = text[cut:]
+        # StringIO の行分割は "\n" のみ（従来の StringIO(text) 経由と同じ）
+        yield from io.StringIO(text[:cut])
+        if final:
+            break
+
+def _cache_layout(columns):
+    """行キャッシュの namespace に混ぜる出力側の版（列定義と郵便番号索引）"""
+    return f"{layout_key(columns)}\x1d{postal_version()}"
+
+def _timed_merge(rows, header, stage_seconds, stats):
+    """merge_rows の所要時間から、上流の行変換に掛かった時間を除いて merge 段階に足す"""
+    merged = merge_rows(rows, header, stats)
+    clock = time.perf_counter
+    while True:
+        t = clock()
+        before = sum(stage_seconds[:_MERGE_STAGE])
+        row = next(merged, None)
+        stage_seconds[_MERGE_STAGE] += clock() - t - (sum(stage_seconds[:_MERGE_STAGE]) - before)
+        if row is None:
+            return
+        yield row
+
+def _timed_cache_batch(cache, batch, convert_rows, stage_seconds):
+    """行キャッシュ経由でバッチを変換し、行変換以外（検索・書き込み）の時間を row_cache 段階に足す"""
+    clock = time.perf_counter
+    t = clock()
+    before = sum(stage_seconds[:_ROW_CACHE_STAGE])
+    out = cache.convert_batch(batch, convert_rows)
+    stage_seconds[_ROW_CACHE_STAGE] += clock() - t - (sum(stage_seconds[:_ROW_CACHE_STAGE]) - before)
+    return out
+
+def iter_converted_text(lines, chunk_chars=STREAM_CHUNK_CHARS, stats=None, tables=None,
+                        merge=False, row_cache=True, columns=ATENA_COLUMNS, slow_rows=None):
+    """CSVテキスト行の反復子を受け取り、変換済みCSVを文字列チャンクで返す。
+    stats に dict を渡すと、変換した行数を stats["rows"] に、
+    段階別の累積秒数を stats["stages"]（STAGES をキーにした dict）に記録する。
+    tables を省略すると開始時点の辞書の版で最後まで変換する。
+    merge=True なら重複連絡先を1行にまとめる（google2atena_merge。全行を読んでから出力が始まる）。
+    row_cache=True なら（ROW_CACHE_PATH を設定していれば）前回までの変換結果を行単位で再利用し
+    （google2atena_rowcache）、stats["rows_reused"] / stats["rows_recomputed"] に件数を記録する。
+    columns（google2atena_schema の列定義）で出力の並びを変えられる。
+    slow_rows（google2atena_profile.SlowRows）を渡すと行キャッシュを使わずに1行ずつ変換し、
+    行ごとの所要時間を slow_rows.add(秒, 行番号, CSV の行, 値) に渡す（プロファイル用）。"""
+    tables = tables or get_tables()
+    reader = csv.reader(lines)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    out_header = profile_header(columns)
+
+    writer.writerow(out_header)
+    # ヘッダは即座に送り、最初の1バイトまでの時間をファイルサイズに依存させない
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+
+    header = next(reader, None)
+    if header is None:
+        return
+    stage_seconds = [0.0] * len(STAGES)
+    convert_rows = compile_batch_plan(header, stage_seconds, tables, columns)
+    clock = time.perf_counter
+    rows = 0
+    cache = (open_row_cache(header, tables["version"], layout=_cache_layout(columns))
+             if row_cache and slow_rows is None else None)
+    if cache is not None:
+        batch_rows = ROW_CACHE_BATCH
+    else:
+        batch_rows = COLUMNAR_CHUNK_ROWS or 1
+
+    def convert_batch(batch):
+        if cache is None:
+            return convert_rows(batch)
+        return _timed_cache_batch(cache, batch, convert_rows, stage_seconds)
+
+    def timed_rows():
+        nonlocal rows
+        plan = compile_row_plan(header, stage_seconds, tables, columns)
+        slow_rows.header = header
+        line = reader.line_num + 1
+        for values in reader:
+            if values:
+                rows += 1
+                t = clock()
+                out = plan(values)
+                slow_rows.add(clock() - t, rows, line, values)
+                yield out
+            line = reader.line_num + 1
+
+    def converted_rows():
+        nonlocal rows
+        batch = []
+        for values in reader:
+            if not values:
+                continue  # 空行（DictReader と同じく読み飛ばす）
+            rows += 1
+            batch.append(values)
+            if len(batch) >= batch_rows:
+                yield from convert_batch(batch)
+                batch = []
+        if batch:
+            yield from convert_batch(batch)
+
+    out_rows = converted_rows() if slow_rows is None else timed_rows()
+    if merge:
+        out_rows = _timed_merge(out_rows, out_header, stage_seconds, stats)
+    try:
+        for out in out_rows:
+            t = clock()
+            writer.writerow(out)
+            stage_seconds[-1] += clock() - t
+            if buf.tell() >= chunk_chars:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+
+        if buf.tell():
+            yield buf.getvalue()
+    finally:
+        if cache is not None:
+            cache.close()
+        if stats is not None:
+            stats["rows"] = rows
+            stats["stages"] = dict(zip(STAGES, stage_seconds))
+            stats["rows_reused"] = cache.hits if cache is not None else 0
+            stats["rows_recomputed"] = cache.misses if cache is not None else rows
+
+# ======== 並列変換（行チャンク × プロセスプール） ========
+
+# これ以上のアップロードはプロセスプールで並列変換する
+PARALLEL_MIN_BYTES = int(os.environ.get("PARALLEL_MIN_BYTES", str(8 * 1024 * 1024)))
+# 1プロセスあたりの変換プールの大きさ。0 なら convert_workers() が決める
+CONVERT_WORKERS = int(os.environ.get("CONVERT_WORKERS", "0"))
+PARALLEL_CHUNK_ROWS = 2000
+
+def _cgroup_cpu_limit():
+    """cgroup の CPU 上限（コア数。v2 の cpu.max / v1 の cfs_quota）。無ければ None"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def available_cpus():
+    """このプロセスが使える CPU 数（CPU の割り当てと cgroup の上限を反映する。
+    コンテナでは os.cpu_count() がホストのコア数を返すため）"""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        n = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit:
+        n = min(n, math.ceil(limit))
+    return max(1, n)
+
+def convert_workers():
+    """変換プールの大きさ。CONVERT_WORKERS が無ければ、使える CPU を Web のワーカー数
+    （WEB_CONCURRENCY。gunicorn.conf.py が設定する）で分け合う"""
+    if CONVERT_WORKERS > 0:
+        return CONVERT_WORKERS
+    web_workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+    return max(1, available_cpus() // web_workers)
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_plans = {}
+_worker_tables = None
+
+def pool_context():
+    """プロセスプールの起動方式。gthread ワーカーのようにスレッドが動いているプロセスから fork すると
+    ロックを抱えたまま複製されることがあるので、子は forkserver（無い環境では spawn）から起こす"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def get_process_pool(workers=None):
+    """変換用プロセスプール（初回呼び出し時に生成し、以後使い回す）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers or convert_workers(),
+                                        mp_context=pool_context())
+        return _pool
+
+def iter_raw_records(lines):
+    """csv.reader にレコード境界を判定させ、(値リスト, レコードの生テキスト) を返す。
+    引用符内の改行（複数行の Notes など）も1レコードとしてまとまる。"""
+    consumed = []
+
+    def tap():
+        for line in lines:
+            consumed.append(line)
+            yield line
+
+    for values in csv.reader(tap()):
+        raw = "".join(consumed)
+        consumed.clear()
+        yield values, raw
+
+def _use_worker_tables(tables):
+    global _worker_tables
+    _worker_tables = tables
+    _worker_plans.clear()
+    _kana_company_name.cache_clear()
+
+def convert_chunk(header, text, version, row_cache=False, columns=ATENA_COLUMNS, tables=None):
+    """ワーカー側: 行チャンク（CSVテキスト）を変換し、
+    (CSV テキスト, 段階別秒数, 再利用した行数, 変換した行数) を返す。
+    親が固定した辞書の版 version だけを受け取り、ワーカーは自分で読んだ同じ版を使う
+    （ワーカーごとに別の版で変換しない）。ワーカーの版が違えば None を返すので、
+    親は辞書一式 tables を付けて送り直す"""
+    if _worker_tables is None or _worker_tables["version"] != version:
+        if tables is None:
+            tables = get_tables()
+            if tables["version"] != version:
+                return None
+        _use_worker_tables(tables)
+    tables = _worker_tables  # 同じ版は同じオブジェクトにして、かなキャッシュを効かせる
+    key = (tuple(header), columns)
+    if key not in _worker_plans:
+        stage_seconds = [0.0] * len(STAGES)
+        _worker_plans[key] = (compile_batch_plan(header, stage_seconds, tables, columns),
+                              stage_seconds)
+    plan, stage_seconds = _worker_plans[key]
+    before = list(stage_seconds)
+    clock = time.perf_counter
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    records = [values for values in csv.reader(io.StringIO(text)) if values]
+    cache = (open_row_cache(header, tables["version"], layout=_cache_layout(columns))
+             if row_cache else None)
+    if cache is None:
+        converted = plan(records)  # チャンク（PARALLEL_CHUNK_ROWS 行）をまとめて変換
+    else:
+        try:
+            converted = []
+            for i in range(0, len(records), ROW_CACHE_BATCH):
+                converted += _timed_cache_batch(
+                    cache, records[i:i + ROW_CACHE_BATCH], plan, stage_seconds)
+        finally:
+            cache.close()
+    for out in converted:
+        t = clock()
+        writer.writerow(out)
+        stage_seconds[-1] += clock() - t
+    reused, recomputed = (cache.hits, cache.misses) if cache is not None else (0, len(records))
+    return buf.getvalue(), [a - b for a, b in zip(stage_seconds, before)], reused, recomputed
+
+def iter_converted_text_parallel(lines, workers=None, chunk_rows=PARALLEL_CHUNK_ROWS, stats=None,
+                                 tables=None, row_cache=True, columns=ATENA_COLUMNS):
+    """iter_converted_text の並列版。行チャンクをプロセスプールで変換し、
+    元の順序のまま返す（出力は直列版とバイト単位で同一）。
+    同時に抱えるチャンク数は workers × 2 までに抑える。"""
+    workers = workers or convert_workers()
+    pool = get_process_pool(workers)
+    tables = tables or get_tables()
+
+    buf = io.StringIO()
+    csv.writer(buf).writerow(profile_header(columns))
+    yield buf.getvalue()
+
+    records = iter_raw_records(lines)
+    first = next(records, None)
+    if first is None:
+        return
+    header = first[0]
+
+    pending = deque()
+    chunk = []
+    rows = 0
+    stage_seconds = [0.0] * len(STAGES)
+    counts = {"rows_reused": 0, "rows_recomputed": 0}
+    # チャンクには辞書の版だけを付ける（辞書一式を毎回 pickle しない）。
+    # 版の違うワーカーがいれば、以後は辞書一式を付けて送る
+    shipped = {"tables": None}
+
+    def submit(text):
+        return pool.submit(convert_chunk, header, text, tables["version"], row_cache, columns,
+                           shipped["tables"])
+
+    def collect():
+        future, text = pending.popleft()
+        result = future.result()
+        if result is None:
+            shipped["tables"] = tables
+            result = submit(text).result()
+        text, seconds, reused, recomputed = result
+        for i, sec in enumerate(seconds):
+            stage_seconds[i] += sec
+        counts["rows_reused"] += reused
+        counts["rows_recomputed"] += recomputed
+        return text
+
+    try:
+        for values, raw in records:
+            chunk.append(raw)
+            rows += bool(values)
+            if len(chunk) >= chunk_rows:
+                text = "".join(chunk)
+                pending.append((submit(text), text))
+                chunk = []
+                if len(pending) >= workers * 2:
+                    yield collect()
+        if chunk:
+            text = "".join(chunk)
+            pending.append((submit(text), text))
+        while pending:
+            yield collect()
+    finally:
+        for fut, _ in pending:
+            fut.cancel()
+        if stats is not None:
+            stats["rows"] = rows
+            stats["stages"] = dict(zip(STAGES, stage_seconds))
+            stats.update(counts)
+
+def iter_converted_bytes(stream, chunk_chars=STREAM_CHUNK_CHARS, workers=1, stats=None,
+                         encoding=None, tables=None, merge=False, row_cache=True,
+                         columns=ATENA_COLUMNS, slow_rows=None):
+    """アップロードのバイトストリーム → 変換済みCSV(UTF-8 BOM付き)のバイトチャンク。
+    workers が 2 以上ならプロセスプールで並列変換する（merge=True のときは直列）。
+    encoding を省略すると gzip なら展開し（open_upload）、先頭サンプルから文字コードを判定する
+    （sniff_encoding）。encoding を渡す場合は、両方を済ませたストリームを渡すこと。
+    tables（辞書一式）を省略すると開始時点の版に固定する。
+    row_cache=False で行キャッシュ（google2atena_rowcache）を使わない。
+    columns（google2atena_schema.get_profile の列定義）で出力の並びを変えられる。
+    slow_rows を渡すと直列・行キャッシュなしで変換し、行ごとの所要時間を記録する（iter_converted_text）。
+    stats には行数・段階別秒数・bytes_in（圧縮時は圧縮後）/ bytes_out・compression・
+    encoding / confidence・dict_version・rows_reused / rows_recomputed を記録する。"""
+    tables = tables or get_tables()
+    reader = CountingReader(stream)
+    compression = None
+    if encoding is None:
+        source, compression = open_upload(reader)
+        encoding, confidence, source = sniff_encoding(source)
+    else:
+        confidence, source = 1.0, reader
+    if stats is not None:
+        stats.setdefault("compression", compression)
+        stats.setdefault("encoding", encoding)
+        stats.setdefault("confidence", confidence)
+        stats.setdefault("dict_version", tables["version"])
+    lines = iter_upload_text(source, encoding)
+    if workers > 1 and not merge and slow_rows is None:
+        chunks = iter_converted_text_parallel(lines, workers, stats=stats, tables=tables,
+                                              row_cache=row_cache, columns=columns)
+    else:
+        chunks = iter_converted_text(lines, chunk_chars, stats=stats, tables=tables, merge=merge,
+                                     row_cache=row_cache, columns=columns, slow_rows=slow_rows)
+    bytes_out = len(codecs.BOM_UTF8)
+    try:
+        yield codecs.BOM_UTF8
+        for text in chunks:
+            data = text.encode("utf-8")
+            bytes_out += len(data)
+            yield data
+    finally:
+        if stats is not None:
+            stats["bytes_in"] = reader.pos
+            stats["bytes_out"] = bytes_out
@@ -0,0 +1,306 @@
+# google2atena_dicts.py  辞書スナップショット
+# - 編集用の元データは従来どおり company_dicts.py / kanji_word_map.py / corp_terms.py / jp_area_codes.py
+# - それらから検索用の構造（かなトライ・市外局番インデックス）を組み立て、
+#   1つのバージョン付きバイナリ（pickle）に書き出しておく
+# - 辞書一式は版（元データのハッシュ）付きの1つの塊として扱う。再読み込みでは丸ごと差し替え、
+#   並列変換のワーカーとは版だけで突き合わせる。起動の速さ・メモリのためのものではない
+#   （benchmarks/bench_startup.py）
+# - 読み込みは初回利用時（get_tables）。gunicorn では preload の親プロセスが1度だけ読み込む
+#
+# - DICT_DATA_DIR の追加辞書（TSV / JSON）は再起動なしで反映する。更新時刻を監視し、
+#   変わったら別スレッドで組み立て直して丸ごと差し替える（変換中の処理は旧版のまま）
+#
+#   python -m google2atena_dicts build     # スナップショットを作り直す
+#   python -m google2atena_dicts info      # 版・件数を表示する
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+SNAPSHOT_FORMAT = 3
+SOURCE_MODULES = ("company_dicts", "kanji_word_map", "corp_terms", "jp_area_codes")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# DICT_SNAPSHOT=none でスナップショットを使わない（毎回元データから構築）
+SNAPSHOT_PATH = os.environ.get("DICT_SNAPSHOT") or os.path.join(_HERE, "dicts.snapshot")
+
+# 追加辞書の置き場所。<名前>.tsv（「表記<TAB>読み」、# 行はコメント）か <名前>.json（{表記: 読み}）
+DICT_DATA_DIR = os.environ.get("DICT_DATA_DIR") or os.path.join(_HERE, "dict_data")
+DATA_TABLES = ("company_except", "kanji_word_map", "en_to_katakana")
+# 更新確認の間隔（秒）。0 で監視しない
+DICT_RELOAD_INTERVAL = float(os.environ.get("DICT_RELOAD_INTERVAL", "2"))
+
+CORP_TERMS_FALLBACK = [
+    "株式会社", "有限会社", "合同会社", "合資会社", "相互会社",
+    "一般社団法人", "一般財団法人", "公益社団法人", "公益財団法人",
+    "特定非営利活動法人", "ＮＰＯ法人", "学校法人", "医療法人",
+    "宗教法人", "社会福祉法人", "公立大学法人", "独立行政法人", "地方独立行政法人"
+]
+
+CITY_CODES = [
+    '011','015','017','018','019','022','023','024','025','026','027','028','029',
+    '03','04','042','043','044','045','046','047','048','049','052','053','054',
+    '055','056','057','058','059','06','072','073','074','075','076','077','078',
+    '079','082','083','084','085','086','087','088','089','092','093','094','095',
+    '096','097','098','099'
+]
+
+_TRIE_END = ""  # 1文字キーと衝突しない終端マーク
+
+class DictTables(dict):
+    """辞書一式（版ごとに1つ）。lru_cache のキーに使えるよう同一性で比較・ハッシュする"""
+    __hash__ = object.__hash__
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+def build_kana_trie(*maps):
+    """読み辞書群から最長一致用のトライ（dict の入れ子）を構築する。
+    同じキーが複数の辞書にある場合は先に渡した辞書を優先する。"""
+    root = {}
+    for m in reversed(maps):
+        for k, v in m.items():
+            if not k:
+                continue
+            node = root
+            for ch in k:
+                node = node.setdefault(ch, {})
+            node[_TRIE_END] = v
+    return root
+
+def build_area_index(codes):
+    """市外局番を桁数ごとの集合にまとめる（長い桁から順に引けば最長一致になる）"""
+    buckets = {}
+    for code in codes:
+        buckets.setdefault(len(code), set()).add(code)
+    return tuple((n, frozenset(buckets[n])) for n in sorted(buckets, reverse=True))
+
+def _source_path(name):
+    spec = importlib.util.find_spec(name)
+    return spec.origin if spec and spec.origin else None
+
+def data_paths():
+    """存在する追加辞書ファイル [(表名, パス)]（同じ表に TSV と JSON があれば両方、TSV → JSON の順）"""
+    paths = []
+    for name in DATA_TABLES:
+        for ext in (".tsv", ".json"):
+            path = os.path.join(DICT_DATA_DIR, name + ext)
+            if os.path.isfile(path):
+                paths.append((name, path))
+    return paths
+
+def data_signature():
+    """追加辞書の (パス, 更新時刻, サイズ)。監視はこれの比較だけで行う"""
+    sig = []
+    for _, path in data_paths():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        sig.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+def source_version():
+    """元データ（.py と追加辞書）の内容から作る版。1文字でも変われば別の版になる"""
+    h = hashlib.sha256(f"format={SNAPSHOT_FORMAT}".encode())
+    files = [(name, _source_path(name)) for name in SOURCE_MODULES] + data_paths()
+    for name, path in files:
+        h.update(name.encode())
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+def load_data_file(path):
+    """追加辞書1ファイルを {表記: 読み} にする"""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path}: JSON はオブジェクト（{{表記: 読み}}）で書く")
+        return {str(k): str(v) for k, v in data.items()}
+    entries = {}
+    with open(path, encoding="utf-8-sig") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            key, sep, value = line.partition("\t")
+            if not sep:
+                raise ValueError(f"{path}:{lineno}: タブ区切りになっていない")
+            entries[key.strip()] = value.strip()
+    return entries
+
+def _load_source(module, attr, default):
+    try:
+        return getattr(importlib.import_module(module), attr)
+    except Exception:
+        return default
+
+def build_tables(version=None):
+    """元データを import し、追加辞書で上書きして検索用の構造を組み立てる"""
+    version = version or source_version()
+    data = {
+        "company_except": dict(_load_source("company_dicts", "COMPANY_EXCEPT", {})),
+        "kanji_word_map": dict(_load_source("kanji_word_map", "KANJI_WORD_MAP", {})),
+        "en_to_katakana": dict(_load_source("kanji_word_map", "EN_TO_KATAKANA", {})),
+    }
+    for name, path in data_paths():
+        data[name].update(load_data_file(path))
+    company_except = data["company_except"]
+    kanji_word_map = data["kanji_word_map"]
+    en_to_katakana = data["en_to_katakana"]
+    corp_terms = _load_source("corp_terms", "CORP_TERMS", CORP_TERMS_FALLBACK)
+    area_codes = _load_source("jp_area_codes", "AREA_CODES", ())
+    return DictTables({
+        "version": version,
+        "company_except": company_except,
+        "kanji_word_map": kanji_word_map,
+        "en_to_katakana": en_to_katakana,
+        "corp_terms": corp_terms,
+        "area_codes": area_codes,
+        # 優先順: 会社名例外 > 漢字語。英字は語の途中でも一致してしまうのでトライに入れない
+        # （google2atena_core.rewrite_en_tokens が独立した大文字の語だけ読みに変える）
+        "kana_trie": build_kana_trie(company_except, kanji_word_map),
+        "area_index": build_area_index(area_codes or CITY_CODES),
+    })
+
+def write_snapshot(tables, path=SNAPSHOT_PATH):
+    """スナップショットを書き出す（一時ファイル経由で置き換えるので読み手と競合しない）"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((SNAPSHOT_FORMAT, tables["version"], tables), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def load_snapshot(version, path=SNAPSHOT_PATH):
+    """版が一致するスナップショットを読む（無い・古い・壊れている場合は None）"""
+    try:
+        with open(path, "rb") as f:
+            fmt, snap_version, tables = pickle.load(f)
+    except Exception:
+        return None
+    if fmt != SNAPSHOT_FORMAT or snap_version != version:
+        return None
+    return tables
+
+_tables = None
+_lock = threading.Lock()
+_signature = ()
+_next_check = 0.0
+_reloading = False
+_listeners = []
+
+def get_tables():
+    """検索用の辞書一式（現在の版）。初回だけスナップショットを読む（無ければ構築して書き出す）。
+    以後は DICT_RELOAD_INTERVAL ごとに追加辞書の更新時刻を見て、変わっていれば裏で組み直す。
+    1回の変換の中では最初に受け取ったものを使い続けること。"""
+    global _tables, _signature
+    tables = _tables
+    if tables is not None:
+        if DICT_RELOAD_INTERVAL > 0 and time.monotonic() >= _next_check:
+            _check_for_changes()
+        return tables
+    with _lock:
+        if _tables is None:
+            _signature = data_signature()
+            _tables = _load_or_build()
+            _schedule_next_check()
+        return _tables
+
+def tables_loaded():
+    """辞書一式を読み込み済みか（読み込みは起こさない。準備完了の確認用）"""
+    return _tables is not None
+
+def on_reload(fn):
+    """差し替え後に fn(新しい辞書一式) を呼ぶ（キャッシュの破棄など）"""
+    _listeners.append(fn)
+    return fn
+
+def _schedule_next_check():
+    global _next_check
+    _next_check = time.monotonic() + DICT_RELOAD_INTERVAL
+
+def _check_for_changes():
+    global _reloading
+    with _lock:
+        if _reloading or time.monotonic() < _next_check:
+            return
+        _schedule_next_check()
+        signature = data_signature()
+        if signature == _signature:
+            return
+        _reloading = True
+    threading.Thread(target=_reload, args=(signature,), name="dict-reload", daemon=True).start()
+
+def _reload(signature):
+    """別スレッドで新しい版を組み立て、参照1つの代入で差し替える"""
+    global _tables, _signature, _reloading
+    try:
+        tables = _load_or_build()
+    except Exception as e:
+        # 書きかけ・書式誤りのファイルでは旧版を使い続ける（次に更新されたら再挑戦）
+        print(f"dictionary reload failed: {e}", file=sys.stderr)
+        with _lock:
+            _signature = signature
+            _reloading = False
+        return
+    with _lock:
+        _tables = tables
+        _signature = signature
+        _reloading = False
+    for fn in _listeners:
+        fn(tables)
+
+def _after_fork():
+    # fork 時に親で再読み込み中だった場合、子に残ったロック・フラグを初期化する
+    global _lock, _reloading
+    _lock = threading.Lock()
+    _reloading = False
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def _load_or_build():
+    if SNAPSHOT_PATH.lower() == "none":
+        return build_tables()
+    version = source_version()
+    tables = load_snapshot(version)
+    if tables is None:
+        tables = build_tables(version)
+        try:
+            write_snapshot(tables)
+        except OSError:
+            pass  # 読み取り専用の配置でも動くようにする
+    return tables
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    cmd = args[0] if args else "info"
+    if cmd == "build":
+        tables = build_tables()
+        write_snapshot(tables)
+        print(f"wrote {SNAPSHOT_PATH} (version {tables['version']})")
+    elif cmd == "info":
+        tables = get_tables()
+        print(f"snapshot: {SNAPSHOT_PATH}")
+        print(f"data:     {', '.join(p for _, p in data_paths()) or '-'}")
+        print(f"version:  {tables['version']}")
+        for key in ("company_except", "kanji_word_map", "en_to_katakana", "corp_terms", "area_codes"):
+            print(f"{key:<16}{len(tables[key]):>8}")
+    else:
+        print("usage: python -m google2atena_dicts [build|info]", file=sys.stderr)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# google2atena_jobs.py  非同期変換ジョブ（Flask 非依存）
+# - アップロードをディスクに退避してジョブIDを即返し、変換はバックグラウンドで行う
+# - 状態は JOB_DIR/<id>.json に書くので、どの gunicorn ワーカーからも参照できる
+# - 変換は Web ワーカーとは別のプロセス（JOB_WORKERS 個のプロセスプール）で行い、
+#   Web ワーカーの CPU・GIL を取り合わない
+# - 結果は時間（JOB_TTL_SECONDS）と容量（JOB_STORE_MAX_BYTES）の予算内で保持し、超えたら古い順に削除
+# - 登録したプロセスは未完了のジョブの入力ファイルを JOB_HEARTBEAT_SECONDS ごとに touch する。
+#   JOB_STALE_SECONDS 以上途絶えた未完了のジョブ（ワーカーの再起動・異常終了で取り残されたもの）は失敗にする
+# - 待ちの上限 JOB_MAX_PENDING は JOB_DIR の未完了のジョブで数える（全ワーカー合計。同時の登録は多少超えうる）
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from google2atena_core import (
+    PARALLEL_MIN_BYTES, CountingReader, convert_workers, get_profile, iter_converted_bytes,
+    map_upload, pool_context, upload_size,
+)
+from google2atena_metrics import record_conversion
+
+JOB_DIR = os.environ.get("JOB_DIR") or os.path.join(tempfile.gettempdir(), "google2atena-jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "16"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+JOB_STORE_MAX_BYTES = int(os.environ.get("JOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "300"))
+
+# 進捗の書き出し間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+_JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+_executor = None
+_lock = threading.Lock()
+_active = set()  # このプロセスが登録した未完了のジョブ
+_heartbeat = None
+
+class JobQueueFull(Exception):
+    """待ち行列が JOB_MAX_PENDING に達している"""
+
+def _path(job_id, suffix):
+    return os.path.join(JOB_DIR, job_id + suffix)
+
+def _write_status(status):
+    tmp = _path(status["id"], ".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp, _path(status["id"], ".json"))
+
+def _get_executor():
+    global _executor, _heartbeat
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=pool_context())
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="convert-job-heartbeat", daemon=True)
+            _heartbeat.start()
+        return _executor
+
+def _beat():
+    """このプロセスの未完了のジョブの入力ファイルを touch し続ける（生きている印）"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _lock:
+            active = list(_active)
+        for job_id in active:
+            try:
+                os.utime(_path(job_id, ".in.csv"))
+            except OSError:
+                pass
+
+def _job_done(job_id, future):
+    """親プロセス側: 変換プロセスの結果をメトリクスに記録する。プロセスごと落ちた場合は失敗にする"""
+    with _lock:
+        _active.discard(job_id)
+    try:
+        seconds, stats, error = future.result()
+    except Exception as e:
+        _fail_job(job_id, f"変換プロセスが異常終了しました（{e.__class__.__name__}）")
+        return
+    record_conversion(seconds, stats, error)
+
+def _fail_job(job_id, message):
+    status = job_status(job_id)
+    if status is None or status.get("finished"):
+        return
+    status.update(status="error", error=message, finished=time.time())
+    _write_status(status)
+    for suffix in (".in.csv", ".out.csv"):
+        try:
+            os.remove(_path(job_id, suffix))
+        except OSError:
+            pass
+
+def submit_job(stream, filename="", merge=False, profile=None):
+    """アップロードを JOB_DIR に退避してジョブを登録し、状態 dict を返す。
+    merge=True なら重複連絡先を1行にまとめる。profile は出力プロファイル名（google2atena_schema）"""
+    os.makedirs(JOB_DIR, exist_ok=True)
+    if sweep_jobs() >= JOB_MAX_PENDING:
+        raise JobQueueFull()
+    job_id = uuid.uuid4().hex
+    try:
+        with open(_path(job_id, ".in.csv"), "wb") as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+    except OSError:
+        _remove_job(job_id)
+        raise
+    status = {
+        "id": job_id,
+        "filename": filename,
+        "merge": bool(merge),
+        "profile": profile,
+        "status": "queued",
+        "progress": 0.0,
+        "rows": 0,
+        "bytes_in": os.path.getsize(_path(job_id, ".in.csv")),
+        "bytes_out": 0,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "error": None,
+        "timings": None,
+        "encoding": None,
+        "confidence": None,
+        "dict_version": None,
+        "compression": None,
+        "merged": None,
+        "rows_reused": None,
+        "rows_recomputed": None,
+    }
+    _write_status(status)
+    executor = _get_executor()
+    with _lock:
+        _active.add(job_id)
+    try:
+        future = executor.submit(_run_job, status)
+    except Exception:
+        with _lock:
+            _active.discard(job_id)
+        _remove_job(job_id)
+        raise
+    future.add_done_callback(lambda f: _job_done(job_id, f))
+    return status
+
+def _run_job(status):
+    """変換プロセス側: 1件変換して状態ファイルを更新し、(秒, stats, エラーか) を返す"""
+    src_path = _path(status["id"], ".in.csv")
+    dst_path = _path(status["id"], ".out.csv")
+    status.update(status="running", started=time.time())
+    _write_status(status)
+    stats = {}
+    started = time.perf_counter()
+    error = False
+    try:
+        last = time.monotonic()
+        with open(src_path, "rb") as raw, map_upload(raw) as upload, open(dst_path, "wb") as dst:
+            # 並列にするかは展開後の大きさで決める（gzip のファイルは展開すると何倍にもなる）
+            big = (upload_size(upload) or 0) >= PARALLEL_MIN_BYTES
+            workers = convert_workers() if big else 1
+            src = CountingReader(upload)
+            for chunk in iter_converted_bytes(src, workers=workers, stats=stats,
+                                              merge=status["merge"],
+                                              columns=get_profile(status.get("profile"))):
+                dst.write(chunk)
+                status["bytes_out"] += len(chunk)
+                status["encoding"] = stats.get("encoding")
+                status["confidence"] = stats.get("confidence")
+                status["dict_version"] = stats.get("dict_version")
+                status["compression"] = stats.get("compression")
+                if time.monotonic() - last >= PROGRESS_INTERVAL:
+                    status["progress"] = round(src.pos / max(status["bytes_in"], 1), 4)
+                    _write_status(status)
+                    last = time.monotonic()
+        timings = dict(stats.get("stages", {}))
+        timings["total"] = time.perf_counter() - started
+        status.update(status="done", progress=1.0, rows=stats.get("rows", 0), timings=timings,
+                      merged=stats.get("merged"), rows_reused=stats.get("rows_reused"),
+                      rows_recomputed=stats.get("rows_recomputed"))
+    except Exception as e:
+        error = True
+        status.update(status="error", error=str(e))
+        try:
+            os.remove(dst_path)
+        except OSError:
+            pass
+    finally:
+        status["finished"] = time.time()
+        _write_status(status)
+        try:
+            os.remove(src_path)
+        except OSError:
+            pass
+    return time.perf_counter() - started, stats, error
+
+def job_status(job_id):
+    """ジョブの状態 dict（存在しない・期限切れなら None）"""
+    if not _JOB_ID_RE.fullmatch(job_id or ""):
+        return None
+    try:
+        with open(_path(job_id, ".json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def job_result_path(job_id):
+    """完了したジョブの結果ファイルのパス（未完了・不明なら None）"""
+    status = job_status(job_id)
+    if not status or status["status"] != "done":
+        return None
+    path = _path(job_id, ".out.csv")
+    return path if os.path.exists(path) else None
+
+def _remove_job(job_id):
+    for suffix in (".json", ".in.csv", ".out.csv"):
+        try:
+            os.remove(_path(job_id, suffix))
+        except OSError:
+            pass
+
+def _last_beat(status):
+    """未完了のジョブが最後に生きていた時刻（入力ファイルの更新時刻。無ければ状態の時刻）"""
+    try:
+        return os.path.getmtime(_path(status["id"], ".in.csv"))
+    except OSError:
+        return status.get("started") or status["created"]
+
+def sweep_jobs(now=None):
+    """期限切れの結果を消し、残りが容量予算を超えていれば古いものから消す。
+    取り残された未完了のジョブは失敗にする。未完了（queued / running）のジョブ数を返す"""
+    now = now or time.time()
+    try:
+        names = os.listdir(JOB_DIR)
+    except OSError:
+        return 0
+    finished = []
+    pending = 0
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        status = job_status(name[:-5])
+        if not status:
+            continue
+        if not status.get("finished"):
+            if _last_beat(status) + JOB_STALE_SECONDS < now:
+                _fail_job(status["id"], "変換が中断されました（サーバーの再起動など）。もう一度お試しください。")
+            else:
+                pending += 1
+            continue
+        if status["finished"] + JOB_TTL_SECONDS < now:
+            _remove_job(status["id"])
+        else:
+            finished.append(status)
+
+    total = sum(s["bytes_out"] for s in finished)
+    for status in sorted(finished, key=lambda s: s["finished"]):
+        if total <= JOB_STORE_MAX_BYTES:
+            break
+        _remove_job(status["id"])
+        total -= status["bytes_out"]
+    return pending
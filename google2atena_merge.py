@@ -0,0 +1,242 @@
+# google2atena_merge.py  重複連絡先の統合（Flask 非依存）
+# - 変換済みの行（宛名職人の列順の list）を電話番号・メール・(姓名, 会社名) で突き合わせ、
+#   同一人物とみなした行を1行にまとめる
+#   電話・メール・メモは和集合、住所は最初に入っている行の組をそのまま、その他の列は先に出た空でない値
+# - 姓名が両方入っていて食い違う行どうしは、電話・メールが同じでも統合しない（代表番号・共有アドレス対策）
+# - 1パス目で行を保存しつつ Union-Find で束ね、2パス目で束ごとに出力する（どちらも O(n)）
+# - 行数が MERGE_MEMORY_ROWS を超えたら、行とキー索引を SQLite の一時ファイルへ退避する
+#   （メモリに残るのは1行あたり整数2つだけ）
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from array import array
+
+MERGE_MEMORY_ROWS = int(os.environ.get("MERGE_MEMORY_ROWS", "200000"))
+MERGE_TMP_DIR = os.environ.get("MERGE_TMP_DIR") or None  # 省略時は OS の一時ディレクトリ
+
+_NON_DIGIT_RE = re.compile(r"\D")
+_SPILL_BATCH = 1000
+
+class RowStore:
+    """行とキー索引の置き場所。memory_rows 行までは list / dict、超えたら SQLite 一時ファイル"""
+
+    def __init__(self, memory_rows=MERGE_MEMORY_ROWS, tmp_dir=MERGE_TMP_DIR):
+        self.memory_rows = memory_rows
+        self.tmp_dir = tmp_dir
+        self.rows = []
+        self.keys = {}
+        self.count = 0
+        self.db = None
+        self.path = None
+        self._pending = []
+
+    @property
+    def spilled(self):
+        return self.db is not None
+
+    def add_row(self, row):
+        rid = self.count
+        self.count += 1
+        if self.db is None:
+            self.rows.append(row)
+            if self.count > self.memory_rows:
+                self._spill()
+        else:
+            self._pending.append((rid, json.dumps(row, ensure_ascii=False)))
+            if len(self._pending) >= _SPILL_BATCH:
+                self._flush()
+        return rid
+
+    def setdefault_key(self, key, rid):
+        """key が未登録なら rid で登録して rid を、登録済みなら既存の行番号を返す"""
+        if self.db is None:
+            return self.keys.setdefault(key, rid)
+        found = self.db.execute("SELECT rid FROM keys WHERE key = ?", (key,)).fetchone()
+        if found:
+            return found[0]
+        self.db.execute("INSERT INTO keys (key, rid) VALUES (?, ?)", (key, rid))
+        return rid
+
+    def get_row(self, rid):
+        if self.db is None:
+            return self.rows[rid]
+        self._flush()
+        (data,) = self.db.execute("SELECT data FROM rows WHERE rid = ?", (rid,)).fetchone()
+        return json.loads(data)
+
+    def iter_rows(self):
+        """(行番号, 行) を入力順に返す"""
+        if self.db is None:
+            yield from enumerate(self.rows)
+            return
+        self._flush()
+        # 2パス目の途中で get_row を呼ぶので、読み出し用に別カーソルを使う
+        for rid, data in self.db.cursor().execute("SELECT rid, data FROM rows ORDER BY rid"):
+            yield rid, json.loads(data)
+
+    def _spill(self):
+        fd, self.path = tempfile.mkstemp(prefix="g2a-merge-", suffix=".sqlite3", dir=self.tmp_dir)
+        os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE rows (rid INTEGER PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE keys (key TEXT PRIMARY KEY, rid INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+        self.db.executemany("INSERT INTO keys (key, rid) VALUES (?, ?)", self.keys.items())
+        self._pending = [(rid, json.dumps(row, ensure_ascii=False))
+                         for rid, row in enumerate(self.rows)]
+        self._flush()
+        self.rows = []
+        self.keys = {}
+
+    def _flush(self):
+        if self._pending:
+            self.db.executemany("INSERT INTO rows (rid, data) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+class _Columns:
+    """統合に使う列の位置（ヘッダから解決する）。
+    出力プロファイルで省かれた列は突き合わせにも統合にも使わない"""
+
+    def __init__(self, header):
+        col = {name: i for i, name in enumerate(header)}
+        self.width = len(header)
+        self.name = col.get("姓名")
+        self.company = col.get("会社名")
+        self.lists = [col[name] for name in ("自宅電話", "会社電話", "その他電話",
+                                             "自宅E-mail", "会社E-mail", "その他E-mail")
+                      if name in col]
+        self.phones = [col[name] for name in ("自宅電話", "会社電話", "その他電話") if name in col]
+        self.emails = [col[name] for name in ("自宅E-mail", "会社E-mail", "その他E-mail") if name in col]
+        self.memos = [col[f"メモ{n}"] for n in range(1, 6) if f"メモ{n}" in col]
+        blocks = ([col[dest + field] for field in ("〒", "住所1", "住所2", "住所3")
+                   if dest + field in col] for dest in ("自宅", "会社", "その他"))
+        self.blocks = [block for block in blocks if block]
+        grouped = set(self.lists) | set(self.memos) | {i for b in self.blocks for i in b}
+        self.scalars = [i for i in range(self.width) if i not in grouped]
+
+def _person_name(row, cols):
+    if cols.name is None:
+        return ""
+    return row[cols.name].replace("　", "").replace(" ", "")
+
+def row_keys(row, cols):
+    """行の突き合わせキー（電話は数字だけ、メールは小文字、姓名は空白を除いて会社名と組にする）"""
+    keys = []
+    for i in cols.phones:
+        for phone in row[i].split(";"):
+            digits = _NON_DIGIT_RE.sub("", phone)
+            if len(digits) >= 10:  # 内線・桁不足は他人と衝突しやすいので使わない
+                keys.append("t:" + digits)
+    for i in cols.emails:
+        for email in row[i].split(";"):
+            email = email.strip().lower()
+            if "@" in email:
+                keys.append("m:" + email)
+    name = _person_name(row, cols)
+    if name:
+        company = row[cols.company] if cols.company is not None else ""
+        keys.append(f"n:{name}\t{company}")
+    return keys
+
+def merge_group(rows, cols):
+    """同一人物の行（入力順）を1行にまとめる"""
+    merged = list(rows[0])
+    for i in cols.scalars:
+        if not merged[i]:
+            merged[i] = next((row[i] for row in rows if row[i]), "")
+    for block in cols.blocks:
+        source = next((row for row in rows if any(row[i] for i in block)), None)
+        if source is not None:
+            for i in block:
+                merged[i] = source[i]
+    for i in cols.lists:
+        values = {}
+        for row in rows:
+            for v in row[i].split(";"):
+                v = v.strip()
+                if v:
+                    values.setdefault(v.lower(), v)  # 大文字小文字違いのメールは最初の表記
+        merged[i] = ";".join(values.values())
+    memos = list(dict.fromkeys(row[i] for row in rows for i in cols.memos if row[i]))
+    if len(memos) > len(cols.memos):
+        # 入りきらない分は最後の欄に改行でつなぐ
+        last = len(cols.memos) - 1
+        memos = memos[:last] + ["\n".join(memos[last:])]
+    memos += [""] * (len(cols.memos) - len(memos))
+    for i, memo in zip(cols.memos, memos):
+        merged[i] = memo
+    return merged
+
+def merge_rows(rows, header, stats=None, memory_rows=MERGE_MEMORY_ROWS, tmp_dir=MERGE_TMP_DIR):
+    """変換済みの行の反復子 → 重複をまとめた行の反復子（各束は最初に出た行の位置に出力）。
+    stats には merged（他の行にまとめた行数）と merge_spilled（一時ファイルを使ったか）を記録する。"""
+    cols = _Columns(header)
+    store = RowStore(memory_rows, tmp_dir)
+    parent = array("q")
+    names = array("q")  # 束ごとの姓名（hash、空は 0）。根の位置だけ意味を持つ
+    merged = 0
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    try:
+        # --- 1パス目: 保存しながら束ねる ---
+        for row in rows:
+            rid = store.add_row(row)
+            parent.append(rid)
+            name = _person_name(row, cols)
+            names.append((hash(name) or 1) if name else 0)
+            for key in row_keys(row, cols):
+                other = store.setdefault_key(key, rid)
+                if other == rid:
+                    continue
+                a, b = find(other), find(rid)
+                if a == b:
+                    continue
+                if names[a] and names[b] and names[a] != names[b]:
+                    continue  # 別人（姓名が食い違う）
+                root, child = min(a, b), max(a, b)  # 根は束の中で最初の行
+                parent[child] = root
+                names[root] = names[root] or names[child]
+
+        # --- 2パス目: 束ごとに出力 ---
+        members = {}
+        for rid in range(len(parent)):
+            root = find(rid)
+            if root != rid:
+                members.setdefault(root, []).append(rid)
+        for rid, row in store.iter_rows():
+            if parent[rid] != rid:
+                continue  # 束の2行目以降（根の位置でまとめて出力済み）
+            group = members.get(rid)
+            if group:
+                merged += len(group)
+                row = merge_group([row] + [store.get_row(m) for m in group], cols)
+            yield row
+    finally:
+        if stats is not None:
+            stats["merged"] = merged
+            stats["merge_spilled"] = store.spilled
+        store.close()
@@ -0,0 +1,290 @@
+# google2atena_metrics.py  変換メトリクス（Flask 非依存）
+# - 変換ごとの段階別累積時間・行数・入出力バイト数・所要時間ヒストグラムを集計する
+# - /metrics 用に Prometheus テキスト形式で出力する
+# - METRICS_DIR を設定すると（gunicorn.conf.py が起動ごとに作る）、各プロセスが自分の累計を
+#   そこへ書き出し、/metrics はディレクトリ内の全プロセス分を合計して返す
+#   （どのワーカーが応答しても同じ値になる）。未設定なら応答したプロセスの値だけ
+#   書き出しは裏のスレッドが METRICS_PUBLISH_SECONDS ごとに、記録があったときだけ行う
+#   （他のワーカーの値は最大でその秒数だけ遅れる）。プロセスの終了時にも書く
+# - 1リクエストにつきロックを1回取るだけ（ファイルの書き込みはロックの外）なので、常時有効にしておける
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from google2atena_core import STAGES, cache_stats
+
+# 変換1回の所要時間（秒）
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# アップロードサイズ（バイト）
+SIZE_BUCKETS = (10e3, 100e3, 1e6, 5e6, 10e6, 50e6, 100e6, 500e6)
+# 全プロセスの累計を置くディレクトリ（未設定ならプロセスごと）
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+# 累計を METRICS_DIR へ書き出す間隔（秒）
+METRICS_PUBLISH_SECONDS = float(os.environ.get("METRICS_PUBLISH_SECONDS", "1"))
+
+class Histogram:
+    """累積バケット付きヒストグラム（Prometheus の histogram と同じ形）"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return [list(self.counts), self.sum, self.count]
+
+    def merge(self, state):
+        """state()（別プロセスの値）を足す"""
+        counts, total, count = state
+        if len(counts) == len(self.counts):
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.sum += total
+            self.count += count
+
+    def render(self, name, labels=""):
+        sep = "," if labels else ""
+        lines = []
+        acc = 0
+        for bound, n in zip(self.buckets, self.counts):
+            acc += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {acc}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+_lock = threading.Lock()
+_counters = {
+    "conversions": 0,
+    "conversion_errors": 0,
+    "rows": 0,
+    "input_bytes": 0,
+    "output_bytes": 0,
+    "rows_reused": 0,
+    "rows_recomputed": 0,
+}
+_stage_seconds = dict.fromkeys(STAGES, 0.0)
+_conversion_duration = Histogram(DURATION_BUCKETS)
+_upload_size = Histogram(SIZE_BUCKETS)
+_request_duration = {}  # endpoint → Histogram
+
+def record_conversion(seconds, stats, error=False):
+    """変換1回分（stats は iter_converted_bytes が埋めた dict）を集計に足す"""
+    with _lock:
+        _counters["conversions"] += 1
+        _counters["conversion_errors"] += bool(error)
+        _counters["rows"] += stats.get("rows", 0)
+        _counters["input_bytes"] += stats.get("bytes_in", 0)
+        _counters["output_bytes"] += stats.get("bytes_out", 0)
+        _counters["rows_reused"] += stats.get("rows_reused", 0)
+        _counters["rows_recomputed"] += stats.get("rows_recomputed", 0)
+        for stage, sec in stats.get("stages", {}).items():
+            _stage_seconds[stage] = _stage_seconds.get(stage, 0.0) + sec
+        _conversion_duration.observe(seconds)
+        _upload_size.observe(stats.get("bytes_in", 0))
+        _changed()
+
+def record_request(endpoint, seconds):
+    """HTTP リクエスト1件の応答時間（レスポンスヘッダを返すまで）"""
+    with _lock:
+        hist = _request_duration.get(endpoint)
+        if hist is None:
+            hist = _request_duration[endpoint] = Histogram(DURATION_BUCKETS)
+        hist.observe(seconds)
+        _changed()
+
+# ======== プロセス間の集計（METRICS_DIR） ========
+
+_own_file = None
+_own_pid = None
+_dirty = False
+_publisher_pid = None
+_write_lock = threading.Lock()
+
+def _own_path():
+    # preload した親から fork したワーカーは別のファイルに書く（pid の再利用に備えて開始時刻も入れる）
+    global _own_file, _own_pid
+    if _own_pid != os.getpid():
+        _own_pid = os.getpid()
+        _own_file = os.path.join(METRICS_DIR, f"{_own_pid}-{time.time_ns()}.json")
+    return _own_file
+
+def _state():
+    """このプロセスの累計（_lock を取って呼ぶ）"""
+    return {
+        "pid": os.getpid(),
+        "counters": dict(_counters),
+        "stages": dict(_stage_seconds),
+        "conversion_duration": _conversion_duration.state(),
+        "upload_size": _upload_size.state(),
+        "requests": {endpoint: hist.state() for endpoint, hist in _request_duration.items()},
+        "caches": cache_stats(),
+    }
+
+def _changed():
+    """累計が変わった印を付け、このプロセスの書き出しスレッドが無ければ起こす（_lock を取って呼ぶ）"""
+    global _dirty, _publisher_pid
+    _dirty = True
+    if METRICS_DIR is None or _publisher_pid == os.getpid():
+        return
+    # preload した親から fork したワーカーにはスレッドが引き継がれないので、プロセスごとに起こす
+    _publisher_pid = os.getpid()
+    threading.Thread(target=_publish_loop, name="metrics-publish", daemon=True).start()
+
+def _publish_loop():
+    while True:
+        time.sleep(METRICS_PUBLISH_SECONDS)
+        _publish()
+
+def _publish():
+    """前回から記録があれば、このプロセスの累計を METRICS_DIR に書き出す。
+    ロックの中では累計の写しを取るだけで、書き込み（一時ファイル → rename）はロックの外で行う"""
+    global _dirty
+    if METRICS_DIR is None:
+        return
+    # _write_lock は書き出すスレッドと終了処理だけが取る（古い写しで新しいファイルを上書きしない）
+    with _write_lock:
+        with _lock:
+            if not _dirty:
+                return
+            _dirty = False
+            state = _state()
+        path = _own_path()
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(state, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # 書けなくても変換は止めない（/metrics がこのプロセスの値だけになる）
+
+atexit.register(_publish)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+
+def _other_states():
+    """METRICS_DIR にある他のプロセスの累計（終了したワーカーの分も残す）"""
+    if METRICS_DIR is None:
+        return []
+    own = _own_path()
+    states = []
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return []
+    for name in names:
+        path = os.path.join(METRICS_DIR, name)
+        if not name.endswith(".json") or path == own:
+            continue
+        try:
+            with open(path) as f:
+                states.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return states
+
+def _merged():
+    """全プロセスの累計を1つにまとめる"""
+    with _lock:
+        state = _state()
+    counters = state["counters"]
+    stages = state["stages"]
+    duration = Histogram(DURATION_BUCKETS)
+    duration.merge(state["conversion_duration"])
+    size = Histogram(SIZE_BUCKETS)
+    size.merge(state["upload_size"])
+    requests = {}
+    caches = {name: dict(values) for name, values in state["caches"].items()}
+
+    def add_requests(items):
+        for endpoint, hist_state in items:
+            hist = requests.get(endpoint)
+            if hist is None:
+                hist = requests[endpoint] = Histogram(DURATION_BUCKETS)
+            hist.merge(hist_state)
+
+    add_requests(state["requests"].items())
+    for other in _other_states():
+        for k, v in other.get("counters", {}).items():
+            counters[k] = counters.get(k, 0) + v
+        for k, v in other.get("stages", {}).items():
+            stages[k] = stages.get(k, 0.0) + v
+        duration.merge(other["conversion_duration"])
+        size.merge(other["upload_size"])
+        add_requests(other.get("requests", {}).items())
+        alive = _alive(other.get("pid", 0))
+        for name, values in other.get("caches", {}).items():
+            total = caches.setdefault(name, dict.fromkeys(values, 0))
+            for field, v in values.items():
+                # 件数は終了したワーカーの分も足し、現在の大きさは生きているワーカーの分だけ
+                if field != "size" or alive:
+                    total[field] = total.get(field, 0) + v
+    return counters, stages, duration, size, requests, caches
+
+def server_timing(timings):
+    """{名前: 秒} → Server-Timing ヘッダの値（dur はミリ秒）"""
+    return ", ".join(f"{name};dur={sec * 1000:.1f}" for name, sec in timings.items())
+
+def render_metrics():
+    """Prometheus テキスト形式（text/plain; version=0.0.4）"""
+    out = []
+
+    def metric(name, kind, help_text, samples):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(samples)
+
+    c, stages, duration, size, request_hists, caches = _merged()
+    duration = duration.render("google2atena_conversion_duration_seconds")
+    size = size.render("google2atena_upload_size_bytes")
+    requests = [line for endpoint, hist in sorted(request_hists.items())
+                for line in hist.render("google2atena_http_request_duration_seconds",
+                                        f'endpoint="{endpoint}"')]
+
+    metric("google2atena_conversions_total", "counter", "Conversions run (including failed ones).",
+           [f"google2atena_conversions_total {c['conversions']}"])
+    metric("google2atena_conversion_errors_total", "counter", "Conversions that raised an error.",
+           [f"google2atena_conversion_errors_total {c['conversion_errors']}"])
+    metric("google2atena_rows_total", "counter", "Converted contact rows.",
+           [f"google2atena_rows_total {c['rows']}"])
+    metric("google2atena_rows_reused_total", "counter", "Rows served from the per-row result cache.",
+           [f"google2atena_rows_reused_total {c['rows_reused']}"])
+    metric("google2atena_rows_recomputed_total", "counter", "Rows converted from scratch.",
+           [f"google2atena_rows_recomputed_total {c['rows_recomputed']}"])
+    metric("google2atena_input_bytes_total", "counter", "Uploaded CSV bytes read.",
+           [f"google2atena_input_bytes_total {c['input_bytes']}"])
+    metric("google2atena_output_bytes_total", "counter", "Converted CSV bytes written.",
+           [f"google2atena_output_bytes_total {c['output_bytes']}"])
+    metric("google2atena_stage_seconds_total", "counter", "Cumulative time per conversion stage.",
+           [f'google2atena_stage_seconds_total{{stage="{k}"}} {v:.6f}' for k, v in stages.items()])
+    metric("google2atena_conversion_duration_seconds", "histogram",
+           "Wall time of a whole conversion (until the last byte is produced).", duration)
+    metric("google2atena_upload_size_bytes", "histogram", "Size of converted uploads.", size)
+    metric("google2atena_http_request_duration_seconds", "histogram",
+           "Time until response headers are returned, per endpoint.", requests)
+
+    for field, kind in (("hits", "counter"), ("misses", "counter"),
+                        ("evictions", "counter"), ("size", "gauge")):
+        name = f"google2atena_cache_{field}" + ("_total" if kind == "counter" else "")
+        metric(name, kind, f"Normalization cache {field}.",
+               [f'{name}{{cache="{k}"}} {v[field]}' for k, v in caches.items()])
+    return "\n".join(out) + "\n"
@@ -0,0 +1,252 @@
+# google2atena_postal.py  郵便番号索引（Flask 非依存）
+# - 日本郵便の KEN_ALL.CSV（またはUTF-8版 utf_ken_all.csv）から 〒 → (都道府県, 市区町村, 町域) の索引を作る
+# - 索引はオープンアドレス法のハッシュ表をそのままファイルにしたもの。mmap で開いて引くだけなので
+#   ワーカーのヒープに12万件の dict を持たない（ページキャッシュはプロセス間で共有される）
+# - 元データが無ければ何もしない（住所は従来どおり）。元データより古い索引・形式の古い索引は
+#   初回利用時に作り直す
+#
+#   python -m google2atena_postal build [KEN_ALL.CSV]   # 索引を作り直す
+#   python -m google2atena_postal info                  # 件数を表示する
+#   python -m google2atena_postal 1000001               # 1件引く
+#
+# ファイル形式（リトルエンディアン）
+#   ヘッダ   magic(8) 元データの版(16) 表の大きさ(u32) 件数(u32) 文字列数(u32)
+#   ハッシュ表  [〒(u32, 0 は空き) 都道府県+市区町村の文字列番号(u32) 町域の文字列番号(u32)] × 表の大きさ
+#   文字列表   終端位置(u32) × 文字列数、続いて UTF-8 の本体
+
+import csv
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+
+from google2atena_dicts import DICT_DATA_DIR
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# clean_town（町名の作り方）やファイル形式を変えたら上げる（古い索引は初回利用時に作り直される）
+POSTAL_MAGIC = b"G2APOST2"
+# 元データ。省略時は DICT_DATA_DIR の KEN_ALL.CSV / utf_ken_all.csv
+POSTAL_DATA_PATH = os.environ.get("POSTAL_DATA_PATH") or None
+POSTAL_INDEX_PATH = os.environ.get("POSTAL_INDEX_PATH") or os.path.join(_HERE, "postal.index")
+
+_HEADER = struct.Struct("<8s16sIII")
+_SLOT = struct.Struct("<III")
+_U32 = struct.Struct("<I")
+_MULT = 2654435761  # Knuth の乗算ハッシュ
+
+def data_path():
+    """元データのパス（無ければ None）"""
+    if POSTAL_DATA_PATH:
+        return POSTAL_DATA_PATH if os.path.isfile(POSTAL_DATA_PATH) else None
+    for name in ("KEN_ALL.CSV", "utf_ken_all.csv"):
+        path = os.path.join(DICT_DATA_DIR, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def source_version(path):
+    """元データの (サイズ, 更新時刻) から作る版"""
+    st = os.stat(path)
+    return hashlib.blake2b(f"{st.st_size}:{st.st_mtime_ns}".encode(), digest_size=16).digest()
+
+# ======== 元データの読み込み ========
+
+_PAREN_RE = re.compile(r"（.*")
+# 町域が「〜の場合」「〜一円」のものは町名として使えない
+_NO_TOWN = ("以下に掲載がない場合",)
+_NO_TOWN_SUFFIX = ("の次に番地がくる場合", "一円")
+
+def _open_text(path):
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # 読み込んだ範囲の末尾で文字が切れているだけなら UTF-8
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp932"
+    return open(path, encoding=encoding, newline="")
+
+def clean_town(town):
+    """KEN_ALL の町域 → 住所に使う町名（括弧書き・注記は落とす）"""
+    town = _PAREN_RE.sub("", town).strip()
+    if town in _NO_TOWN or town.endswith(_NO_TOWN_SUFFIX):
+        return ""
+    return town
+
+def read_ken_all(path):
+    """{〒(int): (都道府県, 市区町村, 町名)}。
+    同じ 〒 に複数の町域があれば町名は空、市区町村まで食い違えば市区町村も空にする"""
+    entries = {}
+    with _open_text(path) as f:
+        for row in csv.reader(f):
+            if len(row) < 9 or not row[2].isdigit() or len(row[2]) != 7:
+                continue
+            code = int(row[2])
+            pref, city, town = row[6], row[7], clean_town(row[8])
+            prev = entries.get(code)
+            if prev is None:
+                entries[code] = (pref, city, town)
+            elif prev != (pref, city, town):
+                # 括弧書きが複数行に分かれている町域は、同じ町名が続くだけなので変わらない
+                same_city = prev[1] == city
+                entries[code] = (prev[0], city if same_city else "",
+                                 town if same_city and prev[2] == town else "")
+    return entries
+
+# ======== 索引の作成 ========
+
+def build_index(src_path, dst_path=None):
+    """元データから索引ファイルを作る（書き出しは一時ファイル → rename）。件数を返す"""
+    dst_path = dst_path or POSTAL_INDEX_PATH
+    entries = read_ken_all(src_path)
+    strings = {}
+
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    intern("")
+    size = 1
+    while size < len(entries) * 2:
+        size *= 2
+    table = bytearray(_SLOT.size * size)
+    mask = size - 1
+    for code, (pref, city, town) in entries.items():
+        i = (code * _MULT) & mask
+        while _U32.unpack_from(table, i * _SLOT.size)[0]:
+            i = (i + 1) & mask
+        # 0 を空き印に使うので 〒 は +1 して入れる
+        _SLOT.pack_into(table, i * _SLOT.size, code + 1, intern(f"{pref}\t{city}"), intern(town))
+
+    blobs = [s.encode("utf-8") for s in strings]
+    ends = []
+    pos = 0
+    for b in blobs:
+        pos += len(b)
+        ends.append(pos)
+    tmp = f"{dst_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(POSTAL_MAGIC, source_version(src_path), size, len(entries), len(blobs)))
+        f.write(table)
+        f.write(struct.pack(f"<{len(ends)}I", *ends))
+        f.write(b"".join(blobs))
+    os.replace(tmp, dst_path)
+    return len(entries)
+
+# ======== 検索 ========
+
+class PostalIndex:
+    """mmap した索引。lookup は O(1)（ハッシュ表を数スロット読むだけ）"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.source_version, self.size, self.count,
+         self._nstrings) = _HEADER.unpack_from(self.mm, 0)
+        if magic != POSTAL_MAGIC:
+            self.mm.close()
+            raise ValueError(f"郵便番号索引ではありません: {path}")
+        self.version = self.source_version.hex()[:16]
+        self._mask = self.size - 1
+        self._table = _HEADER.size
+        self._ends = self._table + _SLOT.size * self.size
+        self._blob = self._ends + 4 * self._nstrings
+
+    def _string(self, n):
+        start = _U32.unpack_from(self.mm, self._ends + 4 * (n - 1))[0] if n else 0
+        end = _U32.unpack_from(self.mm, self._ends + 4 * n)[0]
+        return self.mm[self._blob + start:self._blob + end].decode("utf-8")
+
+    def areas(self):
+        """索引に入っている (都道府県, 市区町村) を全部返す"""
+        for n in range(1, self._nstrings):
+            s = self._string(n)
+            if "\t" in s:
+                yield tuple(s.split("\t"))
+
+    def lookup(self, code):
+        """7桁の 〒（"1000001" / 1000001）→ (都道府県, 市区町村, 町名)。無ければ None"""
+        code = int(code)
+        i = (code * _MULT) & self._mask
+        while True:
+            stored, area, town = _SLOT.unpack_from(self.mm, self._table + i * _SLOT.size)
+            if stored == 0:
+                return None
+            if stored == code + 1:
+                pref, city = self._string(area).split("\t")
+                return pref, city, self._string(town)
+            i = (i + 1) & self._mask
+
+_index = None
+_index_checked = False
+_index_lock = threading.Lock()
+
+def get_postal_index():
+    """索引（元データも索引も無ければ None）。索引が元データより古ければ作り直す"""
+    global _index, _index_checked
+    if _index_checked:
+        return _index
+    with _index_lock:
+        if _index_checked:
+            return _index
+        src = data_path()
+        index = None
+        try:
+            if os.path.isfile(POSTAL_INDEX_PATH):
+                try:
+                    index = PostalIndex(POSTAL_INDEX_PATH)
+                except (ValueError, struct.error):
+                    if src is None:
+                        raise
+                    index = None  # 形式の古い（POSTAL_MAGIC の違う）索引は元データから作り直す
+            if src is not None and (index is None or index.source_version != source_version(src)):
+                build_index(src)
+                index = PostalIndex(POSTAL_INDEX_PATH)
+        except (OSError, ValueError, struct.error):
+            index = None  # 索引が作れない・読めない場合は補完しないだけ
+        _index, _index_checked = index, True
+        return _index
+
+def postal_index_checked():
+    """索引を開いた（または無いと確かめた）か（開くことは起こさない）"""
+    return _index_checked
+
+def postal_version():
+    """行キャッシュのキーに混ぜる索引の版（索引が無ければ ""）"""
+    index = get_postal_index()
+    return index.version if index is not None else ""
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    cmd = args[0] if args else "info"
+    if cmd == "build":
+        src = args[1] if len(args) > 1 else data_path()
+        if not src:
+            print("KEN_ALL.CSV が見つかりません（POSTAL_DATA_PATH か DICT_DATA_DIR に置いてください）",
+                  file=sys.stderr)
+            return 1
+        count = build_index(src)
+        print(f"wrote {POSTAL_INDEX_PATH} ({count} codes from {src})")
+    elif cmd == "info":
+        index = get_postal_index()
+        print(f"data:    {data_path() or '-'}")
+        print(f"index:   {POSTAL_INDEX_PATH if index else '-'}")
+        if index:
+            print(f"version: {index.version}")
+            print(f"codes:   {index.count}")
+    elif cmd.replace("-", "").isdigit():
+        index = get_postal_index()
+        found = index.lookup(cmd.replace("-", "")) if index else None
+        print(" ".join(found) if found else "-")
+    else:
+        print("usage: python -m google2atena_postal [build [KEN_ALL.CSV]|info|<郵便番号>]",
+              file=sys.stderr)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# google2atena_profile.py  運用者向けの変換プロファイル（Flask 非依存）
+# - PROFILE_TOKEN を設定したときだけ有効。要求に同じトークン（X-Profile-Token ヘッダか
+#   ?profile_token=）が付いた変換を cProfile の下で実行し、レポートを PROFILE_DIR に保存する
+# - レポート: 累積時間の多い関数の上位と、変換に時間の掛かった行（行番号と、長い列の名前・文字数）
+#   行の中身（個人情報）は残さない。cProfile の生データ（.prof）は snakeviz などでも開ける
+# - トークンの無い通常の要求は、ヘッダを1つ見るだけで何もしない
+# - プロファイルは1プロセスで同時に1件だけ（Python 3.12 以降の cProfile はプロセス全体で1つの
+#   sys.monitoring を使うため、2件目を有効にできない）。使用中なら ProfilerBusy を送出する。
+#   3.12 以降は計測中に同じワーカーの別スレッドが処理した要求も関数の集計に入る
+
+import cProfile
+import hmac
+import heapq
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(),
+                                                             "google2atena-profiles")
+# 保存しておくレポートの数（古いものから消す）
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_SLOW_ROWS = 20
+
+_REPORT_ID_RE = re.compile(r"[0-9a-f]{32}")
+_busy = threading.Lock()
+
+class ProfilerBusy(RuntimeError):
+    """別の変換をプロファイル中（このプロセスでは同時に1件だけ）"""
+
+def profiling_allowed(token):
+    """要求のトークンが PROFILE_TOKEN と一致するか（未設定なら常に False）"""
+    if PROFILE_TOKEN is None or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+class SlowRows:
+    """変換に時間の掛かった行の上位 limit 件を持つ（google2atena_core.iter_converted_text の slow_rows）"""
+
+    def __init__(self, limit=PROFILE_SLOW_ROWS):
+        self.limit = limit
+        self.header = ()
+        self._heap = []  # (秒, 行番号, CSV の行, 長い列)
+
+    def add(self, seconds, row, line, values):
+        """row はデータ行の番号（1 始まり）、line はその行が始まる CSV の物理行（ヘッダが 1）"""
+        if len(self._heap) >= self.limit and seconds <= self._heap[0][0]:
+            return
+        longest = sorted(((len(v), i) for i, v in enumerate(values) if v), reverse=True)[:3]
+        fields = [{"column": self.header[i] if i < len(self.header) else f"#{i + 1}", "chars": n}
+                  for n, i in longest]
+        item = (seconds, row, line, fields)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heappushpop(self._heap, item)
+
+    def report(self):
+        return [{"row": row, "line": line, "seconds": round(seconds, 6), "longest_fields": fields}
+                for seconds, row, line, fields in sorted(self._heap, reverse=True)]
+
+def top_functions(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    """cProfile の結果 → 累積時間の多い関数 [{function, calls, tottime, cumtime}]"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{"function": f"{os.path.basename(file)}:{line}({name})",
+             "calls": nc, "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+            for (file, line, name), (cc, nc, tt, ct, callers) in rows]
+
+class ProfiledConversion:
+    """1回の変換のプロファイル。wrap() した反復子を回している間だけ計測する。
+    作った時点でプロセスのプロファイラを確保し（使用中なら ProfilerBusy）、
+    wrap() が終わるか release() で手放す"""
+
+    def __init__(self, filename=""):
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusy("別の変換をプロファイル中です。終わってからやり直してください。")
+        self._held = True
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.profiler = cProfile.Profile()
+        self.slow_rows = SlowRows()
+
+    def wrap(self, chunks, stats):
+        """チャンクを1つ取り出す間だけプロファイラを有効にする（応答の送信は計測しない）。
+        終わったら（中断されても）レポートを保存する"""
+        started = time.perf_counter()
+        error = None
+        try:
+            while True:
+                self.profiler.enable()
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    self.profiler.disable()
+                if chunk is None:
+                    return
+                yield chunk
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            try:
+                self.save(time.perf_counter() - started, stats, error)
+            finally:
+                self.release()
+
+    def release(self):
+        """プロファイラを手放す（何度呼んでもよい）"""
+        if self._held:
+            self._held = False
+            _busy.release()
+
+    def save(self, seconds, stats, error=None):
+        report = {
+            "id": self.id,
+            "created": time.time(),
+            "filename": self.filename,
+            "seconds": round(seconds, 6),
+            "rows": stats.get("rows", 0),
+            "encoding": stats.get("encoding"),
+            "compression": stats.get("compression"),
+            "stages": {k: round(v, 6) for k, v in (stats.get("stages") or {}).items()},
+            "error": error,
+            "functions": top_functions(self.profiler),
+            "slow_rows": self.slow_rows.report(),
+        }
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self.profiler.dump_stats(os.path.join(PROFILE_DIR, self.id + ".prof"))
+            tmp = os.path.join(PROFILE_DIR, self.id + ".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, os.path.join(PROFILE_DIR, self.id + ".json"))
+            sweep_reports()
+        except OSError:
+            pass  # 保存できなくても変換結果には影響させない
+        return report
+
+def load_report(report_id):
+    """保存したレポート（dict）。不明・削除済みなら None"""
+    if not _REPORT_ID_RE.fullmatch(report_id or ""):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, report_id + ".json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def sweep_reports():
+    """新しい PROFILE_KEEP 件を残して消す"""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".json")]
+    except OSError:
+        return
+    paths = sorted((os.path.join(PROFILE_DIR, n) for n in names), key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - PROFILE_KEEP)]:
+        for p in (path, path[:-5] + ".prof"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
@@ -0,0 +1,199 @@
+# google2atena_rowcache.py  行単位の変換結果キャッシュ（Flask 非依存）
+# - 毎日ほぼ同じ全件エクスポートを変換するので、入力行 → 出力行 を SQLite に残して再利用する
+# - キーは「変換コードの版・辞書の版・出力の列定義・ヘッダ・入力行の値」のハッシュ。どれかが変われば別の行になる
+# - 既定では使わない。ROW_CACHE_PATH を設定したときだけ有効（行には氏名・電話・住所などが平文で入る）
+#   ファイルは所有者だけが読み書きできる権限（0600）で作り、無ければ親ディレクトリも 0700 で作る
+#   （共有の /tmp 直下ではなく、専用のディレクトリを指定すること）
+# - ROW_CACHE_MAX_AGE_DAYS 日使われなかった行は捨てる。容量が ROW_CACHE_MAX_BYTES を超えたら、
+#   最後に使われた日が古い行から捨てる
+# - 複数ワーカー・スレッドから同じファイルを使う（WAL。接続は変換1回ごとに開く）
+# - キャッシュが壊れている・書けない場合は黙って素通しにする（変換は止めない）
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+ROW_CACHE_FORMAT = 1
+# 未設定（または none）なら使わない
+ROW_CACHE_PATH = os.environ.get("ROW_CACHE_PATH") or None
+ROW_CACHE_MAX_BYTES = int(os.environ.get("ROW_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+ROW_CACHE_MAX_AGE_DAYS = int(os.environ.get("ROW_CACHE_MAX_AGE_DAYS", "30"))
+ROW_CACHE_BATCH = 500
+
+# 行データ（1KB 前後）は rowid 表に追記し、ランダムなハッシュキーは別の索引に持つ
+# （キーを主キーにした WITHOUT ROWID 表より書き込みが約3倍速い）。
+# used には索引を張らない（並べ替えるのは容量超過時の削除だけ）
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    key  BLOB NOT NULL UNIQUE,
+    data TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+"""
+
+def _code_version():
+    """変換ロジック（core / schema / 住所の分解 / 郵便番号索引の各モジュール）の内容から作る版"""
+    h = hashlib.blake2b(f"format={ROW_CACHE_FORMAT}".encode(), digest_size=16)
+    for name in ("google2atena_core.py", "google2atena_schema.py",
+                 "google2atena_address.py", "google2atena_postal.py"):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except OSError:
+            pass
+    return h.digest()
+
+CODE_VERSION = _code_version()
+
+def _today():
+    return int(time.time() // 86400)
+
+# 期限切れの行を最後に捨てた日（全件をなめるので1プロセスで1日1回だけ）
+_expired_on = None
+
+def _create_private(path):
+    """path を所有者だけが読み書きできるファイルとして用意する（親が無ければ 0700 で作る）"""
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(parent):
+        os.makedirs(parent, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+class RowCache:
+    """1回の変換で使うキャッシュ接続。namespace（ヘッダ・辞書の版・出力の列定義）ごとに作る"""
+
+    def __init__(self, path, header, dict_version, max_bytes=ROW_CACHE_MAX_BYTES, layout="",
+                 max_age_days=ROW_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        h = hashlib.blake2b(CODE_VERSION, digest_size=16)
+        h.update(dict_version.encode())
+        h.update(layout.encode())
+        h.update("\x1f".join(header).encode())
+        self._namespace = h.digest()
+        self._today = _today()
+        # -wal / -shm も SQLite が本体と同じ権限で作る
+        _create_private(path)
+        self.db = sqlite3.connect(path, timeout=5, isolation_level=None)
+        # 失っても作り直せるデータなので fsync しない（壊れていたら open_row_cache が作り直す）
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.executescript(_SCHEMA)
+
+    def _key(self, values):
+        h = hashlib.blake2b(self._namespace, digest_size=16)
+        h.update("\x1f".join(values).encode())
+        return h.digest()
+
+    def convert_batch(self, batch, convert_rows):
+        """入力行の list → 出力行の list。キャッシュに無い行だけまとめて convert_rows
+        （行の list → 出力行の list。google2atena_core.compile_chunk_plan）に渡して書き足す"""
+        keys = [self._key(values) for values in batch]
+        found = {}
+        stale = []
+        marks = ",".join("?" * len(keys))
+        try:
+            for key, data, used in self.db.execute(
+                    f"SELECT key, data, used FROM rows WHERE key IN ({marks})", keys):
+                found[key] = data
+                if used < self._today:
+                    stale.append(key)
+        except sqlite3.Error:
+            found.clear()
+            stale.clear()
+        # 同じ入力行が同じバッチに複数あっても1回だけ変換して書く
+        missing = {key: values for key, values in zip(keys, batch) if key not in found}
+        converted = dict(zip(missing, convert_rows(list(missing.values())))) if missing else {}
+        added = [(key, json.dumps(row, ensure_ascii=False, separators=(",", ":")), self._today)
+                 for key, row in converted.items()]
+        out = [converted[key] if key in converted else json.loads(found[key]) for key in keys]
+        self.hits += len(batch) - len(added)
+        self.misses += len(added)
+        if added or stale:
+            try:
+                with self.db:
+                    self.db.execute("BEGIN")
+                    if added:
+                        self.db.executemany(
+                            "INSERT OR REPLACE INTO rows (key, data, used) VALUES (?, ?, ?)", added)
+                    if stale:
+                        # 使用日の更新は1日1回だけ（ヒットのたびには書かない）
+                        self.db.execute(
+                            f"UPDATE rows SET used = ? WHERE key IN ({','.join('?' * len(stale))})",
+                            [self._today, *stale])
+            except sqlite3.Error:
+                pass  # 他のワーカーが書き込み中などで書けなくても、変換結果はそのまま返す
+        return out
+
+    def size_bytes(self):
+        page_size, = self.db.execute("PRAGMA page_size").fetchone()
+        pages, = self.db.execute("PRAGMA page_count").fetchone()
+        free, = self.db.execute("PRAGMA freelist_count").fetchone()
+        return (pages - free) * page_size
+
+    def expire(self):
+        """max_age_days 日より前に最後に使われた行を捨てる（1プロセスで1日1回だけ）"""
+        global _expired_on
+        if self.max_age_days <= 0 or _expired_on == self._today:
+            return 0
+        with self.db:
+            self.db.execute("BEGIN")
+            dropped = self.db.execute("DELETE FROM rows WHERE used < ?",
+                                      (self._today - self.max_age_days,)).rowcount
+        _expired_on = self._today
+        return dropped
+
+    def evict(self):
+        """期限切れの行を捨て、まだ容量超過なら使用日の古い行から捨てる
+        （空きページは次の書き込みで再利用される）"""
+        expired = self.expire()
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return expired
+        count, = self.db.execute("SELECT COUNT(*) FROM rows").fetchone()
+        # 1行あたりの平均サイズから、上限の 9 割まで減らす行数を見積もる
+        drop = int(count * (1 - self.max_bytes * 0.9 / size)) + 1
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM rows WHERE key IN "
+                            "(SELECT key FROM rows ORDER BY used LIMIT ?)", (drop,))
+        return expired + drop
+
+    def close(self):
+        try:
+            self.evict()
+        except sqlite3.Error:
+            pass
+        self.db.close()
+
+def open_row_cache(header, dict_version, path=None, layout=""):
+    """RowCache を開く。無効（ROW_CACHE_PATH が未設定か none）または開けない場合は None"""
+    path = path or ROW_CACHE_PATH
+    if not path or path.lower() == "none":
+        return None
+    try:
+        return RowCache(path, header, dict_version, layout=layout)
+    except sqlite3.DatabaseError as e:
+        if not isinstance(e, sqlite3.OperationalError):
+            # 壊れたファイル（"file is not a database" など）は捨てて作り直す
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except OSError:
+                    pass
+            try:
+                return RowCache(path, header, dict_version, layout=layout)
+            except (OSError, sqlite3.Error):
+                return None
+        return None
+    except OSError:
+        return None
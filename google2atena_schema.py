@@ -0,0 +1,176 @@
+# google2atena_schema.py  出力列の定義（Flask 非依存）
+# - 宛名職人の列ごとに「どこから値を取るか」を宣言的に書き、ヘッダと行の中身を1か所で管理する
+#     ""            空欄
+#     "=様"          固定の文字列
+#     "col:Nickname" 入力（Google 連絡先）の列をそのまま
+#     "phones" など  変換結果（FIELDS）
+# - 用途別の並び（プロファイル）は既定の定義を列単位で差し替えて作る（例: 電話を自宅電話へ）
+#   OUTPUT_PROFILES_FILE に JSON を置くと独自のプロファイルを足せる
+#     {"名前": {"base": "default", "columns": {"自宅電話": "phones", "会社電話": ""}}}
+#     {"名前": [["氏名", "full_name"], ["TEL", "phones"], ...]}   ← 並びごと定義
+# - compile_emitter() は定義から「tuple を組み立てる式」のソースを生成して一度だけ compile する
+#   （行ごとの dict も列ごとの分岐も無いので、独自の並びでも組み込みと同じ速さ）
+
+import json
+import os
+
+OUTPUT_PROFILES_FILE = os.environ.get("OUTPUT_PROFILES_FILE") or None
+DEFAULT_PROFILE = os.environ.get("OUTPUT_PROFILE", "default")
+
+class UnknownProfile(ValueError):
+    """存在しないプロファイル、または解釈できない列定義"""
+
+# ======== 変換結果（生成する式と、計算に要る段階） ========
+# 式の中の v は入力行（存在しない列は -1 = 行末の ""）、I[...] は入力列の位置
+
+FIELDS = {
+    "full_name":    ('v[I["Last Name"]] + "　" + v[I["First Name"]]', None),
+    "full_kana":    ('v[I["Phonetic Last Name"]] + v[I["Phonetic First Name"]]', None),
+    "home.postal":  ("home[0]", "address"),
+    "home.addr1":   ("home[1]", "address"),
+    "home.addr2":   ("home[2]", "address"),
+    "work.postal":  ("work[0]", "address"),
+    "work.addr1":   ("work[1]", "address"),
+    "work.addr2":   ("work[2]", "address"),
+    "other.postal": ("other[0]", "address"),
+    "other.addr1":  ("other[1]", "address"),
+    "other.addr2":  ("other[2]", "address"),
+    # 郵便番号索引（google2atena_postal）との食い違い。索引が無ければ常に空
+    "home.postal_check":  ("home[3]", "address"),
+    "work.postal_check":  ("work[3]", "address"),
+    "other.postal_check": ("other[3]", "address"),
+    "phones":       ("phones", "phone"),
+    "emails":       ("emails", "email"),
+    "memo1":        ("memos[0]", "memo"),
+    "memo2":        ("memos[1]", "memo"),
+    "memo3":        ("memos[2]", "memo"),
+    "memo4":        ("memos[3]", "memo"),
+    "memo5":        ("memos[4]", "memo"),
+    "company_kana": ("company_kana", "kana"),
+}
+
+# ======== プロファイル ========
+
+ATENA_COLUMNS = (
+    ("姓", "col:Last Name"), ("名", "col:First Name"),
+    ("姓かな", "col:Phonetic Last Name"), ("名かな", "col:Phonetic First Name"),
+    ("姓名", "full_name"), ("姓名かな", "full_kana"),
+    ("ミドルネーム", ""), ("ミドルネームかな", ""), ("敬称", "=様"),
+    ("ニックネーム", "col:Nickname"), ("旧姓", ""), ("宛先", "=会社"),
+    ("自宅〒", "home.postal"), ("自宅住所1", "home.addr1"), ("自宅住所2", "home.addr2"),
+    ("自宅住所3", ""), ("自宅電話", ""),
+    ("自宅IM ID", ""), ("自宅E-mail", ""), ("自宅URL", ""), ("自宅Social", ""),
+    ("会社〒", "work.postal"), ("会社住所1", "work.addr1"), ("会社住所2", "work.addr2"),
+    ("会社住所3", ""), ("会社電話", "phones"), ("会社IM ID", ""), ("会社E-mail", "emails"),
+    ("会社URL", ""), ("会社Social", ""),
+    ("その他〒", "other.postal"), ("その他住所1", "other.addr1"), ("その他住所2", "other.addr2"),
+    ("その他住所3", ""), ("その他電話", ""), ("その他IM ID", ""),
+    ("その他E-mail", ""), ("その他URL", ""), ("その他Social", ""),
+    ("会社名かな", "company_kana"), ("会社名", "col:Organization Name"),
+    ("部署名1", "col:Organization Department"), ("部署名2", ""),
+    ("役職名", "col:Organization Title"),
+    ("連名", ""), ("連名ふりがな", ""), ("連名敬称", ""), ("連名誕生日", ""),
+    ("メモ1", "memo1"), ("メモ2", "memo2"), ("メモ3", "memo3"), ("メモ4", "memo4"),
+    ("メモ5", "memo5"),
+    ("備考1", ""), ("備考2", ""), ("備考3", ""), ("誕生日", "col:Birthday"),
+    ("性別", ""), ("血液型", ""), ("趣味", ""), ("性格", ""),
+)
+
+def with_overrides(columns, overrides):
+    """列定義の一部の列だけ値の取り方を差し替える（並びは変えない）"""
+    names = {name for name, _ in columns}
+    unknown = [name for name in overrides if name not in names]
+    if unknown:
+        raise UnknownProfile(f"出力にない列です: {', '.join(unknown)}")
+    return tuple((name, overrides.get(name, source)) for name, source in columns)
+
+PROFILES = {
+    "default": ATENA_COLUMNS,
+    # 個人宛の住所録: 電話・メールを自宅欄に入れ、宛先を自宅にする
+    "home": with_overrides(ATENA_COLUMNS, {
+        "宛先": "=自宅",
+        "自宅電話": "phones", "会社電話": "",
+        "自宅E-mail": "emails", "会社E-mail": "",
+    }),
+    # 〒と住所の食い違いを備考に書き出す（郵便番号索引が要る）
+    "postal-check": with_overrides(ATENA_COLUMNS, {
+        "備考1": "home.postal_check", "備考2": "work.postal_check", "備考3": "other.postal_check",
+    }),
+}
+
+def check_columns(columns):
+    """列定義を検証して ((列名, 取り方), ...) に揃える"""
+    checked = []
+    for pair in columns:
+        if len(pair) != 2 or not all(isinstance(x, str) for x in pair):
+            raise UnknownProfile(f"列定義は [列名, 取り方] の組で書いてください: {pair!r}")
+        name, source = pair
+        if source and not source.startswith(("=", "col:")) and source not in FIELDS:
+            raise UnknownProfile(f"{name}: 不明な取り方です: {source!r}")
+        checked.append((name, source))
+    if not checked:
+        raise UnknownProfile("列がありません")
+    return tuple(checked)
+
+def load_profiles(path):
+    """OUTPUT_PROFILES_FILE の JSON を読んで PROFILES に足す"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    for name, spec in data.items():
+        if isinstance(spec, dict):
+            base = get_profile(spec.get("base", "default"))
+            overrides = spec.get("columns") or {}
+            if overrides:
+                overrides = dict(check_columns(overrides.items()))
+            PROFILES[name] = with_overrides(base, overrides)
+        else:
+            PROFILES[name] = check_columns(spec)
+
+def get_profile(name=None):
+    """プロファイル名 → 列定義（省略時は OUTPUT_PROFILE、未設定なら default）"""
+    try:
+        return PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise UnknownProfile(f"不明な出力プロファイルです: {name}") from None
+
+if OUTPUT_PROFILES_FILE:
+    load_profiles(OUTPUT_PROFILES_FILE)
+
+def profile_header(columns):
+    return [name for name, _ in columns]
+
+def layout_key(columns):
+    """列定義の識別子（行キャッシュのキーに混ぜる）"""
+    return "\x1e".join(f"{name}\x1f{source}" for name, source in columns)
+
+# ======== コンパイル ========
+
+def compile_emitter(columns, col):
+    """列定義 → (emit, 要る段階の集合)。
+    col は入力ヘッダの {列名: 位置}。emit(v, home, work, other, phones, emails, memos, company_kana)
+    は出力の tuple を返す。要らない段階の引数には何を渡してもよい。"""
+    index = lambda name: col.get(name, -1)  # noqa: E731
+    exprs = []
+    stages = set()
+    for name, source in columns:
+        if not source:
+            exprs.append('""')
+        elif source.startswith("="):
+            exprs.append(repr(source[1:]))
+        elif source.startswith("col:"):
+            exprs.append(f"v[{index(source[4:])}]")
+        else:
+            expr, stage = FIELDS[source]
+            # 入力列の位置は生成時に数値へ埋め込む
+            while 'I["' in expr:
+                head, _, rest = expr.partition('I["')
+                col_name, _, tail = rest.partition('"]')
+                expr = f"{head}{index(col_name)}{tail}"
+            exprs.append(expr)
+            if stage:
+                stages.add(stage)
+    src = ("def emit(v, home, work, other, phones, emails, memos, company_kana):\n"
+           f"    return ({', '.join(exprs)},)\n")
+    namespace = {}
+    exec(compile(src, "<google2atena_schema>", "exec"), namespace)
+    return namespace["emit"], frozenset(stages)
@@ -0,0 +1,43 @@
+# gunicorn.conf.py  本番の起動設定（Procfile: gunicorn -c gunicorn.conf.py）
+# - preload_app: 親プロセスで warm_app() を1度だけ呼び、辞書一式・郵便番号索引・住所の正規表現を
+#   作ってから fork する。ワーカーはそれをコピーオンライトで共有する（ワーカーごとに読み込まない）
+# - gthread ワーカー: 1件の遅い変換がワーカー全体を塞がない（他の要求は別スレッドで受ける）。
+#   変換は CPU 処理なのでワーカー数は使える CPU 数（cgroup の上限・CPU の割り当てを反映）ちょうどにし、
+#   同時に受ける要求の数はスレッド（GUNICORN_THREADS）で増やす。大きな変換のプロセスプールは
+#   CPU をワーカー数で分け合う
+# - /metrics: 起動ごとに METRICS_DIR の下へ作るディレクトリで全ワーカーの値を合計する
+# - 環境変数: PORT / WEB_CONCURRENCY（ワーカー数）/ GUNICORN_THREADS / GUNICORN_TIMEOUT / METRICS_DIR
+
+import gc
+import os
+import shutil
+import tempfile
+
+from google2atena_core import available_cpus
+
+wsgi_app = "google2atena:warm_app()"
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+preload_app = True
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY") or available_cpus())
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+# gthread ではワーカーの生存確認の間隔（1件の変換の上限ではない）
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# アプリ（preload で読み込む）から見えるように、決めた値を環境変数で渡す
+# - WEB_CONCURRENCY: google2atena_core.convert_workers() がプロセスプールの大きさを割り出す
+# - METRICS_DIR: 前回の起動の値が混ざらないよう、毎回新しいディレクトリ（0700）を作る
+os.environ["WEB_CONCURRENCY"] = str(workers)
+_metrics_dir = tempfile.mkdtemp(prefix="google2atena-metrics-",
+                                dir=os.environ.get("METRICS_DIR") or None)
+os.environ["METRICS_DIR"] = _metrics_dir
+
+def pre_fork(server, worker):
+    # preload で作ったオブジェクトを GC の追跡から外す。ワーカーの GC がそれらのページに
+    # 触れてコピーオンライトの共有が崩れるのを防ぐ
+    gc.freeze()
+
+def on_exit(server):
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
@@ -1,4 +1,87 @@
-document.getElementById("runBtn").addEventListener("click", async () => {
+// これより大きいファイルは /jobs に投げて進捗をポーリングする（Webワーカーを塞がない）
+const JOB_THRESHOLD_BYTES = 5 * 1024 * 1024;
+const POLL_INTERVAL_MS = 1000;
+// ジョブの待ち時間の上限と、状態の取得に続けて失敗してよい回数（超えたら諦めて知らせる）
+const JOB_DEADLINE_MS = 30 * 60 * 1000;
+const MAX_POLL_ERRORS = 5;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+function saveBlob(blob, filename) {
+  const url = URL.createObjectURL(blob);
+  const a = document.createElement("a");
+  a.href = url;
+  a.download = filename;
+  a.click();
+  URL.revokeObjectURL(url);
+}
+
+// 413（サイズ上限超過）はサーバーの説明を表示する（/convert はテキスト、ほかは JSON）
+async function failure(res, message) {
+  const err = new Error(message);
+  if (res.status === 413) {
+    const text = await res.text();
+    try {
+      err.userMessage = `⚠️ ${JSON.parse(text).error}`;
+    } catch (_) {
+      err.userMessage = text;
+    }
+  }
+  return err;
+}
+
+async function convertDirect(fd) {
+  const res = await fetch("/convert", { method: "POST", body: fd });
+  if (!res.ok) throw await failure(res, "変換に失敗しました");
+  return { blob: await res.blob(), encoding: res.headers.get("X-Detected-Encoding") };
+}
+
+// ZIP（複数の CSV）は /batch でまとめて変換し、ZIP で受け取る
+async function convertBatch(fd) {
+  const res = await fetch("/batch", { method: "POST", body: fd });
+  if (!res.ok) throw await failure(res, "変換に失敗しました");
+  return { blob: await res.blob(), encoding: null };
+}
+
+async function convertAsJob(fd, status) {
+  const res = await fetch("/jobs", { method: "POST", body: fd });
+  if (!res.ok) throw await failure(res, "ジョブの登録に失敗しました");
+  let job = await res.json();
+  const deadline = Date.now() + JOB_DEADLINE_MS;
+  let errors = 0;
+
+  while (job.status === "queued" || job.status === "running") {
+    const pct = Math.floor((job.progress || 0) * 100);
+    status.textContent = job.status === "queued" ? "変換待ち…" : `変換中… ${pct}%`;
+    if (Date.now() > deadline) {
+      const err = new Error("timeout");
+      err.userMessage = "⚠️ 変換が時間内に終わりませんでした。時間をおいてもう一度お試しください。";
+      throw err;
+    }
+    await sleep(POLL_INTERVAL_MS);
+    try {
+      const poll = await fetch(job.status_url);
+      if (!poll.ok) throw new Error(`HTTP ${poll.status}`);
+      job = await poll.json();
+      errors = 0;
+    } catch (_) {
+      // 一時的な失敗は数回まで待つ（ジョブが消えた 404 などは続けて失敗するので打ち切られる）
+      if (++errors >= MAX_POLL_ERRORS) {
+        const err = new Error("poll failed");
+        err.userMessage = "⚠️ 変換ジョブの状態を取得できませんでした。もう一度お試しください。";
+        throw err;
+      }
+    }
+  }
+  if (job.status !== "done") throw new Error(job.error || "変換に失敗しました");
+
+  const result = await fetch(job.result_url);
+  if (!result.ok) throw new Error("変換結果を取得できませんでした");
+  return { blob: await result.blob(), encoding: job.encoding };
+}
+
+document.getElementById("convertForm").addEventListener("submit", async (event) => {
+  event.preventDefault();
   const file = document.getElementById("fileInput").files[0];
   const status = document.getElementById("status");
   if (!file) { status.textContent = "CSVファイルを選択してください。"; return; }
@@ -6,19 +89,22 @@ document.getElementById("runBtn").addEventListener("click", async () => {
   status.textContent = "変換中…";
   const fd = new FormData();
   fd.append("file", file);
+  if (document.getElementById("mergeInput").checked) fd.append("merge", "1");
+  const profile = document.getElementById("profileInput").value;
+  if (profile) fd.append("profile", profile);
 
   try {
-    const res = await fetch("/convert", { method: "POST", body: fd });
-    if (!res.ok) throw new Error("変換に失敗しました");
-    const blob = await res.blob();
-    const url = URL.createObjectURL(blob);
-    const a = document.createElement("a");
-    a.href = url;
-    a.download = "google_converted.csv";
-    a.click();
-    URL.revokeObjectURL(url);
-    status.textContent = "✅ 変換が完了しました（google_converted.csv を保存）";
+    const isZip = file.name.toLowerCase().endsWith(".zip");
+    const { blob, encoding } = isZip
+      ? await convertBatch(fd)
+      : file.size >= JOB_THRESHOLD_BYTES
+        ? await convertAsJob(fd, status)
+        : await convertDirect(fd);
+    const filename = isZip ? "google_converted.zip" : "google_converted.csv";
+    saveBlob(blob, filename);
+    const enc = encoding ? `・入力の文字コード: ${encoding.toUpperCase()}` : "";
+    status.textContent = `✅ 変換が完了しました（${filename} を保存${enc}）`;
   } catch (e) {
-    status.textContent = "⚠️ エラーが発生しました。CSVの形式や文字コードをご確認ください。";
+    status.textContent = e.userMessage || "⚠️ エラーが発生しました。CSVの形式や文字コードをご確認ください。";
   }
 });
@@ -0,0 +1,60 @@
+# test_address.py  google2atena_address の住所の分解（郵便番号索引を使わない規則だけで）
+#
+#   python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google2atena_address as address  # noqa: E402
+from google2atena_core import build_addr12  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def fallback_pattern(monkeypatch):
+    # 手元に郵便番号索引があっても結果が変わらないよう、規則だけの正規表現にする
+    monkeypatch.setattr(address, "_pattern", address.compile_address_pattern())
+
+CASES = [
+    # 政令指定都市は区まで
+    ("神奈川県横浜市中区山下町１－２　ビル３Ｆ",
+     ("神奈川県", "横浜市中区", "山下町", "１－２", "ビル３Ｆ")),
+    ("北海道札幌市中央区北一条西２丁目１", ("北海道", "札幌市中央区", "北一条西", "２丁目１", "")),
+    ("大阪府大阪市北区梅田１－１ グランフロント", ("大阪府", "大阪市北区", "梅田", "１－１", "グランフロント")),
+    # 郡 + 町村（郡名・町名に「市・村」を含むもの）
+    ("長野県北佐久郡軽井沢町大字軽井沢１－２", ("長野県", "北佐久郡軽井沢町", "大字軽井沢", "１－２", "")),
+    ("北海道余市郡余市町黒川町１", ("北海道", "余市郡余市町", "黒川町", "１", "")),
+    ("奈良県高市郡明日香村岡１", ("奈良県", "高市郡明日香村", "岡", "１", "")),
+    ("山形県西村山郡河北町谷地１", ("山形県", "西村山郡河北町", "谷地", "１", "")),
+    # 郡の省略・名前の途中の「市・町」
+    ("北海道余市町黒川町１", ("北海道", "余市町", "黒川町", "１", "")),
+    ("千葉県市川市八幡１－１", ("千葉県", "市川市", "八幡", "１－１", "")),
+    ("東京都千代田区九段北１－２－３", ("東京都", "千代田区", "九段北", "１－２－３", "")),
+    # 都道府県の省略
+    ("渋谷区道玄坂1-2 渋谷ビル", ("", "渋谷区", "道玄坂", "1-2", "渋谷ビル")),
+]
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_split_address(text, expected):
+    assert address.split_address(text) == expected
+
+def test_address_lines():
+    assert address.address_lines("東京都 千代田区 丸の内1-1　丸ビル 10F") == (
+        "東京都千代田区丸の内1-1", "丸ビル 10F")
+    assert address.address_lines("北海道札幌市中央区北一条西２丁目１") == (
+        "北海道札幌市中央区北一条西２丁目１", "")
+    # 都道府県も市区町村も読めない（海外など）→ None
+    assert address.address_lines("123 Main St. New York") is None
+
+def test_split_address_column_reuses_equal_values():
+    values = ["東京都千代田区丸の内1-1", "", "東京都千代田区丸の内1-1"]
+    out = address.split_address_column(values)
+    assert out == [address.split_address(v) for v in values]
+    assert out[0] is out[2]
+
+def test_build_addr12_falls_back_to_the_first_space():
+    assert build_addr12("東京都", "千代田区", "丸の内1-1 丸ビル") == ("東京都千代田区丸の内１－１", "丸ビル")
+    # 海外の住所は従来どおり最初の空白で切る
+    assert build_addr12("", "", "123 Main St. New York") == ("１２３", "Ｍａｉｎ Ｓｔ． Ｎｅｗ Ｙｏｒｋ")
@@ -0,0 +1,123 @@
+# test_core.py  google2atena_core の変換（行キャッシュは使わない）
+#
+#   python -m pytest -q
+
+import csv
+import gzip
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_core import (compile_chunk_plan, compile_row_plan,  # noqa: E402
+                              get_tables, iter_converted_text, iter_converted_text_parallel,
+                              MappedReader, kana_company_name, map_upload, open_upload,
+                              sniff_encoding, to_zenkaku_for_address, upload_size)
+from google2atena_dicts import DictTables  # noqa: E402
+from google2atena_schema import PROFILES  # noqa: E402
+
+# 住所の列が無いヘッダ（住所の段階が丸ごと飛ぶ）
+HEADER_NO_ADDRESS = [
+    "Last Name", "First Name", "Phonetic Last Name", "Phonetic First Name", "Nickname",
+    "Organization Name", "Organization Department", "Organization Title", "Birthday",
+    "Notes", "E-mail 1 - Value", "Phone 1 - Value",
+]
+
+def _rows(n):
+    return [[f"姓{i}", f"名{i}", "せい", "めい", "", f"株式会社テスト{i % 3}", "営業", "", "",
+             f"メモ{i}", f"user{i}@example.com", f"03-1234-{i:04d}"] for i in range(n)]
+
+def test_chunk_plan_matches_row_plan_without_address_columns():
+    for name, columns in PROFILES.items():
+        for n in (1, 30, 3000):
+            plan = compile_row_plan(HEADER_NO_ADDRESS, columns=columns)
+            expected = [plan(values) for values in _rows(n)]
+            got = compile_chunk_plan(HEADER_NO_ADDRESS, columns=columns)(_rows(n))
+            assert got == expected, (name, n)
+
+def _csv_lines(n):
+    buf = io.StringIO()
+    csv.writer(buf).writerows([HEADER_NO_ADDRESS] + _rows(n))
+    return io.StringIO(buf.getvalue())
+
+def test_parallel_chunks_fall_back_to_shipping_tables_for_another_version():
+    expected = "".join(iter_converted_text(_csv_lines(300), row_cache=False))
+    # ワーカーが自分で読む版と同じ版 / 違う版（辞書一式を付けて送り直す）
+    other = DictTables(get_tables(), version="other-version")
+    for tables in (get_tables(), other):
+        got = "".join(iter_converted_text_parallel(_csv_lines(300), workers=2, chunk_rows=50,
+                                                   tables=tables, row_cache=False))
+        assert got == expected
+
+@pytest.mark.parametrize("encoding, expected", [
+    ("utf-16", "utf-16"),        # BOM 付き
+    ("utf-16-le", "utf-16-le"),  # BOM なし: NUL が奇数の位置に偏る
+    ("utf-16-be", "utf-16-be"),
+])
+def test_utf16_upload_is_detected(encoding, expected):
+    text = "Last Name,First Name,Organization Name\r\n" + "山田,太郎,株式会社日本テスト\r\n" * 50
+    data = text.encode(encoding)
+    detected, confidence, stream = sniff_encoding(io.BytesIO(data))
+    assert detected == expected
+    assert stream.read().decode(detected) == text
+
+def test_cp932_upload_is_detected_after_gzip_check():
+    data = ("Last Name,First Name,Organization Name\r\n"
+            + "山田,太郎,株式会社日本テスト\r\n" * 50).encode("cp932")
+    source, compression = open_upload(io.BytesIO(data))
+    assert compression is None
+    encoding, confidence, stream = sniff_encoding(source)
+    assert encoding == "cp932"
+    assert stream.read() == data
+
+def test_en_readings_only_for_standalone_capital_words():
+    assert kana_company_name("Acme Japan") == "Acme Japan"
+    assert kana_company_name("NTT-Data") == "NTT-Data"
+    assert kana_company_name("AT&T") == "AT&T"
+    assert kana_company_name("IBM") == "アイビーエム"
+    assert kana_company_name("A & B") == "エー アンド ビー"
+
+def test_zenkaku_for_address():
+    assert to_zenkaku_for_address("") == ""
+    assert to_zenkaku_for_address("1-2-3 ABC") == "１－２－３ ＡＢＣ"  # 空白は変換しない
+    # 半角カナの濁点・半濁点は前の文字と合わせて1文字にする
+    assert to_zenkaku_for_address("ｶﾞｷﾞｸﾞﾊﾟﾋﾟﾌﾟｳﾞ") == "ガギグパピプヴ"
+    assert to_zenkaku_for_address("ﾄｳｷｮｳ ﾋﾞﾙ3F") == "トウキョウ ビル３Ｆ"
+    # 付けられない文字の後や単独の濁点は ゛゜ にする（結合文字にしない）
+    assert to_zenkaku_for_address("ｱﾞﾟ") == "ア゛゜"
+    assert to_zenkaku_for_address("東京都") == "東京都"
+
+def test_map_upload_maps_only_files_on_disk(tmp_path):
+    path = tmp_path / "upload.csv"
+    path.write_bytes(b"a,b\r\n" * 1000)
+    small = io.BytesIO(b"a,b\r\n")
+    assert map_upload(small) is small
+    with open(path, "rb") as f:
+        assert map_upload(f) is f  # min_bytes 未満
+        f.read(5)
+        with map_upload(f, min_bytes=1) as mapped:
+            assert isinstance(mapped, MappedReader)
+            assert mapped.read(5) == b"a,b\r\n"  # 元のファイルの読み取り位置から
+            assert mapped.tell() == 10
+        assert mapped.mm.closed
+    # メモリ上の SpooledTemporaryFile は min_bytes 未満ならディスクへ書き出さない
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+    spooled.write(b"a,b\r\n" * 10)
+    spooled.seek(0)
+    assert map_upload(spooled, min_bytes=1025) is spooled
+    assert not spooled._rolled
+
+def test_upload_size_is_the_decompressed_size():
+    data = ("Last Name,First Name\r\n" + "山田,太郎\r\n" * 5000).encode("utf-8")
+    plain = io.BytesIO(data)
+    plain.read(3)
+    assert upload_size(plain) == len(data) - 3
+    assert plain.tell() == 3  # 読み取り位置は変えない
+    packed = io.BytesIO(gzip.compress(data))
+    assert upload_size(packed) == len(data)
+    assert packed.tell() == 0
+    assert upload_size(io.BytesIO(b"")) == 0
@@ -0,0 +1,59 @@
+# test_merge.py  google2atena_merge の重複連絡先の統合
+#
+#   python -m pytest -q
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_core import ATENA_COLUMNS, profile_header  # noqa: E402
+from google2atena_merge import merge_rows  # noqa: E402
+
+HEADER = profile_header(ATENA_COLUMNS)
+COL = {name: i for i, name in enumerate(HEADER)}
+
+def _row(values):
+    row = [""] * len(HEADER)
+    for name, value in values.items():
+        row[COL[name]] = value
+    return row
+
+def test_rows_sharing_a_phone_are_merged():
+    rows = [
+        _row({"姓名": "山田　太郎", "会社電話": "03-1234-5678", "メモ1": "A"}),
+        _row({"姓名": "鈴木　花子", "会社電話": "03-9999-0000"}),
+        _row({"姓名": "山田 太郎", "会社電話": "03-1234-5678", "会社E-mail": "taro@example.com",
+              "メモ1": "B"}),
+    ]
+    stats = {}
+    out = list(merge_rows(rows, HEADER, stats))
+    assert len(out) == 2
+    assert out[0][COL["会社E-mail"]] == "taro@example.com"
+    assert out[0][COL["メモ1"]] == "A" and out[0][COL["メモ2"]] == "B"
+    assert out[1][COL["姓名"]] == "鈴木　花子"
+    assert stats == {"merged": 1, "merge_spilled": False}
+
+def test_conflicting_names_are_not_merged():
+    # 代表番号・共有アドレスが同じでも、姓名が食い違えば別人
+    rows = [
+        _row({"姓名": "山田　太郎", "会社電話": "03-1234-5678", "会社E-mail": "info@example.com"}),
+        _row({"姓名": "鈴木　花子", "会社電話": "03-1234-5678", "会社E-mail": "info@example.com"}),
+        _row({"会社電話": "03-1234-5678"}),  # 姓名の無い行は最初の束に入る
+    ]
+    out = list(merge_rows(rows, HEADER))
+    assert [row[COL["姓名"]] for row in out] == ["山田　太郎", "鈴木　花子"]
+
+def test_spill_to_sqlite_gives_the_same_rows(tmp_path):
+    rows = []
+    for i in range(50):
+        rows.append(_row({"姓名": f"姓{i}　名", "会社電話": f"03-1234-{i:04d}", "メモ1": f"{i}a"}))
+        rows.append(_row({"姓名": f"姓{i} 名", "会社E-mail": f"u{i}@example.com",
+                          "会社電話": f"03-1234-{i:04d}", "メモ1": f"{i}b"}))
+    expected = list(merge_rows(rows, HEADER))
+    stats = {}
+    got = list(merge_rows(rows, HEADER, stats, memory_rows=10, tmp_dir=str(tmp_path)))
+    assert got == expected
+    assert len(got) == 50
+    assert stats == {"merged": 50, "merge_spilled": True}
+    assert os.listdir(tmp_path) == []  # 一時ファイルは消える
@@ -0,0 +1,58 @@
+# test_metrics.py  google2atena_metrics のプロセス間の集計（METRICS_DIR）
+#
+#   python -m pytest -q
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google2atena_metrics as metrics  # noqa: E402
+
+def _value(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    raise AssertionError(name)
+
+def test_metrics_are_summed_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_own_pid", None)
+    before = _value(metrics.render_metrics(), "google2atena_conversions_total")
+
+    metrics.record_conversion(0.1, {"rows": 3, "bytes_in": 100})
+    metrics._publish()  # 裏のスレッドを待たずに書き出す
+    assert len(os.listdir(tmp_path)) == 1
+
+    # 別のワーカー（終了済み）が書いた累計
+    other = {
+        "pid": 999999999,
+        "counters": {"conversions": 2, "rows": 10},
+        "stages": {},
+        "conversion_duration": metrics.Histogram(metrics.DURATION_BUCKETS).state(),
+        "upload_size": metrics.Histogram(metrics.SIZE_BUCKETS).state(),
+        "requests": {},
+        "caches": {},
+    }
+    with open(os.path.join(str(tmp_path), "999999999-1.json"), "w") as f:
+        json.dump(other, f)
+
+    text = metrics.render_metrics()
+    assert _value(text, "google2atena_conversions_total") == before + 3
+
+def test_publish_writes_only_after_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_own_pid", None)
+    metrics.record_request("/convert", 0.01)
+    metrics._publish()
+    path = metrics._own_path()
+    with open(path) as f:
+        requests = json.load(f)["requests"]["/convert"]
+    os.remove(path)
+    metrics._publish()  # 記録が無ければ書かない
+    assert not os.path.exists(path)
+    metrics.record_request("/convert", 0.01)
+    metrics._publish()
+    with open(path) as f:
+        assert json.load(f)["requests"]["/convert"][2] == requests[2] + 1  # [counts, sum, count]
@@ -0,0 +1,46 @@
+# test_phone.py  google2atena_core.classify_phone（電話番号の種別と整形）
+#
+#   python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google2atena_core import classify_phone, normalize_phones  # noqa: E402
+
+CASES = [
+    # フリーダイヤル・ナビダイヤル
+    ("0120-123-456", ("freedial", "0120-123-456")),
+    ("0120123456", ("freedial", "0120-123-456")),
+    ("0800-123-456", ("freedial", "0800-123-456")),
+    ("0800-123-4567", ("freedial", "0800-123-4567")),
+    ("0570-123-456", ("navidial", "0570-123-456")),
+    # IP 電話・携帯
+    ("050-1234-5678", ("ip", "050-1234-5678")),
+    ("070-1234-5678", ("mobile", "070-1234-5678")),
+    ("080-1234-5678", ("mobile", "080-1234-5678")),
+    ("09012345678", ("mobile", "090-1234-5678")),
+    ("90-1234-5678", ("mobile", "090-1234-5678")),  # 先頭の 0 が無い
+    # 固定電話（市外局番＋市内局番は6桁）
+    ("03-1234-5678", ("geo", "03-1234-5678")),
+    ("011-123-4567", ("geo", "011-123-4567")),
+    ("0422-12-3456", ("geo", "0422-12-3456")),
+    ("04992-1-2345", ("geo", "04992-1-2345")),
+    # 内線は分けずに数字をつなげたまま（従来どおり）
+    ("03-1234-5678 内線123", ("other", "0312345678123")),
+    # 桁数の合わない特番は整形しない
+    ("0120-123-4567", ("other", "01201234567")),
+    ("", ("", "")),
+    ("なし", ("", "")),
+]
+
+@pytest.mark.parametrize("value, expected", CASES)
+def test_classify_phone(value, expected):
+    assert classify_phone(value) == expected
+
+def test_normalize_phones_joins_distinct_numbers():
+    assert normalize_phones(["090-1234-5678", "09012345678", "0800-123-456"]) == \
+        "090-1234-5678;0800-123-456"
@@ -0,0 +1,58 @@
+# test_postal.py  google2atena_postal の索引と、〒による住所の補完・食い違いの注記
+#
+#   python -m pytest -q
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google2atena_core as core  # noqa: E402
+from google2atena_postal import PostalIndex, build_index  # noqa: E402
+
+# KEN_ALL.CSV の形式（〒は3列目、都道府県・市区町村・町域は7〜9列目）
+KEN_ALL = """\
+13101,"100  ","1000005","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾏﾙﾉｳﾁ(ﾂｷﾞﾉﾋﾞﾙｦﾉｿﾞｸ)","東京都","千代田区","丸の内（次のビルを除く）",0,0,1,0,0,0
+27128,"530  ","5300001","ｵｵｻｶﾌ","ｵｵｻｶｼｷﾀｸ","ｳﾒﾀﾞ","大阪府","大阪市北区","梅田",0,0,1,0,0,0
+01408,"04601","0460003","ﾎｯｶｲﾄﾞｳ","ﾖｲﾁｸﾞﾝﾖｲﾁﾁｮｳ","ｲｶﾒﾉｼｮｳｶﾞｲｶﾞﾅｲﾊﾞｱｲ","北海道","余市郡余市町","以下に掲載がない場合",0,0,0,0,0,0
+"""
+
+@pytest.fixture
+def postal_index(tmp_path, monkeypatch):
+    src = tmp_path / "KEN_ALL.CSV"
+    src.write_text(KEN_ALL, encoding="utf-8")
+    path = str(tmp_path / "postal.index")
+    assert build_index(str(src), path) == 3
+    index = PostalIndex(path)
+    monkeypatch.setattr(core, "get_postal_index", lambda: index)
+    yield index
+    index.mm.close()
+
+def test_lookup(postal_index):
+    assert postal_index.lookup("1000005") == ("東京都", "千代田区", "丸の内")
+    assert postal_index.lookup(5300001) == ("大阪府", "大阪市北区", "梅田")
+    assert postal_index.lookup("0460003") == ("北海道", "余市郡余市町", "")
+    assert postal_index.lookup("9999999") is None
+
+def test_empty_fields_are_filled_from_the_postal_code(postal_index):
+    assert core.check_postal("", "", "1-1", "100-0005") == ("東京都", "千代田区", "丸の内1-1", "")
+    # 市区町村の欄に都道府県から書いてあれば都道府県は補わない（食い違いにもしない）
+    assert core.check_postal("", "東京都千代田区", "丸の内1-1", "〒１００－０００５") == (
+        "", "東京都千代田区", "丸の内1-1", "")
+    # 町名の無い 〒 は市区町村まで
+    assert core.check_postal("", "", "黒川町1", "0460003") == ("北海道", "余市郡余市町", "黒川町1", "")
+
+def test_mismatch_and_unknown_postal_codes_are_noted(postal_index):
+    region, city, street, note = core.check_postal("大阪府", "", "1-1", "1000005")
+    assert (region, city, street) == ("大阪府", "", "1-1")  # 食い違いがあれば補わない
+    assert note == "〒100-0005 は 東京都千代田区（入力: 大阪府）"
+    assert core.check_postal("東京", "千代田区", "", "1000005")[3] == ""  # 表記の揺れは許す
+    assert core.check_postal("", "", "", "999-9999")[3] == "〒999-9999 は存在しません"
+    # 7桁でない 〒 は調べない
+    assert core.check_postal("", "", "", "123")[3] == ""
+
+def test_no_index_means_no_change(monkeypatch):
+    monkeypatch.setattr(core, "get_postal_index", lambda: None)
+    assert core.check_postal("", "", "1-1", "1000005") == ("", "", "1-1", "")
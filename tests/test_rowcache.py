@@ -0,0 +1,58 @@
+# test_rowcache.py  google2atena_rowcache の再利用と、辞書の版が変わったときの作り直し
+#
+#   python -m pytest -q
+
+import os
+import stat
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google2atena_rowcache as rowcache  # noqa: E402
+from google2atena_rowcache import open_row_cache  # noqa: E402
+
+HEADER = ["Name", "Phone"]
+ROWS = [["山田", "03-1234-5678"], ["鈴木", "03-9999-0000"], ["山田", "03-1234-5678"]]
+
+class _Converter:
+    """変換した行を数える convert_rows"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, rows):
+        self.rows += len(rows)
+        return [[v.upper() for v in values] + ["*"] for values in rows]
+
+def _convert(path, dict_version, layout=""):
+    convert = _Converter()
+    cache = open_row_cache(HEADER, dict_version, path=path, layout=layout)
+    try:
+        out = cache.convert_batch(ROWS, convert)
+        return out, convert.rows, (cache.hits, cache.misses)
+    finally:
+        cache.close()
+
+def test_rows_are_reused_for_the_same_version(tmp_path):
+    path = str(tmp_path / "cache" / "rows.sqlite3")
+    first, converted, counts = _convert(path, "v1")
+    # 同じバッチ内の重複行は1回だけ変換する
+    assert converted == 2 and counts == (1, 2)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    again, converted, counts = _convert(path, "v1")
+    assert again == first
+    assert converted == 0 and counts == (3, 0)
+
+def test_dictionary_version_or_layout_change_invalidates(tmp_path):
+    path = str(tmp_path / "rows.sqlite3")
+    _convert(path, "v1")
+    _, converted, counts = _convert(path, "v2")
+    assert converted == 2 and counts == (1, 2)
+    _, converted, _ = _convert(path, "v2", layout="home")
+    assert converted == 2
+
+def test_disabled_without_path(monkeypatch):
+    monkeypatch.setattr(rowcache, "ROW_CACHE_PATH", None)
+    assert open_row_cache(HEADER, "v1") is None
+    assert open_row_cache(HEADER, "v1", path="none") is None
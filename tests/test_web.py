@@ -0,0 +1,109 @@
+# test_web.py  google2atena（Flask）のエンドポイント
+#
+#   python -m pytest -q
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google2atena  # noqa: E402
+import google2atena_profile as profile  # noqa: E402
+from google2atena_core import iter_converted_bytes  # noqa: E402
+
+HEADER = ["Last Name", "First Name", "Organization Name", "Phone 1 - Value"]
+
+def _csv_bytes(n, company="株式会社テスト"):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(HEADER)
+    writer.writerows([f"姓{i}", f"名{i}", company, f"03-1234-{i:04d}"] for i in range(n))
+    return buf.getvalue().encode("utf-8")
+
+def _converted(data):
+    return b"".join(iter_converted_bytes(io.BytesIO(data), row_cache=False))
+
+def test_batch_returns_converted_members_and_summary():
+    a, b = _csv_bytes(5), _csv_bytes(3, "有限会社サンプル")
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as zf:
+        zf.writestr("a.csv", a)
+        zf.writestr("sub/b.csv.gz", gzip.compress(b))
+        zf.writestr("readme.txt", "CSV ではないので変換しない")
+    upload.seek(0)
+
+    client = google2atena.app.test_client()
+    r = client.post("/batch", data={"file": (upload, "contacts.zip")})
+    assert r.status_code == 200
+    assert r.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(r.data)) as zf:
+        assert sorted(zf.namelist()) == ["a_converted.csv", "b_converted.csv", "summary.json"]
+        assert zf.read("a_converted.csv") == _converted(a)
+        assert zf.read("b_converted.csv") == _converted(b)
+        summary = json.loads(zf.read("summary.json"))
+    assert summary["total_rows"] == 8
+    assert summary["errors"] == 0
+    assert sorted(f["file"] for f in summary["files"]) == ["a.csv", "sub/b.csv.gz"]
+
+def test_batch_rejects_a_non_zip_upload():
+    client = google2atena.app.test_client()
+    r = client.post("/batch", data={"file": (io.BytesIO(_csv_bytes(2)), "a.csv")})
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+
+def test_profiled_convert_returns_409_while_another_is_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profile, "PROFILE_DIR", str(tmp_path))
+    client = google2atena.app.test_client()
+
+    def convert(**headers):
+        return client.post("/convert", data={"file": (io.BytesIO(_csv_bytes(3)), "a.csv")},
+                           headers=headers)
+
+    held = profile.ProfiledConversion("other.csv")  # 別の要求がプロファイル中
+    try:
+        r = convert(**{"X-Profile-Token": "secret"})
+        assert r.status_code == 409
+        # トークンの無い要求はプロファイルしないので、そのまま変換する
+        r = convert()
+        assert r.status_code == 200
+        assert "X-Profile-Report" not in r.headers
+        assert r.data == _converted(_csv_bytes(3))
+    finally:
+        held.release()
+
+    r = convert(**{"X-Profile-Token": "secret"})
+    assert r.status_code == 200
+    assert r.data == _converted(_csv_bytes(3))
+    report = client.get(r.headers["X-Profile-Report"], headers={"X-Profile-Token": "secret"})
+    assert report.status_code == 200
+    assert report.get_json()["rows"] == 3
+
+def test_gzip_upload_is_parallel_by_decompressed_size(monkeypatch):
+    data = _csv_bytes(2000)
+    packed = gzip.compress(data)
+    monkeypatch.setattr(google2atena, "PARALLEL_MIN_BYTES", len(packed) * 2)
+    calls = []
+    monkeypatch.setattr(google2atena, "convert_workers", lambda: calls.append(1) or 1)
+    client = google2atena.app.test_client()
+    # ファイルが gzip
+    r = client.post("/convert", data={"file": (io.BytesIO(packed), "a.csv.gz")})
+    assert r.data == _converted(data)
+    # 要求が Content-Encoding: gzip（Content-Length は圧縮後）
+    form = io.BytesIO()
+    boundary = "g2a-boundary"
+    form.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.csv"\r\n'
+               f"Content-Type: text/csv\r\n\r\n".encode())
+    form.write(data)
+    form.write(f"\r\n--{boundary}--\r\n".encode())
+    r = client.post("/convert", data=gzip.compress(form.getvalue()),
+                    headers={"Content-Encoding": "gzip",
+                             "Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert r.status_code == 200
+    assert r.data == _converted(data)
+    assert len(calls) == 2